@@ -0,0 +1,279 @@
+# Generador de catálogos sintéticos para benchmarks.
+# Escribe géneros, artistas, álbumes, canciones, usuarios y playlists con el mismo esquema
+# que usan los controladores (referencias como string, artist.genre como lista de ObjectId,
+# album.genre + album.genre_id). Con la misma semilla y escala genera exactamente los mismos
+# documentos e IDs, así dos corridas del benchmark miden lo mismo.
+#
+# La popularidad es sesgada (pocos artistas con muchos álbumes, canciones "hit" repetidas
+# en muchas playlists), como en un catálogo real.
+#
+# Uso manual (la base debe terminar en "bench" o pasar --force):
+#   DB_NAME=music_bench MONGO_TLS=false MONGODB_URI=mongodb://localhost:27017 \
+#       python -m bench.dataset --scale 0.01 --drop
+#   python -m bench.dataset                       -> 10k artistas, 100k álbumes, 1M canciones, 50k usuarios
+#   python -m bench.dataset --playlist-storage items
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from utils.catalog_stats import rebuild_catalog_stats
+from utils.indexes import ensure_indexes
+from utils.mongodb import DB_NAME, get_async_collection, close_async_mongo_client
+from utils.playlist_items import ITEMS_COLLECTION, POSITION_GAP
+
+logger = logging.getLogger(__name__)
+
+# Tamaños con --scale 1
+FULL_SCALE = {"artists": 10_000, "albums": 100_000, "songs": 1_000_000, "users": 50_000}
+PLAYLISTS_PER_USER = (0, 5)
+SONGS_PER_PLAYLIST = (5, 80)
+DEFAULT_SEED = 42
+INSERT_BATCH_SIZE = 5000
+
+COLLECTIONS = ("genre", "artist", "album", "songs", "users", "playlist", ITEMS_COLLECTION, "catalog_stats")
+
+GENRES = [
+    "Rock", "Pop", "Jazz", "Blues", "Hip Hop", "Reggae", "Salsa", "Cumbia", "Metal", "Punk",
+    "Folk", "Country", "Soul", "Funk", "Disco", "House", "Techno", "Trance", "Ambient", "Classical",
+    "Opera", "Tango", "Bolero", "Bachata", "Merengue", "Reggaeton", "Ska", "Grunge", "Indie", "Gospel",
+]
+COUNTRIES = ["Argentina", "Brazil", "Chile", "Colombia", "Cuba", "Mexico", "Peru", "Spain",
+             "United States", "United Kingdom", "Canada", "France", "Germany", "Japan", "Jamaica"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "ven", "to", "sa", "lu", "na", "ri", "del", "mar", "so", "la",
+             "be", "ne", "ton", "zu", "cha", "ro", "vi", "go", "fe", "li", "da", "mo", "que", "sol"]
+WORDS = [
+    "love", "night", "fire", "rain", "heart", "city", "dream", "river", "light", "shadow", "road",
+    "summer", "winter", "ocean", "moon", "star", "dance", "blue", "gold", "wild", "silent", "lost",
+    "home", "storm", "paradise", "memory", "echo", "midnight", "sunrise", "desert", "electric",
+    "broken", "velvet", "neon", "forever", "tonight", "whisper", "thunder", "garden", "mirror",
+    "corazon", "noche", "luna", "fuego", "camino", "alma", "cielo", "vida", "tiempo", "sueño",
+]
+
+# Marca de tiempo fija de los ObjectId generados (IDs reproducibles)
+_BASE_TS = int(datetime(2024, 1, 1).timestamp())
+_KINDS = {"genre": 1, "artist": 2, "album": 3, "song": 4, "user": 5, "playlist": 6, "item": 7}
+
+
+def oid(kind: str, index: int) -> ObjectId:
+    # timestamp (8) + tipo (2) + índice (14): único por tipo y ordenado por índice
+    return ObjectId(f"{_BASE_TS:08x}{_KINDS[kind]:02x}{index:014x}")
+
+
+def skewed_index(rng: random.Random, n: int, power: float = 2.5) -> int:
+    # Índice en [0, n) con sesgo hacia los primeros (popularidad tipo ley de potencias)
+    return min(n - 1, int(n * rng.random() ** power))
+
+
+def scaled_sizes(scale: float) -> dict:
+    sizes = {k: max(1, int(v * scale)) for k, v in FULL_SCALE.items()}
+    sizes["albums"] = max(sizes["albums"], sizes["artists"])
+    sizes["songs"] = max(sizes["songs"], sizes["albums"])
+    return sizes
+
+
+def _spread(rng: random.Random, total: int, buckets: int, power: float) -> list:
+    # Reparte total elementos en buckets (al menos 1 por bucket) con sesgo
+    counts = [1] * buckets
+    for _ in range(total - buckets):
+        counts[skewed_index(rng, buckets, power)] += 1
+    rng.shuffle(counts)
+    return counts
+
+
+def _name(rng: random.Random, used: set, words: int) -> str:
+    while True:
+        name = " ".join(
+            "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+            for _ in range(words)
+        )
+        if name.lower() not in used:
+            used.add(name.lower())
+            return name
+
+
+def _title(rng: random.Random, used: set) -> str:
+    while True:
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        if title.lower() not in used:
+            used.add(title.lower())
+            return title
+
+
+class CatalogGenerator:
+    """
+    Genera los documentos por lotes (nunca tiene el catálogo completo en memoria).
+    Los IDs se derivan del índice de cada entidad, así los álbumes y artistas pueden
+    referenciar canciones y álbumes antes de generarlos.
+    """
+
+    def __init__(self, scale: float = 1.0, seed: int = DEFAULT_SEED, playlist_storage: str = "embedded"):
+        self.sizes = scaled_sizes(scale)
+        self.seed = seed
+        self.playlist_storage = playlist_storage
+        rng = random.Random(seed)
+        self.albums_per_artist = _spread(rng, self.sizes["albums"], self.sizes["artists"], 3.0)
+        self.songs_per_album = _spread(rng, self.sizes["songs"], self.sizes["albums"], 1.5)
+
+    def genres(self):
+        now = datetime(2024, 1, 1)
+        for i, name in enumerate(GENRES):
+            yield {"_id": oid("genre", i), "name": name, "name_lc": name.lower(), "active": True,
+                   "created_at": now, "updated_at": now}
+
+    def catalog(self):
+        """
+        Recorre artistas en orden y produce ("artist"|"album"|"songs", doc).
+        """
+        rng = random.Random(self.seed + 1)
+        used_names = set()
+        album_index = song_index = 0
+        for artist_index, album_count in enumerate(self.albums_per_artist):
+            artist_id = oid("artist", artist_index)
+            genre_ids = sorted({skewed_index(rng, len(GENRES), 1.5) for _ in range(rng.randint(1, 3))})
+            album_ids = [str(oid("album", album_index + j)) for j in range(album_count)]
+            yield "artist", {
+                "_id": artist_id,
+                "name": _name(rng, used_names, rng.randint(1, 3)),
+                "genre": [oid("genre", g) for g in genre_ids],
+                "country": rng.choice(COUNTRIES),
+                "albums": album_ids,
+            }
+
+            album_titles, song_titles = set(), set()
+            for album_id in album_ids:
+                song_count = self.songs_per_album[album_index]
+                song_ids = [oid("song", song_index + k) for k in range(song_count)]
+                genre = rng.choice(genre_ids)
+                yield "album", {
+                    "_id": ObjectId(album_id),
+                    "title": _title(rng, album_titles),
+                    "year": rng.randint(1960, 2025),
+                    "genre": GENRES[genre],
+                    "genre_id": oid("genre", genre),
+                    "artist": str(artist_id),
+                    "songs": [str(s) for s in song_ids],
+                }
+                for song_id in song_ids:
+                    yield "songs", {
+                        "_id": song_id,
+                        "title": _title(rng, song_titles),
+                        "artist": str(artist_id),
+                        "album": album_id,
+                        "duration": rng.randint(90, 420),
+                    }
+                album_index += 1
+                song_index += song_count
+
+    def users(self):
+        """
+        Produce ("users"|"playlist"|playlist_items, doc). Las canciones de las playlists
+        se eligen con sesgo: las primeras de cada artista popular aparecen mucho más.
+        """
+        rng = random.Random(self.seed + 2)
+        playlist_index = item_index = 0
+        for user_index in range(self.sizes["users"]):
+            user_id = oid("user", user_index)
+            playlist_ids = []
+            for _ in range(rng.randint(*PLAYLISTS_PER_USER)):
+                playlist_id = oid("playlist", playlist_index)
+                playlist_index += 1
+                playlist_ids.append(str(playlist_id))
+                songs = list(dict.fromkeys(
+                    str(oid("song", skewed_index(rng, self.sizes["songs"])))
+                    for _ in range(rng.randint(*SONGS_PER_PLAYLIST))
+                ))
+                doc = {"_id": playlist_id, "name": " ".join(rng.sample(WORDS, 2)).title(),
+                       "user": str(user_id)}
+                if self.playlist_storage == "items":
+                    doc.update({"storage": "items", "song_count": len(songs)})
+                    for position, song_id in enumerate(songs, start=1):
+                        yield ITEMS_COLLECTION, {"_id": oid("item", item_index), "playlist_id": playlist_id,
+                                                 "song_id": song_id, "position": position * POSITION_GAP}
+                        item_index += 1
+                else:
+                    doc["songs"] = songs
+                yield "playlist", doc
+
+            yield "users", {
+                "_id": user_id,
+                "email": f"user{user_index}@bench.local",
+                "firstname": f"User{user_index}",
+                "lastname": "Bench",
+                "name": f"User{user_index}",
+                "admin": user_index == 0,
+                "active": True,
+                "firebase_uid": f"bench-{user_index}",
+                "playlists": playlist_ids,
+            }
+
+
+async def _insert_stream(stream, batch_size: int) -> dict:
+    buffers, counts = {}, {}
+    for collection, doc in stream:
+        buffer = buffers.setdefault(collection, [])
+        buffer.append(doc)
+        if len(buffer) >= batch_size:
+            await get_async_collection(collection).insert_many(buffer, ordered=False)
+            counts[collection] = counts.get(collection, 0) + len(buffer)
+            buffer.clear()
+    for collection, buffer in buffers.items():
+        if buffer:
+            await get_async_collection(collection).insert_many(buffer, ordered=False)
+            counts[collection] = counts.get(collection, 0) + len(buffer)
+    return counts
+
+
+async def generate(scale: float = 1.0, seed: int = DEFAULT_SEED, drop: bool = False,
+                   playlist_storage: str = "embedded", batch_size: int = INSERT_BATCH_SIZE) -> dict:
+    """
+    Genera el catálogo en la base configurada. Devuelve {colección: documentos insertados}.
+    """
+    if drop:
+        for name in COLLECTIONS:
+            await get_async_collection(name).drop()
+
+    start = time.perf_counter()
+    generator = CatalogGenerator(scale, seed, playlist_storage)
+    counts = await _insert_stream((("genre", g) for g in generator.genres()), batch_size)
+    for stream in (generator.catalog(), generator.users()):
+        for name, count in (await _insert_stream(stream, batch_size)).items():
+            counts[name] = counts.get(name, 0) + count
+            logger.info("%s: %d documentos", name, counts[name])
+
+    # Índices al final (insertar sin índices secundarios es más rápido) y estadísticas derivadas
+    await ensure_indexes()
+    await rebuild_catalog_stats()
+    logger.info("Catálogo generado en %.1fs", time.perf_counter() - start)
+    return counts
+
+
+def _arg_value(argv: list, flag: str):
+    return argv[argv.index(flag) + 1] if flag in argv and argv.index(flag) + 1 < len(argv) else None
+
+
+async def _main(argv: list):
+    if not DB_NAME.endswith("bench") and "--force" not in argv:
+        print(f"La base '{DB_NAME}' no termina en 'bench'; usa --force para escribir en ella")
+        return
+    try:
+        counts = await generate(
+            scale=float(_arg_value(argv, "--scale") or 1.0),
+            seed=int(_arg_value(argv, "--seed") or DEFAULT_SEED),
+            drop="--drop" in argv,
+            playlist_storage=_arg_value(argv, "--playlist-storage") or "embedded",
+            batch_size=int(_arg_value(argv, "--batch-size") or INSERT_BATCH_SIZE),
+        )
+        for name, count in sorted(counts.items()):
+            print(f"  {name:16} {count}")
+    finally:
+        await close_async_mongo_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,371 @@
+# Prueba de carga con tráfico mixto (para dimensionar instancias).
+# A diferencia de bench.run (cada ruta por separado), aquí se mezcla un perfil ponderado de
+# peticiones (navegación, búsqueda, edición de playlists, login con Firebase simulado y
+# escrituras de administración) y se envía en lazo abierto: las llegadas siguen un proceso
+# de Poisson a la tasa indicada, sin esperar a que terminen las anteriores. La latencia se
+# mide desde la llegada programada, así las colas del servidor se ven en los percentiles
+# (sin "coordinated omission").
+#
+# Se recorre una escalera de tasas (--rates) y por cada escalón se informa throughput
+# logrado, p50/p95/p99, errores y llegadas descartadas por superar --concurrency. El punto
+# de saturación es el primer escalón que no sostiene la tasa ofrecida o rompe el SLO.
+#
+# Uso manual (catálogo generado con bench.dataset):
+#   DB_NAME=music_bench MONGO_TLS=false MONGODB_URI=mongodb://localhost:27017 \
+#       python -m bench.load --profile mixed --rates 25,50,100,200,400 --duration 30
+#   python -m bench.load --url http://localhost:8000     -> servidor levantado con FIREBASE_HTTP_STUB=true
+#   python -m bench.load --profile search --slo-p99-ms 250 --out curva.json
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from bench.run import RESULTS_DIR, percentile
+from bench.scenarios import SCENARIOS, BenchContext, Scenario, _req, _song_ids
+from utils.mongodb import close_async_mongo_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATES = (25, 50, 100, 200, 400)
+DEFAULT_DURATION = 20
+DEFAULT_CONCURRENCY = 256
+DEFAULT_SLO_P99_MS = 500
+DRAIN_TIMEOUT = 30
+# Un escalón está saturado si logra menos de esta fracción de la tasa ofrecida
+SATURATION_THROUGHPUT = 0.95
+SATURATION_ERROR_RATE = 0.01
+BENCH_PASSWORD = "bench-password"
+PRIMED_SESSIONS = 20
+
+
+def _login(ctx, i):
+    return _req("/auth/login", json={"email": ctx.sample("user", i)["email"], "password": BENCH_PASSWORD})
+
+
+def _remember_session(ctx, response):
+    if response.status_code == 200:
+        ctx.created.setdefault("refresh_token", []).append(response.json()["refresh_token"])
+
+
+def _refresh(ctx, i):
+    tokens = ctx.created.get("refresh_token")
+    return _req("/auth/refresh", json={"refresh_token": tokens.pop(0) if tokens else "bench-missing-token"})
+
+
+def _playlist_edit(ctx, i, remove: bool):
+    # Solo se quitan canciones que agregó la carga, así las originales de la playlist no se
+    # tocan; lo que quede pendiente al final lo quita _cleanup.
+    pending = ctx.created.setdefault("playlist_edit", [])
+    if remove:
+        if pending:
+            playlist_id, song_ids = pending.pop(0)
+        else:
+            # Nada que deshacer: quitar una lista vacía no modifica la playlist
+            playlist_id, song_ids = ctx.sample("playlist", i)["_id"], []
+        return _req(f"/playlists/{playlist_id}/remove-song", json={"song_ids": song_ids},
+                    headers=ctx.owner_headers[playlist_id])
+
+    # Se agregan canciones que la playlist no tiene (si ya estuviera, add-song la omite
+    # y quitarla después borraría una canción original)
+    playlist_id = ctx.sample("playlist", i)["_id"]
+    present = ctx.playlist_songs.setdefault(playlist_id, set())
+    song_ids = [sid for sid in dict.fromkeys(_song_ids(ctx, i, 8)) if sid not in present][:2]
+    present.update(song_ids)
+    return _req(f"/playlists/{playlist_id}/add-song", json={"song_ids": song_ids},
+                headers=ctx.owner_headers[playlist_id])
+
+
+def _edit_of(response):
+    return response.request.url.path.split("/")[2], json.loads(response.request.content)["song_ids"]
+
+
+def _remember_edit(ctx, response):
+    playlist_id, song_ids = _edit_of(response)
+    if response.status_code >= 400:
+        ctx.playlist_songs.get(playlist_id, set()).difference_update(song_ids)
+    elif song_ids:
+        ctx.created.setdefault("playlist_edit", []).append((playlist_id, song_ids))
+
+
+def _forget_edit(ctx, response):
+    playlist_id, song_ids = _edit_of(response)
+    if not song_ids:
+        return
+    if response.status_code >= 400:
+        # Sigue pendiente: se reintenta más tarde o en _cleanup
+        ctx.created.setdefault("playlist_edit", []).append((playlist_id, song_ids))
+    else:
+        ctx.playlist_songs.get(playlist_id, set()).difference_update(song_ids)
+
+
+# Acciones propias de la carga (además de los escenarios de bench.scenarios)
+LOAD_ACTIONS = [
+    Scenario("login", "POST", "/auth/login", _login, on_response=_remember_session, mutates=True),
+    Scenario("refresh", "POST", "/auth/refresh", _refresh, on_response=_remember_session, mutates=True),
+    Scenario("playlist add songs", "PATCH", "/playlists/{playlist_id}/add-song",
+             lambda ctx, i: _playlist_edit(ctx, i, remove=False), on_response=_remember_edit, mutates=True),
+    Scenario("playlist remove songs", "PATCH", "/playlists/{playlist_id}/remove-song",
+             lambda ctx, i: _playlist_edit(ctx, i, remove=True), on_response=_forget_edit, mutates=True),
+]
+ACTIONS = {s.name: s for s in SCENARIOS + LOAD_ACTIONS}
+
+# Perfiles de tráfico: acción -> peso
+PROFILES = {
+    "mixed": {
+        "list artists": 12, "list genres page": 8, "get genre": 4, "artist albums": 8,
+        "songs by album": 8, "songs by artist": 5, "songs batch": 4, "search songs": 14,
+        "autocomplete": 10, "list playlists": 5, "get playlist": 6, "playlist add songs": 4,
+        "playlist remove songs": 4, "login": 3, "refresh": 2, "create artist": 1, "create genre": 1,
+    },
+    "browse": {
+        "list artists": 25, "list genres": 10, "list genres page": 10, "get genre": 10,
+        "artist albums": 20, "songs by album": 15, "albums batch": 5, "top artist": 5,
+    },
+    "search": {"search songs": 50, "search songs fuzzy": 15, "autocomplete": 35},
+    "edits": {
+        "get playlist": 20, "playlist add songs": 30, "playlist remove songs": 30,
+        "login": 10, "refresh": 10,
+    },
+}
+
+# Limpieza al terminar (sin medir): entidades creadas por las acciones de escritura
+_CLEANUP = (("artist", "/artists/{}"), ("genre", "/genres/{}"))
+
+
+class Step:
+    """
+    Resultado de un escalón de la escalera de tasas.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.latencies = {}     # acción -> [ms]
+        self.errors = {}        # acción -> errores
+        self.dropped = 0
+        self.sent = 0
+        self.elapsed = 0.0
+
+    def record(self, action: str, ms: float, error: bool):
+        self.latencies.setdefault(action, []).append(ms)
+        if error:
+            self.errors[action] = self.errors.get(action, 0) + 1
+
+    def summary(self, slo_p99_ms: float) -> dict:
+        latencies = sorted(ms for values in self.latencies.values() for ms in values)
+        completed = len(latencies)
+        errors = sum(self.errors.values())
+        throughput = completed / self.elapsed if self.elapsed else 0.0
+        result = {
+            "rate": self.rate,
+            "sent": self.sent,
+            "completed": completed,
+            "dropped": self.dropped,
+            "errors": errors,
+            "error_rate": round(errors / completed, 4) if completed else 0.0,
+            "throughput_rps": round(throughput, 2),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "by_action": {},
+        }
+        for action, values in sorted(self.latencies.items()):
+            values.sort()
+            result["by_action"][action] = {
+                "count": len(values), "errors": self.errors.get(action, 0),
+                "p50_ms": round(percentile(values, 50), 3), "p95_ms": round(percentile(values, 95), 3),
+            }
+        result["saturated"] = (
+            throughput < self.rate * SATURATION_THROUGHPUT or self.dropped > 0
+            or result["error_rate"] > SATURATION_ERROR_RATE or result["p99_ms"] > slo_p99_ms
+        )
+        return result
+
+
+async def run_step(client, ctx, profile: dict, rate: float, duration: float, concurrency: int,
+                   rng: random.Random, counter) -> Step:
+    """
+    Envía llegadas de Poisson a la tasa indicada durante duration segundos (lazo abierto).
+    """
+    step = Step(rate)
+    names, weights = list(profile), list(profile.values())
+    tasks = set()
+
+    async def fire(action: Scenario, i: int, scheduled: float):
+        error = True
+        try:
+            request = action.build(ctx, i)
+            response = await client.request(
+                action.method, request["path"], params=request.get("params"),
+                json=request.get("json"), headers=request.get("headers"),
+            )
+            if action.on_response:
+                action.on_response(ctx, response)
+            error = response.status_code >= 400
+        except Exception as e:
+            logger.debug("%s #%d: %s", action.name, i, e)
+        step.record(action.name, (time.perf_counter() - scheduled) * 1000, error)
+
+    start = time.perf_counter()
+    arrival = start
+    while True:
+        arrival += rng.expovariate(rate)
+        if arrival - start >= duration:
+            break
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        step.sent += 1
+        if len(tasks) >= concurrency:
+            # Más peticiones en curso que el límite: el cliente ya no puede sostener la tasa
+            step.dropped += 1
+            continue
+        action = ACTIONS[rng.choices(names, weights)[0]]
+        task = asyncio.create_task(fire(action, next(counter), arrival))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.wait(tasks, timeout=DRAIN_TIMEOUT)
+    step.elapsed = time.perf_counter() - start
+    return step
+
+
+async def _prime(client, ctx, sessions: int = PRIMED_SESSIONS):
+    # Sesiones iniciales (sin medir) para que los primeros refresh tengan token, y canciones
+    # actuales de las playlists para que la edición solo agregue canciones nuevas
+    await ctx.load_playlist_songs()
+    login = ACTIONS["login"]
+    for i in range(sessions):
+        request = login.build(ctx, i)
+        login.on_response(ctx, await client.post(request["path"], json=request["json"]))
+
+
+async def _cleanup(client, ctx):
+    for kind, path in _CLEANUP:
+        for entity_id in ctx.created.pop(kind, []):
+            await client.delete(path.format(entity_id), headers=ctx.user_headers)
+    for pending in ctx.created.pop("playlist_edit", []):
+        playlist_id, song_ids = pending
+        await client.patch(f"/playlists/{playlist_id}/remove-song", json={"song_ids": song_ids},
+                           headers=ctx.owner_headers[playlist_id])
+    for token in ctx.created.pop("refresh_token", []):
+        await client.post("/auth/logout", json={"refresh_token": token})
+
+
+async def _drive(client, ctx, profile: dict, rates, duration: float, concurrency: int,
+                 slo_p99_ms: float, seed: int) -> list:
+    rng = random.Random(seed)
+    counter = iter(range(sys.maxsize))
+    steps = []
+    try:
+        await _prime(client, ctx)
+        for rate in rates:
+            summary = (await run_step(client, ctx, profile, rate, duration, concurrency, rng, counter)
+                       ).summary(slo_p99_ms)
+            steps.append(summary)
+            logger.info("%7.1f req/s ofrecidas -> %7.1f logradas  p50=%7.1fms p95=%7.1fms p99=%7.1fms "
+                        "errores=%d descartadas=%d%s", rate, summary["throughput_rps"], summary["p50_ms"],
+                        summary["p95_ms"], summary["p99_ms"], summary["errors"], summary["dropped"],
+                        "  (saturado)" if summary["saturated"] else "")
+    finally:
+        await _cleanup(client, ctx)
+    return steps
+
+
+async def run_load(profile_name: str = "mixed", rates=DEFAULT_RATES, duration: float = DEFAULT_DURATION,
+                   concurrency: int = DEFAULT_CONCURRENCY, slo_p99_ms: float = DEFAULT_SLO_P99_MS,
+                   url: str = None, sample_size: int = 500, seed: int = 0) -> dict:
+    """
+    Ejecuta la escalera de tasas con el perfil indicado y devuelve la curva latencia/throughput.
+    Sin url la app corre en el mismo proceso (con Firebase simulado); con url se envía al
+    servidor indicado, que debe usar la misma base y FIREBASE_HTTP_STUB=true.
+    """
+    profile = PROFILES[profile_name]
+    ctx = BenchContext(BenchContext.letters(int(time.time())))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    if url:
+        try:
+            await ctx.load(sample_size)
+            async with httpx.AsyncClient(base_url=url, limits=limits, timeout=DRAIN_TIMEOUT) as client:
+                steps = await _drive(client, ctx, profile, rates, duration, concurrency, slo_p99_ms, seed)
+        finally:
+            await close_async_mongo_client()
+    else:
+        from main import app
+        from utils.firebase_http import set_transport, stub_transport
+
+        os.environ.setdefault("FIREBASE_API_KEY", "bench-stub")
+        await set_transport(stub_transport())
+        async with app.router.lifespan_context(app):
+            await ctx.load(sample_size)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=DRAIN_TIMEOUT) as client:
+                steps = await _drive(client, ctx, profile, rates, duration, concurrency, slo_p99_ms, seed)
+
+    saturation = next((s["rate"] for s in steps if s["saturated"]), None)
+    sustained = [s["throughput_rps"] for s in steps if not s["saturated"]]
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "target": url or "in-process",
+            "profile": profile_name,
+            "mix": profile,
+            "params": {"rates": list(rates), "duration": duration, "concurrency": concurrency,
+                       "slo_p99_ms": slo_p99_ms, "sample_size": sample_size, "seed": seed},
+        },
+        "steps": steps,
+        # Primera tasa ofrecida que no se sostuvo y mayor throughput sostenido dentro del SLO
+        "saturation_rate": saturation,
+        "max_sustained_rps": max(sustained) if sustained else None,
+    }
+
+
+def _arg_value(argv: list, flag: str):
+    return argv[argv.index(flag) + 1] if flag in argv and argv.index(flag) + 1 < len(argv) else None
+
+
+async def _main(argv: list):
+    profile = _arg_value(argv, "--profile") or "mixed"
+    if profile not in PROFILES:
+        print(f"Perfil desconocido '{profile}'. Disponibles: {', '.join(PROFILES)}")
+        return
+    rates = _arg_value(argv, "--rates")
+    report = await run_load(
+        profile_name=profile,
+        rates=[float(r) for r in rates.split(",")] if rates else DEFAULT_RATES,
+        duration=float(_arg_value(argv, "--duration") or DEFAULT_DURATION),
+        concurrency=int(_arg_value(argv, "--concurrency") or DEFAULT_CONCURRENCY),
+        slo_p99_ms=float(_arg_value(argv, "--slo-p99-ms") or DEFAULT_SLO_P99_MS),
+        url=_arg_value(argv, "--url"),
+        sample_size=int(_arg_value(argv, "--sample-size") or 500),
+        seed=int(_arg_value(argv, "--seed") or 0),
+    )
+
+    out = _arg_value(argv, "--out")
+    if out:
+        path = Path(out)
+    else:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"load-{profile}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    print(f"{'ofrecidas':>10} {'logradas':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errores':>8} {'descart.':>8}")
+    for s in report["steps"]:
+        print(f"{s['rate']:10.1f} {s['throughput_rps']:10.1f} {s['p50_ms']:9.1f} {s['p95_ms']:9.1f} "
+              f"{s['p99_ms']:9.1f} {s['errors']:8d} {s['dropped']:8d}{'  *' if s['saturated'] else ''}")
+    print(f"Saturación: {report['saturation_rate'] or 'no alcanzada'}; "
+          f"máximo sostenido: {report['max_sustained_rps']} req/s")
+    print(f"Resultados en {path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
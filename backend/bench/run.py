@@ -0,0 +1,249 @@
+# Benchmark de todas las rutas de la API contra un catálogo generado con bench.dataset.
+# La app corre en el mismo proceso (httpx + ASGITransport, con lifespan, middlewares y
+# autenticación reales), así se mide la API completa sin la red ni uvicorn de por medio.
+# Por escenario se informa p50/p95/p99, media, throughput y asignaciones de memoria
+# (tracemalloc durante el calentamiento, para no distorsionar las latencias).
+# El resultado se escribe en JSON para comparar corridas.
+#
+# Uso manual (mongod local con el catálogo generado):
+#   DB_NAME=music_bench MONGO_TLS=false MONGODB_URI=mongodb://localhost:27017 \
+#       python -m bench.run --requests 200 --concurrency 8
+#   python -m bench.run --only "search songs" --only "list songs"
+#   python -m bench.run --compare bench/results/20250101T120000.json
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from bench.scenarios import SCENARIOS, SKIPPED_ROUTES, BenchContext, uncovered_routes
+from search import service as search_service
+from utils.mongodb import DB_NAME, get_async_collection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 8
+DEFAULT_WARMUP = 10
+DEFAULT_SAMPLE_SIZE = 200
+SEARCH_READY_TIMEOUT = 600
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Variables que cambian el comportamiento medido (se guardan con el resultado)
+_RECORDED_ENV = ("RESPONSE_CACHE_ENABLED", "SEARCH_INDEX_ENABLED", "PLAYLIST_STORAGE", "METRICS_ENABLED",
+                 "SLOW_QUERY_LOG_ENABLED", "MONGO_MAX_POOL_SIZE", "MONGO_TRANSACTIONS")
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    # Percentil por rango más cercano sobre una lista ordenada
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+async def _send(client: httpx.AsyncClient, scenario, ctx, i: int):
+    request = scenario.build(ctx, i)
+    response = await client.request(
+        scenario.method, request["path"], params=request.get("params"),
+        json=request.get("json"), headers=request.get("headers"),
+    )
+    if scenario.on_response:
+        scenario.on_response(ctx, response)
+    return response.status_code
+
+
+async def run_scenario(client, scenario, ctx, requests: int, concurrency: int, warmup: int) -> dict:
+    if scenario.prepare:
+        await scenario.prepare(ctx)
+
+    # Calentamiento secuencial con tracemalloc: memoria asignada por petición
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for i in range(warmup):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            try:
+                await _send(client, scenario, ctx, requests + i)
+            except Exception:
+                pass
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    latencies, statuses = [], {}
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                status = await _send(client, scenario, ctx, i)
+            except Exception as e:
+                logger.debug("%s #%d: %s", scenario.name, i, e)
+                status = "exception"
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == "exception" or status >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "name": scenario.name,
+        "method": scenario.method,
+        "route": scenario.route,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "alloc_peak_kib": round(sum(peaks) / len(peaks) / 1024, 1) if peaks else None,
+        "alloc_retained_kib": round(sum(retained) / len(retained) / 1024, 1) if retained else None,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+async def _dataset_counts() -> dict:
+    names = ("genre", "artist", "album", "songs", "users", "playlist", "playlist_items")
+    return {name: await get_async_collection(name).estimated_document_count() for name in names}
+
+
+async def _wait_for_search(timeout: float):
+    start = time.perf_counter()
+    while search_service.SEARCH_INDEX_ENABLED and not search_service.is_ready():
+        if time.perf_counter() - start > timeout:
+            logger.warning("El índice de búsqueda no estuvo listo en %ss; se mide con el fallback regex", timeout)
+            return
+        await asyncio.sleep(0.5)
+
+
+async def run_benchmark(requests: int = DEFAULT_REQUESTS, concurrency: int = DEFAULT_CONCURRENCY,
+                        warmup: int = DEFAULT_WARMUP, only=None, sample_size: int = DEFAULT_SAMPLE_SIZE,
+                        seed: int = 0) -> dict:
+    """
+    Ejecuta los escenarios (todos o los indicados en only) y devuelve el reporte completo.
+    """
+    from main import app
+
+    random.seed(seed)
+    run_tag = "".join(random.choice(string.ascii_lowercase) for _ in range(6))
+    ctx = BenchContext(run_tag)
+
+    async with app.router.lifespan_context(app):
+        await _wait_for_search(SEARCH_READY_TIMEOUT)
+        await ctx.load(sample_size)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = []
+            for scenario in SCENARIOS:
+                # Con --only se ejecutan igual los escenarios que preparan datos
+                if only and scenario.name not in only and not scenario.mutates:
+                    continue
+                result = await run_scenario(client, scenario, ctx, requests, concurrency, warmup)
+                logger.info("%-28s p50=%8.2fms p95=%8.2fms p99=%8.2fms %8.1f req/s errores=%d",
+                            result["name"], result["p50_ms"], result["p95_ms"], result["p99_ms"],
+                            result["throughput_rps"], result["errors"])
+                if not only or scenario.name in only:
+                    results.append(result)
+        counts = await _dataset_counts()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": DB_NAME,
+            "dataset": counts,
+            "params": {"requests": requests, "concurrency": concurrency, "warmup": warmup,
+                       "sample_size": sample_size, "seed": seed},
+            "env": {k: os.environ[k] for k in _RECORDED_ENV if k in os.environ},
+        },
+        "results": results,
+        "skipped": [{"method": m, "route": r, "reason": reason} for (m, r), reason in SKIPPED_ROUTES.items()],
+        "uncovered": [{"method": m, "route": r} for m, r in uncovered_routes(app)],
+    }
+
+
+def compare(current: dict, previous: dict) -> list:
+    """
+    Filas (escenario, p95 anterior, p95 actual, variación %) para los escenarios de ambas corridas.
+    """
+    before = {r["name"]: r for r in previous.get("results", [])}
+    rows = []
+    for result in current["results"]:
+        old = before.get(result["name"])
+        if old and old["p95_ms"]:
+            change = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            rows.append((result["name"], old["p95_ms"], result["p95_ms"], round(change, 1)))
+    return rows
+
+
+def _arg_value(argv: list, flag: str):
+    return argv[argv.index(flag) + 1] if flag in argv and argv.index(flag) + 1 < len(argv) else None
+
+
+async def _main(argv: list):
+    only = [v for i, v in enumerate(argv) if i and argv[i - 1] == "--only"]
+    report = await run_benchmark(
+        requests=int(_arg_value(argv, "--requests") or DEFAULT_REQUESTS),
+        concurrency=int(_arg_value(argv, "--concurrency") or DEFAULT_CONCURRENCY),
+        warmup=int(_arg_value(argv, "--warmup") or DEFAULT_WARMUP),
+        only=only,
+        sample_size=int(_arg_value(argv, "--sample-size") or DEFAULT_SAMPLE_SIZE),
+        seed=int(_arg_value(argv, "--seed") or 0),
+    )
+
+    out = _arg_value(argv, "--out")
+    if out:
+        path = Path(out)
+    else:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / (datetime.utcnow().strftime("%Y%m%dT%H%M%S") + ".json")
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Resultados en {path}")
+
+    for row in report["uncovered"]:
+        print(f"  sin escenario: {row['method']} {row['route']}")
+
+    previous = _arg_value(argv, "--compare")
+    if previous:
+        print(f"{'escenario':28} {'p95 antes':>10} {'p95 ahora':>10} {'cambio':>8}")
+        for name, old, new, change in compare(report, json.loads(Path(previous).read_text())):
+            print(f"{name:28} {old:10.2f} {new:10.2f} {change:+7.1f}%")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
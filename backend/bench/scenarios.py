@@ -0,0 +1,307 @@
+# Escenarios del benchmark: una o más peticiones representativas por ruta de la API.
+# Cada escenario arma la petición i a partir del contexto (IDs muestreados del catálogo y
+# entidades creadas por escenarios anteriores). El orden importa: primero se crean
+# entidades, luego se leen/modifican y al final se eliminan, así una corrida no deja
+# residuos en la base.
+import json
+import string
+
+from bson import ObjectId
+
+from utils.mongodb import get_async_collection
+from utils.playlist_items import ITEMS_COLLECTION
+from utils.security import create_jwt_token
+
+
+class BenchContext:
+    """
+    IDs de muestra por tipo, tokens y entidades creadas durante la corrida.
+    """
+
+    def __init__(self, run_tag: str):
+        self.run_tag = run_tag          # solo letras: los nombres de artista no admiten dígitos
+        self.samples = {}               # tipo -> [doc]
+        self.created = {}               # tipo -> [id]
+        self.user_headers = {}
+        self.admin_headers = {}
+        self.owner_headers = {}         # playlist_id -> headers del dueño
+        self.playlist_songs = {}        # playlist_id -> canciones presentes (ver load_playlist_songs)
+        self.album_artists = {}         # álbum creado -> artista
+
+    def sample(self, kind: str, i: int) -> dict:
+        docs = self.samples[kind]
+        return docs[i % len(docs)]
+
+    def created_id(self, kind: str, i: int) -> str:
+        ids = self.created.get(kind) or ["000000000000000000000000"]
+        return ids[i % len(ids)]
+
+    def take(self, kind: str) -> str:
+        # Consume un ID creado (para los DELETE); sin IDs la petición da 404 y cuenta como error
+        ids = self.created.get(kind)
+        return ids.pop() if ids else "000000000000000000000000"
+
+    def remember(self, kind: str, response):
+        if response.status_code < 400:
+            body = response.json()
+            if isinstance(body, dict) and body.get("id"):
+                self.created.setdefault(kind, []).append(body["id"])
+                return body["id"]
+        return None
+
+    def remember_album(self, response):
+        # La canción creada debe usar el mismo artista que su álbum
+        album_id = self.remember("album", response)
+        if album_id:
+            self.album_artists[album_id] = json.loads(response.request.content)["artist"]
+
+    @staticmethod
+    def letters(i: int) -> str:
+        # 0 -> "a", 25 -> "z", 26 -> "ba"...: sufijo único con letras
+        digits = string.ascii_lowercase
+        out = ""
+        while True:
+            out = digits[i % 26] + out
+            i //= 26
+            if not i:
+                return out
+
+    async def load(self, sample_size: int):
+        for kind, collection, projection in (
+            ("song", "songs", {"artist": 1, "album": 1, "title": 1}),
+            ("album", "album", {"artist": 1, "genre": 1}),
+            ("artist", "artist", {"name": 1}),
+            ("genre", "genre", {"name": 1}),
+            ("playlist", "playlist", {"user": 1, "storage": 1}),
+            ("user", "users", {"email": 1}),
+        ):
+            cursor = await get_async_collection(collection).aggregate(
+                [{"$sample": {"size": sample_size}}, {"$project": projection}]
+            )
+            docs = await cursor.to_list()
+            if not docs:
+                raise RuntimeError(f"La colección '{collection}' está vacía: genera el catálogo con bench.dataset")
+            self.samples[kind] = [{**d, "_id": str(d["_id"])} for d in docs]
+
+        user = (await get_async_collection("users").find_one({}, {"email": 1})) or {}
+        user_id = str(user.get("_id", ObjectId()))
+        self.user_headers = _headers(user_id, user.get("email", "bench@bench.local"))
+        self.admin_headers = _headers(user_id, user.get("email", "bench@bench.local"), admin=True)
+        for p in self.samples["playlist"]:
+            self.owner_headers[p["_id"]] = _headers(p["user"], f"{p['user']}@bench.local")
+
+    async def load_items(self):
+        # Items de las playlists creadas (ya convertidas a playlist_items)
+        ids = [ObjectId(p) for p in self.created.get("playlist", [])]
+        docs = await get_async_collection(ITEMS_COLLECTION).find(
+            {"playlist_id": {"$in": ids}}, {"playlist_id": 1}
+        ).to_list()
+        self.created["item"] = [(str(d["playlist_id"]), str(d["_id"])) for d in docs]
+
+
+    async def load_playlist_songs(self):
+        # Canciones actuales de las playlists de muestra (arreglo embebido o playlist_items)
+        ids = [ObjectId(p["_id"]) for p in self.samples["playlist"]]
+        self.playlist_songs = {str(oid): set() for oid in ids}
+        for p in await get_async_collection("playlist").find({"_id": {"$in": ids}}, {"songs": 1}).to_list():
+            self.playlist_songs[str(p["_id"])].update(p.get("songs") or [])
+        docs = await get_async_collection(ITEMS_COLLECTION).find(
+            {"playlist_id": {"$in": ids}}, {"playlist_id": 1, "song_id": 1}
+        ).to_list()
+        for d in docs:
+            self.playlist_songs[str(d["playlist_id"])].add(d["song_id"])
+
+
+def _headers(user_id: str, email: str, admin: bool = False) -> dict:
+    token = create_jwt_token("Bench", "User", email, True, admin, user_id)
+    return {"Authorization": f"Bearer {token}"}
+
+
+class Scenario:
+    def __init__(self, name: str, method: str, route: str, build, on_response=None,
+                 prepare=None, mutates: bool = False):
+        self.name = name
+        self.method = method
+        self.route = route              # plantilla de la ruta (cobertura contra app.routes)
+        self.build = build              # (ctx, i) -> {"path", "params"?, "json"?, "headers"?}
+        self.on_response = on_response  # (ctx, response) tras cada petición
+        self.prepare = prepare          # async (ctx) antes de empezar
+        self.mutates = mutates
+
+
+def _req(path: str, **kwargs) -> dict:
+    return {"path": path, **kwargs}
+
+
+def _song_ids(ctx, i, n=20):
+    return [ctx.sample("song", i + k)["_id"] for k in range(n)]
+
+
+SCENARIOS = [
+    # ---------------- Servicio ----------------
+    Scenario("root", "GET", "/", lambda ctx, i: _req("/")),
+    Scenario("health", "GET", "/health", lambda ctx, i: _req("/health")),
+    Scenario("ready", "GET", "/ready", lambda ctx, i: _req("/ready")),
+    Scenario("metrics", "GET", "/metrics", lambda ctx, i: _req("/metrics")),
+    Scenario("example user", "GET", "/exampleuser",
+             lambda ctx, i: _req("/exampleuser", headers=ctx.user_headers)),
+    Scenario("example admin", "GET", "/exampleadmin",
+             lambda ctx, i: _req("/exampleadmin", headers=ctx.admin_headers)),
+    Scenario("token cache stats", "GET", "/auth/token-cache",
+             lambda ctx, i: _req("/auth/token-cache", headers=ctx.admin_headers)),
+
+    # ---------------- Géneros ----------------
+    Scenario("create genre", "POST", "/genres/",
+             lambda ctx, i: _req("/genres/", json={"name": f"Bench {ctx.run_tag} {ctx.letters(i)}"},
+                                 headers=ctx.user_headers),
+             on_response=lambda ctx, r: ctx.remember("genre", r), mutates=True),
+    Scenario("list genres", "GET", "/genres/", lambda ctx, i: _req("/genres/")),
+    Scenario("list genres page", "GET", "/genres/", lambda ctx, i: _req("/genres/", params={"limit": 20})),
+    Scenario("get genre", "GET", "/genres/{genre_id}",
+             lambda ctx, i: _req(f"/genres/{ctx.sample('genre', i)['_id']}")),
+    Scenario("update genre", "PUT", "/genres/{genre_id}",
+             lambda ctx, i: _req(f"/genres/{ctx.created_id('genre', i)}",
+                                 json={"name": f"Bench {ctx.run_tag} {ctx.letters(i)} x"},
+                                 headers=ctx.user_headers), mutates=True),
+
+    # ---------------- Artistas ----------------
+    Scenario("create artist", "POST", "/artists/",
+             lambda ctx, i: _req("/artists/", json={
+                 "name": f"Bench {ctx.run_tag} {ctx.letters(i)}", "country": "Chile",
+                 "genre": [ctx.sample("genre", i)["_id"]],
+             }, headers=ctx.user_headers),
+             on_response=lambda ctx, r: ctx.remember("artist", r), mutates=True),
+    Scenario("list artists", "GET", "/artists/", lambda ctx, i: _req("/artists/", params={"limit": 50})),
+    Scenario("artists batch", "POST", "/artists/batch",
+             lambda ctx, i: _req("/artists/batch", json={"ids": [ctx.sample("artist", i + k)["_id"] for k in range(20)]})),
+    Scenario("top artist", "GET", "/artists/statistics/top", lambda ctx, i: _req("/artists/statistics/top")),
+    Scenario("artist albums", "GET", "/artists/{artist_id}/albums",
+             lambda ctx, i: _req(f"/artists/{ctx.sample('album', i)['artist']}/albums")),
+    Scenario("update artist", "PUT", "/artists/{artist_id}",
+             lambda ctx, i: _req(f"/artists/{ctx.created_id('artist', i)}", json={"country": "Peru"},
+                                 headers=ctx.user_headers), mutates=True),
+    Scenario("assign genres", "PATCH", "/artists/{artist_id}/assign-genres",
+             lambda ctx, i: _req(f"/artists/{ctx.created_id('artist', i)}/assign-genres",
+                                 json={"genre_ids": [ctx.sample("genre", i + k)["_id"] for k in range(2)]},
+                                 headers=ctx.user_headers), mutates=True),
+
+    # ---------------- Álbumes ----------------
+    Scenario("create album", "POST", "/albums/",
+             lambda ctx, i: _req("/albums/", json={
+                 "title": f"Bench {ctx.run_tag} {ctx.letters(i)}", "year": 2024,
+                 "genre": ctx.sample("album", i)["genre"], "artist": ctx.sample("album", i)["artist"],
+             }, headers=ctx.user_headers),
+             on_response=lambda ctx, r: ctx.remember_album(r), mutates=True),
+    Scenario("list albums", "GET", "/albums/", lambda ctx, i: _req("/albums/", params={"limit": 50})),
+    Scenario("albums batch", "POST", "/albums/batch",
+             lambda ctx, i: _req("/albums/batch", json={"ids": [ctx.sample("album", i + k)["_id"] for k in range(20)]})),
+    Scenario("album most songs", "GET", "/albums/statistics/most-songs",
+             lambda ctx, i: _req("/albums/statistics/most-songs")),
+    Scenario("album least songs", "GET", "/albums/statistics/least-songs",
+             lambda ctx, i: _req("/albums/statistics/least-songs")),
+    Scenario("update album", "PATCH", "/albums/{album_id}",
+             lambda ctx, i: _req(f"/albums/{ctx.created_id('album', i)}", json={"year": 2025},
+                                 headers=ctx.user_headers), mutates=True),
+
+    # ---------------- Canciones ----------------
+    Scenario("create song", "POST", "/songs/",
+             lambda ctx, i: _req("/songs/", json={
+                 "title": f"Bench {ctx.run_tag} {ctx.letters(i)}", "duration": 200,
+                 "album": ctx.created_id("album", i),
+                 "artist": ctx.album_artists.get(ctx.created_id("album", i), ""),
+             }, headers=ctx.user_headers),
+             on_response=lambda ctx, r: ctx.remember("song", r), mutates=True),
+    Scenario("list songs", "GET", "/songs/", lambda ctx, i: _req("/songs/", params={"limit": 50})),
+    Scenario("songs batch", "POST", "/songs/batch", lambda ctx, i: _req("/songs/batch", json={"ids": _song_ids(ctx, i)})),
+    Scenario("songs by artist", "GET", "/songs/by-artist/{artist_id}",
+             lambda ctx, i: _req(f"/songs/by-artist/{ctx.sample('song', i)['artist']}")),
+    Scenario("songs by album", "GET", "/songs/by-album/{album_id}",
+             lambda ctx, i: _req(f"/songs/by-album/{ctx.sample('song', i)['album']}")),
+    Scenario("search songs", "GET", "/songs/search",
+             lambda ctx, i: _req("/songs/search", params={"name": ctx.sample("song", i)["title"].split()[0]})),
+    Scenario("search songs fuzzy", "GET", "/songs/search",
+             lambda ctx, i: _req("/songs/search", params={"name": ctx.sample("song", i)["title"][:-1] + "x",
+                                                          "fuzzy": "true"})),
+    Scenario("autocomplete", "GET", "/autocomplete/",
+             lambda ctx, i: _req("/autocomplete/", params={"q": ctx.sample("song", i)["title"][:3]})),
+    Scenario("update song", "PATCH", "/songs/{song_id}",
+             lambda ctx, i: _req(f"/songs/{ctx.created_id('song', i)}", json={"duration": 201},
+                                 headers=ctx.user_headers), mutates=True),
+
+    # ---------------- Playlists ----------------
+    Scenario("create playlist", "POST", "/playlists/",
+             lambda ctx, i: _req("/playlists/", json={"name": f"Bench {i}", "songs": _song_ids(ctx, i, 10)},
+                                 headers=ctx.user_headers),
+             on_response=lambda ctx, r: ctx.remember("playlist", r), mutates=True),
+    Scenario("list playlists", "GET", "/playlists/",
+             lambda ctx, i: _req("/playlists/", headers=ctx.owner_headers[ctx.sample("playlist", i)["_id"]])),
+    Scenario("get playlist", "GET", "/playlists/{playlist_id}",
+             lambda ctx, i: _req(f"/playlists/{ctx.sample('playlist', i)['_id']}",
+                                 headers=ctx.owner_headers[ctx.sample("playlist", i)["_id"]])),
+    Scenario("get playlist expanded", "GET", "/playlists/{playlist_id}",
+             lambda ctx, i: _req(f"/playlists/{ctx.sample('playlist', i)['_id']}", params={"expand": "songs"},
+                                 headers=ctx.owner_headers[ctx.sample("playlist", i)["_id"]])),
+    Scenario("add songs to playlist", "PATCH", "/playlists/{playlist_id}/add-song",
+             lambda ctx, i: _req(f"/playlists/{ctx.created_id('playlist', i)}/add-song",
+                                 json={"song_ids": _song_ids(ctx, i + 50, 5)}, headers=ctx.user_headers),
+             mutates=True),
+    Scenario("remove songs from playlist", "PATCH", "/playlists/{playlist_id}/remove-song",
+             lambda ctx, i: _req(f"/playlists/{ctx.created_id('playlist', i)}/remove-song",
+                                 json={"song_ids": _song_ids(ctx, i + 50, 2)}, headers=ctx.user_headers),
+             mutates=True),
+    Scenario("convert playlist storage", "POST", "/playlists/{playlist_id}/convert-storage",
+             lambda ctx, i: _req(f"/playlists/{ctx.created_id('playlist', i)}/convert-storage",
+                                 headers=ctx.user_headers), mutates=True),
+    Scenario("list playlist items", "GET", "/playlists/{playlist_id}/items",
+             lambda ctx, i: _req(f"/playlists/{ctx.created_id('playlist', i)}/items", params={"limit": 20},
+                                 headers=ctx.user_headers)),
+    Scenario("move playlist item", "PATCH", "/playlists/{playlist_id}/items/{item_id}/move",
+             lambda ctx, i: _req("/playlists/{}/items/{}/move".format(*ctx.created["item"][i % len(ctx.created["item"])]),
+                                 json={"after": None}, headers=ctx.user_headers),
+             prepare=lambda ctx: ctx.load_items(), mutates=True),
+    Scenario("remove playlist item", "DELETE", "/playlists/{playlist_id}/items/{item_id}",
+             lambda ctx, i: _req("/playlists/{}/items/{}".format(*ctx.created["item"].pop()),
+                                 headers=ctx.user_headers), mutates=True),
+
+    # ---------------- Limpieza (también medida) ----------------
+    Scenario("delete playlist", "DELETE", "/playlists/{playlist_id}",
+             lambda ctx, i: _req(f"/playlists/{ctx.take('playlist')}", headers=ctx.user_headers), mutates=True),
+    Scenario("delete song", "DELETE", "/songs/{song_id}",
+             lambda ctx, i: _req(f"/songs/{ctx.take('song')}", headers=ctx.user_headers), mutates=True),
+    Scenario("delete album", "DELETE", "/albums/{album_id}",
+             lambda ctx, i: _req(f"/albums/{ctx.take('album')}", headers=ctx.user_headers), mutates=True),
+    Scenario("delete artist", "DELETE", "/artists/{artist_id}",
+             lambda ctx, i: _req(f"/artists/{ctx.take('artist')}", headers=ctx.user_headers), mutates=True),
+    Scenario("delete genre", "DELETE", "/genres/{genre_id}",
+             lambda ctx, i: _req(f"/genres/{ctx.take('genre')}", headers=ctx.user_headers), mutates=True),
+]
+
+# Rutas sin escenario y por qué
+SKIPPED_ROUTES = {
+    ("POST", "/auth/register"): "crea usuarios en Firebase (servicio externo)",
+    ("POST", "/auth/login"): "autentica contra Firebase (servicio externo)",
+    ("POST", "/auth/refresh"): "requiere un refresh token emitido por /auth/login",
+    ("POST", "/auth/logout"): "requiere un refresh token emitido por /auth/login",
+    ("GET", "/auth/me"): "declara Depends(validate_user) con el decorador; responde 422 sin ?route_function",
+    ("GET", "/admin/profiling/"): "herramienta de diagnóstico, no es tráfico de la API",
+    ("POST", "/admin/profiling/arm"): "herramienta de diagnóstico, no es tráfico de la API",
+    ("DELETE", "/admin/profiling/arm"): "herramienta de diagnóstico, no es tráfico de la API",
+    ("GET", "/admin/profiling/{profile_id}"): "herramienta de diagnóstico, no es tráfico de la API",
+    ("GET", "/openapi.json"): "documentación generada por FastAPI",
+    ("GET", "/docs"): "documentación generada por FastAPI",
+    ("GET", "/docs/oauth2-redirect"): "documentación generada por FastAPI",
+    ("GET", "/redoc"): "documentación generada por FastAPI",
+}
+
+
+def uncovered_routes(app) -> list:
+    """
+    Rutas de la app sin escenario ni motivo de exclusión: [(método, ruta)].
+    """
+    covered = {(s.method, s.route) for s in SCENARIOS} | set(SKIPPED_ROUTES)
+    missing = []
+    for route in app.routes:
+        for method in sorted(getattr(route, "methods", None) or ()):
+            if method != "HEAD" and (method, route.path) not in covered:
+                missing.append((method, route.path))
+    return missing
@@ -1,173 +1,269 @@
-from fastapi.encoders import jsonable_encoder
 from models.album import Album, AlbumUpdate
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, write_session
+from utils.pagination import fetch_page
+from utils.streaming import stream_cursor
+from utils.references import fetch_by_ids, pick_fields, require_references
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from typing import Optional
 from fastapi import HTTPException, Request
-from pipelines.album_pipeline import (
-    artist_with_most_albums_pipeline,
-    artists_with_least_albums_pipeline,
-    album_with_most_songs_pipeline,
-    albums_with_least_songs_pipeline
-)
+from utils import catalog_stats
+from utils.cache import cached, invalidates
+from search import service as search_service
+
+def _to_out(doc: dict) -> dict:
+    doc["id"] = str(doc.pop("_id"))
+    if doc.get("genre_id") is not None:
+        doc["genre_id"] = str(doc["genre_id"])
+    return doc
+
 
 # POST /albums - Crear un nuevo álbum
-def create_album(album: Album, request: Request): 
+@invalidates("album", "artist", "songs", "catalog_stats")
+async def create_album(album: Album, request: Request): 
     try:
         # Opcional: obtener el email del usuario autenticado
-        user_email = request.state.user_email
+        user_email = request.state.user["email"]
 
-        album_coll = get_collection("album")
-        artist_coll = get_collection("artist")
-        genre_coll = get_collection("genre")
-        song_coll = get_collection("songs")
+        album_coll = get_async_collection("album")
+        artist_coll = get_async_collection("artist")
+        genre_coll = get_async_collection("genre")
+        song_coll = get_async_collection("songs")
 
         if not ObjectId.is_valid(album.artist):
             raise HTTPException(status_code=400, detail="Invalid artist ID")
 
-        artist = artist_coll.find_one({"_id": ObjectId(album.artist)})
+        artist = await artist_coll.find_one({"_id": ObjectId(album.artist)})
         if not artist:
             raise HTTPException(status_code=404, detail=f"Artist with ID '{album.artist}' not found")
 
-        if not genre_coll.find_one({"name": album.genre}):
+        genre = await genre_coll.find_one({"name": album.genre}, {"_id": 1})
+        if not genre:
             raise HTTPException(status_code=404, detail=f"Genre '{album.genre}' not found")
 
         if album.songs:
-            for song_id in album.songs:
-                if not ObjectId.is_valid(song_id):
-                    raise HTTPException(status_code=400, detail="Invalid song ID")
-                song_doc = song_coll.find_one({"_id": ObjectId(song_id)})
-                if not song_doc:
-                    raise HTTPException(status_code=404, detail=f"Song '{song_id}' not found")
-                if song_doc.get("artist") != album.artist:
-                    raise HTTPException(status_code=400, detail="Song artist mismatch")
-
-        if album_coll.find_one({"title": album.title, "artist": album.artist}):
-            raise HTTPException(status_code=400, detail="Album already exists")
+            await require_references(
+                "songs", album.songs, "Song",
+                projection={"artist": 1}, expected={"artist": album.artist},
+            )
 
         data = album.model_dump()
-        result = album_coll.insert_one(data)
-
-        artist_coll.update_one(
-            {"_id": ObjectId(album.artist)},
-            {"$addToSet": {"albums": str(result.inserted_id)}}
-        )
-
-        if album.songs:
-            for song_id in album.songs:
-                song_coll.update_one(
-                    {"_id": ObjectId(song_id)},
-                    {"$set": {"album": str(result.inserted_id)}}
+        # Referencia canónica al género (el nombre se mantiene por compatibilidad)
+        data["genre_id"] = genre["_id"]
+        async with write_session() as session:
+            result = await album_coll.insert_one(data, session=session)
+
+            await artist_coll.update_one(
+                {"_id": ObjectId(album.artist)},
+                {"$addToSet": {"albums": str(result.inserted_id)}},
+                session=session,
+            )
+
+            if album.songs:
+                await song_coll.update_many(
+                    {"_id": {"$in": [ObjectId(sid) for sid in album.songs]}},
+                    {"$set": {"album": str(result.inserted_id)}},
+                    session=session,
                 )
 
+            await catalog_stats.set_album_stats(
+                result.inserted_id, album.title, len(album.songs or []), session=session
+            )
+            await catalog_stats.inc_artist_albums(
+                {album.artist: 1}, names={album.artist: artist.get("name")}, session=session
+            )
+
+        search_service.index_album(result.inserted_id, album.title)
         return {"msg": "Album created", "id": str(result.inserted_id)}
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        # Índice único (title, artist)
+        raise HTTPException(status_code=400, detail="Album already exists")
     except Exception:
         raise HTTPException(status_code=500, detail="Error creating the album")
 
 
-# GET /albums - Listar todos los álbumes
-def list_albums():
+# GET /albums - Listar álbumes (paginado por cursor si se envía limit o cursor)
+async def list_albums(limit: Optional[int] = None, cursor: Optional[str] = None,
+                      stream: Optional[str] = None):
     try:
-        coll = get_collection("album")
-        albums = list(coll.find())
-        for alb in albums:
-            alb["id"] = str(alb["_id"])
-            del alb["_id"]
+        coll = get_async_collection("album")
+        if stream:
+            return stream_cursor(coll.find(), _to_out, stream)
+
+        paginated = limit is not None or cursor is not None
+        if paginated:
+            albums, next_cursor = await fetch_page(coll, {}, limit, cursor)
+        else:
+            albums = await coll.find().to_list()
+        albums = [_to_out(alb) for alb in albums]
+        if paginated:
+            return {"items": albums, "next_cursor": next_cursor}
         return albums
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Error retrieving albums")
+
+
+# POST /albums/batch - Obtener un conjunto de álbumes por ID (una sola consulta, en el orden pedido)
+async def get_albums_batch(ids: list[str], fields: Optional[list[str]] = None):
+    try:
+        albums, missing = await fetch_by_ids("album", ids, fields)
+        return {"items": [pick_fields(_to_out(a), fields) for a in albums], "missing": missing}
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=500, detail="Error retrieving albums")
 
 
 # PATCH /albums/{album_id} - Actualizar álbum por ID
-def patch_album(album_id: str, album: AlbumUpdate):
+# Si no cambian artista ni canciones basta un find_one_and_update. Si cambian, se lee el
+# álbum para calcular las diferencias y la escritura se condiciona a que artista y canciones
+# sigan igual (si otro cambio se adelantó responde 409).
+@invalidates("album", "artist", "songs", "catalog_stats")
+async def patch_album(album_id: str, album: AlbumUpdate):
     try:
-        coll = get_collection("album")
-        artist_coll = get_collection("artist")
-        genre_coll = get_collection("genre")
-        song_coll = get_collection("songs")
+        coll = get_async_collection("album")
+        artist_coll = get_async_collection("artist")
+        genre_coll = get_async_collection("genre")
+        song_coll = get_async_collection("songs")
 
         if not ObjectId.is_valid(album_id):
             raise HTTPException(status_code=400, detail="Invalid album ID")
 
-        existing = coll.find_one({"_id": ObjectId(album_id)})
-        if not existing:
-            raise HTTPException(status_code=404, detail="Album not found")
-
         update_data = album.model_dump(exclude_unset=True)
+        if not update_data:
+            raise HTTPException(status_code=400, detail="Nothing to update")
 
         if "artist" in update_data:
             if not ObjectId.is_valid(update_data["artist"]):
                 raise HTTPException(status_code=400, detail="Invalid artist ID")
-            new_artist = artist_coll.find_one({"_id": ObjectId(update_data["artist"])})
+            new_artist = await artist_coll.find_one({"_id": ObjectId(update_data["artist"])}, {"name": 1})
             if not new_artist:
                 raise HTTPException(status_code=404, detail=f"Artist with ID '{update_data['artist']}' not found")
 
-        if "genre" in update_data and not genre_coll.find_one({"name": update_data["genre"]}):
-            raise HTTPException(status_code=404, detail=f"Genre '{update_data['genre']}' not found")
-
-        if "songs" in update_data:
-            for song_id in update_data["songs"]:
-                if not ObjectId.is_valid(song_id):
-                    raise HTTPException(status_code=400, detail="Invalid song ID")
-                song_doc = song_coll.find_one({"_id": ObjectId(song_id)})
-                if not song_doc:
-                    raise HTTPException(status_code=404, detail=f"Song '{song_id}' not found")
-                if song_doc.get("artist") != update_data.get("artist", existing["artist"]):
-                    raise HTTPException(status_code=400, detail="Song artist mismatch")
-
-        coll.update_one({"_id": ObjectId(album_id)}, {"$set": update_data})
-
-        if "songs" in update_data:
-            old_songs = set(existing.get("songs", []))
-            new_songs = set(update_data["songs"])
-            removed = old_songs - new_songs
-            added = new_songs - old_songs
-
-            for sid in removed:
-                song_coll.update_one({"_id": ObjectId(sid)}, {"$unset": {"album": ""}})
-            for sid in added:
-                song_coll.update_one({"_id": ObjectId(sid)}, {"$set": {"album": album_id}})
-
-        if "artist" in update_data and update_data["artist"] != existing.get("artist"):
-            artist_coll.update_one({"_id": ObjectId(existing["artist"])} ,{"$pull": {"albums": album_id}})
-            artist_coll.update_one({"_id": ObjectId(update_data["artist"])} ,{"$addToSet": {"albums": album_id}})
-
-        updated = {**existing, **update_data}
-        return {"msg": "Album updated", "album": jsonable_encoder(updated)}
+        if "genre" in update_data:
+            genre = await genre_coll.find_one({"name": update_data["genre"]}, {"_id": 1})
+            if not genre:
+                raise HTTPException(status_code=404, detail=f"Genre '{update_data['genre']}' not found")
+            update_data["genre_id"] = genre["_id"]
+
+        album_filter = {"_id": ObjectId(album_id)}
+        song_ops = []
+        artist_ops = []
+        relational = "artist" in update_data or update_data.get("songs") is not None
+        if relational:
+            existing = await coll.find_one(album_filter, {"artist": 1, "songs": 1})
+            if not existing:
+                raise HTTPException(status_code=404, detail="Album not found")
+            album_filter.update({"artist": existing.get("artist"), "songs": existing.get("songs")})
+
+            if update_data.get("songs"):
+                await require_references(
+                    "songs", update_data["songs"], "Song",
+                    projection={"artist": 1},
+                    expected={"artist": update_data.get("artist", existing["artist"])},
+                )
+
+            if update_data.get("songs") is not None:
+                old_songs = set(existing.get("songs", []))
+                new_songs = set(update_data["songs"])
+                removed = old_songs - new_songs
+                added = new_songs - old_songs
+
+                if removed:
+                    song_ops.append(UpdateMany(
+                        {"_id": {"$in": [ObjectId(sid) for sid in removed]}}, {"$unset": {"album": ""}}
+                    ))
+                if added:
+                    song_ops.append(UpdateMany(
+                        {"_id": {"$in": [ObjectId(sid) for sid in added]}}, {"$set": {"album": album_id}}
+                    ))
+
+            if "artist" in update_data and update_data["artist"] != existing.get("artist"):
+                artist_ops = [
+                    UpdateOne({"_id": ObjectId(existing["artist"])}, {"$pull": {"albums": album_id}}),
+                    UpdateOne({"_id": ObjectId(update_data["artist"])}, {"$addToSet": {"albums": album_id}}),
+                ]
+
+        async with write_session() as session:
+            updated = await coll.find_one_and_update(
+                album_filter, {"$set": update_data},
+                return_document=ReturnDocument.AFTER, session=session,
+            )
+            if not updated:
+                if relational:
+                    raise HTTPException(status_code=409, detail="Album was modified concurrently, retry")
+                raise HTTPException(status_code=404, detail="Album not found")
+
+            if song_ops:
+                await song_coll.bulk_write(song_ops, session=session)
+            if artist_ops:
+                await artist_coll.bulk_write(artist_ops, session=session)
+                await catalog_stats.inc_artist_albums(
+                    {existing["artist"]: -1, update_data["artist"]: 1},
+                    names={update_data["artist"]: new_artist.get("name")},
+                    session=session,
+                )
+
+            await catalog_stats.update_album_stats(
+                album_id,
+                title=update_data.get("title"),
+                song_count=len(update_data["songs"]) if update_data.get("songs") is not None else None,
+                session=session,
+            )
+
+        if update_data.get("title"):
+            search_service.index_album(album_id, update_data["title"])
+        return {"msg": "Album updated", "album": _to_out(updated)}
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Album already exists")
     except Exception:
         raise HTTPException(status_code=500, detail="Error updating the album")
 
 
 # DELETE /albums/{album_id} - Eliminar álbum por ID
-def delete_album(album_id: str):
+@invalidates("album", "artist", "songs", "catalog_stats")
+async def delete_album(album_id: str):
     try:
-        coll = get_collection("album")
-        artist_coll = get_collection("artist")
-        song_coll = get_collection("songs")
+        coll = get_async_collection("album")
+        artist_coll = get_async_collection("artist")
+        song_coll = get_async_collection("songs")
 
         if not ObjectId.is_valid(album_id):
             raise HTTPException(status_code=400, detail="Invalid album ID")
 
-        album = coll.find_one({"_id": ObjectId(album_id)})
+        album = await coll.find_one({"_id": ObjectId(album_id)})
         if not album:
             raise HTTPException(status_code=404, detail="Album not found")
 
-        result = coll.delete_one({"_id": ObjectId(album_id)})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Album not found")
+        async with write_session() as session:
+            result = await coll.delete_one({"_id": ObjectId(album_id)}, session=session)
+            if result.deleted_count == 0:
+                raise HTTPException(status_code=404, detail="Album not found")
+
+            if album.get("songs"):
+                await song_coll.update_many(
+                    {"_id": {"$in": [ObjectId(sid) for sid in album["songs"]]}},
+                    {"$unset": {"album": ""}},
+                    session=session,
+                )
 
-        if album.get("songs"):
-            for sid in album["songs"]:
-                song_coll.update_one({"_id": ObjectId(sid)}, {"$unset": {"album": ""}})
+            await artist_coll.update_one(
+                {"_id": ObjectId(album["artist"])},
+                {"$pull": {"albums": album_id}},
+                session=session,
+            )
 
-        artist_coll.update_one(
-            {"_id": ObjectId(album["artist"])},
-            {"$pull": {"albums": album_id}}
-        )
+            await catalog_stats.remove_album_stats(album_id, session=session)
+            await catalog_stats.inc_artist_albums({album["artist"]: -1}, session=session)
 
+        search_service.unindex_album(album_id)
         return {"msg": "Album deleted"}
     except HTTPException:
         raise
@@ -176,44 +272,37 @@ def delete_album(album_id: str):
 
 
 # GET /albums/statistics/most-songs - Álbum con más canciones
+@cached("catalog_stats")
 async def album_with_most_songs():
     try:
-        coll = get_collection("album")
-        pipeline = album_with_most_songs_pipeline()
-        result = list(coll.aggregate(pipeline))
-        return result[0] if result else {}
+        return await catalog_stats.album_with_most_songs()
     except Exception:
         raise HTTPException(status_code=500, detail="Error retrieving statistics")
 
 
 # GET /albums/statistics/least-songs - Álbumes con menos canciones
+@cached("catalog_stats")
 async def albums_with_least_songs():
     try:
-        coll = get_collection("album")
-        pipeline = albums_with_least_songs_pipeline()
-        result = list(coll.aggregate(pipeline))
-        return result[0] if result else {}
+        return await catalog_stats.albums_with_least_songs()
     except Exception:
         raise HTTPException(status_code=500, detail="Error retrieving statistics")
 
 
 # GET /albums/statistics/top - Artista con más álbumes
+@cached("catalog_stats")
 async def get_album_statistics():
     try:
-        album_coll = get_collection("album")
-        pipeline = artist_with_most_albums_pipeline()
-        result = list(album_coll.aggregate(pipeline))
+        result = await catalog_stats.artists_by_album_count(limit=1, descending=True)
         return result[0] if result else {}
     except Exception:
         raise HTTPException(status_code=500, detail="Error retrieving statistics")
 
 
 # GET /albums/statistics/least - Artistas con menos álbumes
+@cached("catalog_stats")
 async def get_artists_with_least_albums():
     try:
-        album_coll = get_collection("album")
-        pipeline = artists_with_least_albums_pipeline(limit=5)
-        results = list(album_coll.aggregate(pipeline))
-        return results
+        return await catalog_stats.artists_by_album_count(limit=5, descending=False)
     except Exception:
         raise HTTPException(status_code=500, detail="Error retrieving statistics")
@@ -1,7 +1,15 @@
 from models.artist import ArtistCreate, ArtistUpdate
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection
+from utils.references import fetch_by_ids, pick_fields, require_references
+from utils import catalog_stats
+from utils.cache import cached, invalidates
+from search import service as search_service
+from utils.pagination import DEFAULT_PAGE_SIZE, keyset_filter, keyset_sort, split_page
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from fastapi import HTTPException, Request
+from typing import Optional
 import traceback
 from pipelines.artist_pipeline import artist_with_genres_pipeline
 
@@ -27,102 +35,132 @@ def convert_object_ids(doc: dict) -> dict:
 
 
 # Crear artista
+@invalidates("artist")
 async def create_artist(artist: ArtistCreate, request: Request):
     try:
         user_email = request.state.user["email"]
-        artist_coll = get_collection("artist")
-        genre_coll = get_collection("genre")
-
-        genre_ids = []
-        for genre_id in artist.genre:
-            if not ObjectId.is_valid(genre_id):
-                raise HTTPException(
-                    status_code=400, detail=f"Invalid genre ID '{genre_id}'"
-                )
-            genre_doc = genre_coll.find_one({"_id": ObjectId(genre_id)})
-            if not genre_doc:
-                raise HTTPException(status_code=404, detail=f"Genre '{genre_id}' not found")
-            genre_ids.append(genre_doc["_id"])
-
-        if artist_coll.find_one({"name": artist.name}):
-            raise HTTPException(status_code=400, detail="El artista ya existe")
+        artist_coll = get_async_collection("artist")
+
+        await require_references("genre", artist.genre, "Genre", projection={"_id": 1})
+        genre_ids = [ObjectId(genre_id) for genre_id in artist.genre]
 
         artist_data = artist.dict()
         artist_data["genre"] = genre_ids
 
-        result = artist_coll.insert_one(artist_data)
+        result = await artist_coll.insert_one(artist_data)
+        search_service.index_artist(result.inserted_id, artist.name, artist.genre)
 
         return {
             "msg": f"Artista '{artist.name}' registrado exitosamente",
             "id": str(result.inserted_id)
         }
 
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        # Índice único por nombre
+        raise HTTPException(status_code=400, detail="El artista ya existe")
     except Exception:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Error al registrar el artista")
 
 
-# Obtener artistas con géneros
-async def list_artists():
-    try:
-        artist_coll = get_collection("artist")
-        pipeline = artist_with_genres_pipeline()
-        results = list(artist_coll.aggregate(pipeline))
+def _artist_out(artist: dict) -> dict:
+    artist["id"] = str(artist.pop("_id"))
+    artist["albums"] = [str(aid) for aid in artist.get("albums", [])]
 
-        for artist in results:
-            artist["id"] = str(artist.pop("_id"))
-            artist["albums"] = [str(aid) for aid in artist.get("albums", [])]
+    raw_genres = artist.pop("genre", [])
+    if isinstance(raw_genres, list):
+        artist["genre_ids"] = [str(gid) for gid in raw_genres]
+    elif raw_genres:
+        # handle legacy data where genre was stored as a single string
+        # (python -m utils.migrate_refs lo convierte en lista de ObjectId)
+        artist["genre_ids"] = [str(raw_genres)]
+    else:
+        artist["genre_ids"] = []
 
-            raw_genres = artist.pop("genre", [])
-            if isinstance(raw_genres, list):
-                artist["genre_ids"] = [str(gid) for gid in raw_genres]
-            elif raw_genres:
-                # handle legacy data where genre was stored as a single string
-                artist["genre_ids"] = [str(raw_genres)]
-            else:
-                artist["genre_ids"] = []
+    artist.pop("genres", None)
+    return artist
 
-            artist.pop("genres", None)
 
+# Obtener artistas con géneros (paginado por cursor si se envía limit o cursor)
+@cached("artist")
+async def list_artists(limit: Optional[int] = None, cursor: Optional[str] = None):
+    try:
+        artist_coll = get_async_collection("artist")
+        pipeline = artist_with_genres_pipeline()
+
+        paginated = limit is not None or cursor is not None
+        if paginated:
+            page_size = limit or DEFAULT_PAGE_SIZE
+            pipeline = [
+                {"$match": keyset_filter({}, cursor)},
+                {"$sort": dict(keyset_sort())},
+                {"$limit": page_size + 1},
+            ] + pipeline
+
+        agg_cursor = await artist_coll.aggregate(pipeline)
+        results = await agg_cursor.to_list()
+        next_cursor = None
+        if paginated:
+            results, next_cursor = split_page(results, page_size)
+
+        results = [_artist_out(artist) for artist in results]
+
+        if paginated:
+            return {"items": results, "next_cursor": next_cursor}
         return results
 
+    except HTTPException:
+        raise
+    except Exception:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Error retrieving artists")
+
+
+# Obtener un conjunto de artistas por ID (una sola consulta, en el orden pedido)
+async def get_artists_batch(ids: list[str], fields: Optional[list[str]] = None):
+    try:
+        # Sin fields se devuelven los mismos campos que el listado
+        fields = fields or ["name", "country", "albums", "genre_ids"]
+        artists, missing = await fetch_by_ids("artist", ids, fields, field_aliases={"genre_ids": "genre"})
+        return {"items": [pick_fields(_artist_out(a), fields) for a in artists], "missing": missing}
+    except HTTPException:
+        raise
     except Exception:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Error retrieving artists")
 
 
 # Actualizar artista
+@invalidates("artist", "catalog_stats")
 async def update_artist(artist_id: str, artist: ArtistUpdate, request: Request):
     try:
         user_email = request.state.user["email"]
-        artist_coll = get_collection("artist")
-        genre_coll = get_collection("genre")
+        artist_coll = get_async_collection("artist")
 
         if not ObjectId.is_valid(artist_id):
             raise HTTPException(status_code=400, detail="Invalid artist ID")
 
-        existing = artist_coll.find_one({"_id": ObjectId(artist_id)})
-        if not existing:
-            raise HTTPException(status_code=404, detail="Artist not found")
-
         update_data = artist.dict(exclude_unset=True)
+        if not update_data:
+            raise HTTPException(status_code=400, detail="Nothing to update")
 
         if "genre" in update_data:
-            new_genre_ids = []
-            for genre_id in update_data["genre"]:
-                if not ObjectId.is_valid(genre_id):
-                    raise HTTPException(
-                        status_code=400, detail=f"Invalid genre ID '{genre_id}'"
-                    )
-                genre_doc = genre_coll.find_one({"_id": ObjectId(genre_id)})
-                if not genre_doc:
-                    raise HTTPException(status_code=404, detail=f"Genre '{genre_id}' not found")
-                new_genre_ids.append(genre_doc["_id"])
-            update_data["genre"] = new_genre_ids
-
-        artist_coll.update_one({"_id": ObjectId(artist_id)}, {"$set": update_data})
-
-        updated_artist = artist_coll.find_one({"_id": ObjectId(artist_id)})
+            await require_references("genre", update_data["genre"], "Genre", projection={"_id": 1})
+            update_data["genre"] = [ObjectId(genre_id) for genre_id in update_data["genre"]]
+
+        # Una sola ida y vuelta: actualiza y devuelve el documento ya guardado
+        updated_artist = await artist_coll.find_one_and_update(
+            {"_id": ObjectId(artist_id)}, {"$set": update_data}, return_document=ReturnDocument.AFTER
+        )
+        if not updated_artist:
+            raise HTTPException(status_code=404, detail="Artist not found")
+
+        if update_data.get("name"):
+            await catalog_stats.rename_artist_stats(artist_id, update_data["name"])
+        search_service.index_artist(artist_id, update_data.get("name"), update_data.get("genre"))
+
         artist_clean = convert_object_ids(updated_artist)
         artist_clean["genre_ids"] = artist_clean.pop("genre", [])
 
@@ -131,28 +169,33 @@ async def update_artist(artist_id: str, artist: ArtistUpdate, request: Request):
             "artist": artist_clean,
         }
 
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="El artista ya existe")
     except Exception:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Error updating the artist")
 
 
 # Listar álbumes por artista
+@cached("artist", "album")
 async def list_albums_by_artist(artist_id: str):
     try:
-        artist_coll = get_collection("artist")
-        album_coll = get_collection("album")
+        artist_coll = get_async_collection("artist")
+        album_coll = get_async_collection("album")
 
         if not ObjectId.is_valid(artist_id):
             raise HTTPException(status_code=400, detail="Invalid artist ID")
 
-        artist = artist_coll.find_one({"_id": ObjectId(artist_id)})
+        artist = await artist_coll.find_one({"_id": ObjectId(artist_id)})
         if not artist:
             raise HTTPException(status_code=404, detail="Artist not found")
 
         artist_clean = convert_object_ids(artist)
         artist_clean["genre_ids"] = artist_clean.pop("genre", [])
 
-        albums = list(album_coll.find({"artist": artist_id}))
+        albums = await album_coll.find({"artist": artist_id}).to_list()
         cleaned_albums = [convert_object_ids(alb) for alb in albums]
 
         return {
@@ -166,24 +209,27 @@ async def list_albums_by_artist(artist_id: str):
 
 
 # Eliminar artista
+@invalidates("artist", "catalog_stats")
 async def delete_artist(artist_id: str, request: Request):
     try:
         user_email = request.state.user["email"]
-        artist_coll = get_collection("artist")
-        album_coll = get_collection("album")
+        artist_coll = get_async_collection("artist")
+        album_coll = get_async_collection("album")
 
         if not ObjectId.is_valid(artist_id):
             raise HTTPException(status_code=400, detail="Invalid artist ID")
 
-        artist = artist_coll.find_one({"_id": ObjectId(artist_id)})
+        artist = await artist_coll.find_one({"_id": ObjectId(artist_id)})
         if not artist:
             raise HTTPException(status_code=404, detail="Artist not found")
 
-        album_count = album_coll.count_documents({"artist": artist_id})
+        album_count = await album_coll.count_documents({"artist": artist_id})
         if album_count > 0:
             raise HTTPException(status_code=400, detail="Cannot delete artist with associated albums")
 
-        artist_coll.delete_one({"_id": ObjectId(artist_id)})
+        await artist_coll.delete_one({"_id": ObjectId(artist_id)})
+        await catalog_stats.remove_artist_stats(artist_id)
+        search_service.unindex_artist(artist_id)
 
         return {"msg": f"Artist '{artist['name']}' deleted successfully"}
 
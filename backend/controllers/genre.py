@@ -1,15 +1,13 @@
 from fastapi import HTTPException, Request
 from bson import ObjectId
-from utils.mongodb import get_collection
+from pymongo.errors import DuplicateKeyError
+from utils.mongodb import get_async_collection
+from utils.pagination import fetch_page
+from utils.cache import cached, invalidates
+from search import service as search_service
 from models.genre import Genre, UpdateGenre
 from datetime import datetime
-import re
-
-# Colecciones MongoDB
-genre_coll = get_collection("genre")
-song_coll = get_collection("song")
-album_coll = get_collection("album")
-artist_coll = get_collection("artist")
+from typing import Optional
 
 def _normalize_name(name: str) -> str:
     return (name or "").strip()
@@ -24,58 +22,64 @@ def _to_out(doc: dict) -> dict:
         "active": doc.get("active", True),
     }
 
-# Obtener todos los géneros (público)
-async def get_all_genres(include_inactive: bool = False):
+# Obtener todos los géneros (público); paginado por cursor si se envía limit o cursor
+@cached("genre")
+async def get_all_genres(include_inactive: bool = False,
+                         limit: Optional[int] = None, cursor: Optional[str] = None):
     try:
+        genre_coll = get_async_collection("genre")
         query = {} if include_inactive else {"active": True}
+        if limit is not None or cursor is not None:
+            docs, next_cursor = await fetch_page(genre_coll, query, limit, cursor, sort_field="name")
+            return {"items": [_to_out(g) for g in docs], "next_cursor": next_cursor}
+
         genres = []
-        for g in genre_coll.find(query).sort("name", 1):
+        async for g in genre_coll.find(query).sort("name", 1):
             genres.append(_to_out(g))
         return genres
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error retrieving genres")
 
 # Obtener un género por ID (público)
+@cached("genre")
 async def get_genre_by_id(genre_id: str):
     if not ObjectId.is_valid(genre_id):
         raise HTTPException(status_code=400, detail="Invalid genre ID")
 
-    g = genre_coll.find_one({"_id": ObjectId(genre_id)})
+    g = await get_async_collection("genre").find_one({"_id": ObjectId(genre_id)})
     if not g:
         raise HTTPException(status_code=404, detail="Genre not found")
     return _to_out(g)
 
 # Crear un nuevo género (requiere autenticación)
+@invalidates("genre")
 async def create_genre(data: Genre, request: Request):
     name = _normalize_name(data.name)
     if not name:
         raise HTTPException(status_code=400, detail="Name is required")
 
-    # Duplicado case-insensitive (usa name_lc o regex como respaldo)
-    name_lc = name.lower()
-    dup = genre_coll.find_one({
-        "$or": [
-            {"name_lc": name_lc},
-            {"name": {"$regex": f"^{re.escape(name)}$", "$options": "i"}}
-        ]
-    })
-    if dup:
-        raise HTTPException(status_code=409, detail="Genre already exists")
-
     doc = {
         "name": name,
-        "name_lc": name_lc,
+        "name_lc": name.lower(),
         "active": True,
         "created_at": _now(),
         "updated_at": _now(),
     }
-    result = genre_coll.insert_one(doc)
+    try:
+        result = await get_async_collection("genre").insert_one(doc)
+    except DuplicateKeyError:
+        # Índice único name_ci (sin distinguir mayúsculas)
+        raise HTTPException(status_code=409, detail="Genre already exists")
+    search_service.index_genre(result.inserted_id, name)
     return {
         "msg": "Genre registered successfully",
         "id": str(result.inserted_id)
     }
 
 # Actualizar un género por ID (requiere autenticación)
+@invalidates("genre")
 async def update_genre(genre_id: str, data: UpdateGenre, request: Request):
     if not ObjectId.is_valid(genre_id):
         raise HTTPException(status_code=400, detail="Invalid genre ID")
@@ -87,51 +91,46 @@ async def update_genre(genre_id: str, data: UpdateGenre, request: Request):
         name = _normalize_name(update_data["name"])
         if not name:
             raise HTTPException(status_code=400, detail="Name cannot be empty")
-        name_lc = name.lower()
-
-        dup = genre_coll.find_one({
-            "$or": [
-                {"name_lc": name_lc},
-                {"name": {"$regex": f"^{re.escape(name)}$", "$options": "i"}}
-            ],
-            "_id": {"$ne": ObjectId(genre_id)}
-        })
-        if dup:
-            raise HTTPException(status_code=409, detail="Genre with that name already exists")
-
         update_data["name"] = name
-        update_data["name_lc"] = name_lc
+        update_data["name_lc"] = name.lower()
 
     if not update_data:
         raise HTTPException(status_code=400, detail="Nothing to update")
 
     update_data["updated_at"] = _now()
 
-    res = genre_coll.update_one({"_id": ObjectId(genre_id)}, {"$set": update_data})
+    try:
+        res = await get_async_collection("genre").update_one({"_id": ObjectId(genre_id)}, {"$set": update_data})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Genre with that name already exists")
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="Genre not found")
+    if "name" in update_data:
+        search_service.index_genre(genre_id, update_data["name"])
 
     return {"msg": "Genre updated successfully"}
 
 # Eliminar un género por ID (requiere autenticación) – ELIMINACIÓN RESTRINGIDA
+@invalidates("genre")
 async def delete_genre(genre_id: str, request: Request):
     if not ObjectId.is_valid(genre_id):
         raise HTTPException(status_code=400, detail="Invalid genre ID")
 
     _id = ObjectId(genre_id)
-    g = genre_coll.find_one({"_id": _id})
+    genre_coll = get_async_collection("genre")
+    g = await genre_coll.find_one({"_id": _id})
     if not g:
         raise HTTPException(status_code=404, detail="Genre not found")
 
     # Verificar uso por artistas; se consideran posibles campos "genre" o "genre_ids"
-    in_use_by_artist = artist_coll.find_one(
+    in_use_by_artist = await get_async_collection("artist").find_one(
         {"$or": [{"genre": _id}, {"genre_ids": _id}]},
         projection={"_id": 1},
     )
 
     # (Opcional) si también usas genre en songs/albums, puedes activar estos:
-    # in_use_by_song = song_coll.find_one({"$or": [{"genre": _id}, {"genre_id": _id}]}, {"_id": 1})
-    # in_use_by_album = album_coll.find_one({"$or": [{"genre": _id}, {"genre_id": _id}]}, {"_id": 1})
+    # in_use_by_song = await get_async_collection("songs").find_one({"$or": [{"genre": _id}, {"genre_id": _id}]}, {"_id": 1})
+    # in_use_by_album = await get_async_collection("album").find_one({"$or": [{"genre": _id}, {"genre_id": _id}]}, {"_id": 1})
 
     if in_use_by_artist:
         raise HTTPException(
@@ -140,5 +139,6 @@ async def delete_genre(genre_id: str, request: Request):
         )
 
     # Eliminación definitiva
-    genre_coll.delete_one({"_id": _id})
+    await genre_coll.delete_one({"_id": _id})
+    search_service.unindex_genre(genre_id)
     return {"msg": "Genre deleted"}
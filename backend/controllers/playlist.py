@@ -1,7 +1,21 @@
 from fastapi import HTTPException, Request
 from models.playlist import Playlist
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, write_session
+from utils.references import require_references
+from pipelines.playlist_pipeline import playlist_with_songs_pipeline
+from utils import playlist_items
+from utils.pagination import encode_cursor
 from bson import ObjectId
+from typing import Optional
+
+
+# Valida en una sola consulta que las canciones existen y no están eliminadas
+async def _require_active_songs(song_ids: list[str]):
+    if song_ids:
+        await require_references(
+            "songs", song_ids, "Song",
+            extra_filter={"deleted": {"$ne": True}}, projection={"_id": 1},
+        )
 
 
 # Crear nueva playlist
@@ -9,23 +23,35 @@ async def create_playlist(playlist: Playlist, request: Request):
     try:
         user_email = request.state.user["email"]
 
-        users = get_collection("users")
-        songs_coll = get_collection("songs")
-        playlist_coll = get_collection("playlist")
+        users = get_async_collection("users")
+        playlist_coll = get_async_collection("playlist")
 
-        user = users.find_one({"email": user_email})
+        user = await users.find_one({"email": user_email})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        for song_id in playlist.songs:
-            if not ObjectId.is_valid(song_id) or not songs_coll.find_one({"_id": ObjectId(song_id), "deleted": {"$ne": True}}):
-                raise HTTPException(status_code=404, detail=f"Song '{song_id}' not found or is deleted")
+        await _require_active_songs(playlist.songs)
 
         data = playlist.model_dump()
         data["user"] = str(user["_id"])
-        result = playlist_coll.insert_one(data)
-
-        users.update_one({"_id": user["_id"]}, {"$addToSet": {"playlists": str(result.inserted_id)}})
+        if playlist_items.PLAYLIST_STORAGE == "items":
+            # Las canciones van a playlist_items, no al documento
+            song_ids = list(dict.fromkeys(data.pop("songs") or []))
+            data.update({"storage": "items", "song_count": len(song_ids)})
+            async with write_session() as session:
+                result = await playlist_coll.insert_one(data, session=session)
+                try:
+                    await playlist_items.append_items(result.inserted_id, song_ids, session=session)
+                except Exception:
+                    # Sin transacción no queda rollback: se borra la playlist a medio crear
+                    if session is None:
+                        await playlist_items.delete_items(result.inserted_id)
+                        await playlist_coll.delete_one({"_id": result.inserted_id})
+                    raise
+        else:
+            result = await playlist_coll.insert_one(data)
+
+        await users.update_one({"_id": user["_id"]}, {"$addToSet": {"playlists": str(result.inserted_id)}})
 
         return {"msg": "Playlist created", "id": str(result.inserted_id)}
     except HTTPException:
@@ -34,62 +60,169 @@ async def create_playlist(playlist: Playlist, request: Request):
         raise HTTPException(status_code=500, detail="Error creating playlist")
 
 
+# ID del usuario autenticado (viene en el JWT; si no, se busca por email)
+async def _owner_id(request: Request) -> str:
+    user = request.state.user
+    if user.get("id"):
+        return str(user["id"])
+
+    doc = await get_async_collection("users").find_one({"email": user["email"]}, {"_id": 1})
+    if not doc:
+        raise HTTPException(status_code=404, detail="User not found")
+    return str(doc["_id"])
+
+
+def _playlist_out(p: dict) -> dict:
+    if playlist_items.uses_items(p):
+        # Las canciones se leen paginadas desde /playlists/{id}/items
+        return {"id": str(p["_id"]), "name": p.get("name"), "storage": "items",
+                "song_count": p.get("song_count", 0)}
+    return {"id": str(p["_id"]), "name": p.get("name"), "songs": p.get("songs", [])}
+
+
+def _expanded_out(p: dict) -> dict:
+    # Ordena las canciones hidratadas según la playlist (omite eliminadas o inexistentes)
+    docs = {doc["id"]: doc for doc in p.pop("_song_docs", [])}
+    songs = [docs[str(sid)] for sid in p.get("songs", []) if str(sid) in docs]
+    last_item = p.pop("_last_item", None)
+    if p.pop("storage", None) != "items":
+        p.pop("song_count", None)
+        return {**p, "songs": songs}
+
+    # Solo vienen las primeras canciones; el resto se pide a /playlists/{id}/items
+    song_count = p.get("song_count", 0)
+    more = last_item is not None and song_count > len(p.get("songs", []))
+    return {**p, "storage": "items", "song_count": song_count, "songs": songs,
+            "next_cursor": encode_cursor(last_item, "position") if more else None}
+
+
+# Playlist del usuario autenticado (404 si no existe o es de otro usuario)
+async def _owned_playlist(playlist_id: str, request: Request, projection: Optional[dict] = None) -> dict:
+    if not ObjectId.is_valid(playlist_id):
+        raise HTTPException(status_code=400, detail="Invalid playlist ID")
+
+    owner = await _owner_id(request)
+    playlist = await get_async_collection("playlist").find_one(
+        {"_id": ObjectId(playlist_id), "user": owner}, projection
+    )
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Playlist not found or unauthorized")
+    return playlist
+
+
 # Obtener playlists del usuario
-async def get_playlists_by_user(request: Request):
-    user_email = request.state.user["email"]
+# Con expand="songs" cada canción viene con título, duración, álbum y artista
+async def get_playlists_by_user(request: Request, expand: Optional[str] = None):
+    owner = await _owner_id(request)
+    playlist_coll = get_async_collection("playlist")
 
-    users = get_collection("users")
-    playlist_coll = get_collection("playlist")
+    if expand == "songs":
+        cursor = await playlist_coll.aggregate(playlist_with_songs_pipeline({"user": owner}))
+        return [_expanded_out(p) for p in await cursor.to_list()]
 
-    user = users.find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    playlists = await playlist_coll.find({"user": owner}).to_list()
+    return [_playlist_out(p) for p in playlists]
+
+
+# Obtener una playlist del usuario por ID
+async def get_playlist(playlist_id: str, request: Request, expand: Optional[str] = None):
+    if not ObjectId.is_valid(playlist_id):
+        raise HTTPException(status_code=400, detail="Invalid playlist ID")
 
-    playlists = list(playlist_coll.find({"user": str(user["_id"])}))
-    return [{"id": str(p["_id"]), "name": p.get("name"), "songs": p.get("songs", [])} for p in playlists]
+    owner = await _owner_id(request)
+    playlist_coll = get_async_collection("playlist")
+    match = {"_id": ObjectId(playlist_id), "user": owner}
+
+    if expand == "songs":
+        cursor = await playlist_coll.aggregate(playlist_with_songs_pipeline(match))
+        playlists = await cursor.to_list()
+        playlist = _expanded_out(playlists[0]) if playlists else None
+    else:
+        doc = await playlist_coll.find_one(match)
+        playlist = _playlist_out(doc) if doc else None
+
+    if not playlist:
+        raise HTTPException(status_code=404, detail="Playlist not found or unauthorized")
+    return playlist
 
 
 # Eliminar playlist por ID
 async def delete_playlist(playlist_id: str, request: Request):
-    user_email = request.state.user["email"]
+    playlist = await _owned_playlist(playlist_id, request, {"storage": 1})
 
-    coll = get_collection("playlist")
-    result = coll.delete_one({"_id": ObjectId(playlist_id), "user": user_email})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Playlist not found or unauthorized")
+    await get_async_collection("playlist").delete_one({"_id": playlist["_id"]})
+    if playlist_items.uses_items(playlist):
+        await playlist_items.delete_items(playlist["_id"])
     return {"msg": "Playlist deleted"}
 
 
 # Agregar canciones a una playlist
 async def add_songs_to_playlist(playlist_id: str, song_ids: list[str], request: Request):
-    user_email = request.state.user["email"]
-
-    coll = get_collection("playlist")
-    songs_coll = get_collection("songs")
+    playlist = await _owned_playlist(playlist_id, request, {"storage": 1})
+    coll = get_async_collection("playlist")
 
-    for song_id in song_ids:
-        if not ObjectId.is_valid(song_id) or not songs_coll.find_one({"_id": ObjectId(song_id), "deleted": {"$ne": True}}):
-            raise HTTPException(status_code=404, detail=f"Song '{song_id}' not found or is deleted")
+    await _require_active_songs(song_ids)
 
-    result = coll.update_one(
-        {"_id": ObjectId(playlist_id), "user": user_email},
-        {"$addToSet": {"songs": {"$each": song_ids}}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Playlist not found or unauthorized")
+    if playlist_items.uses_items(playlist):
+        # Igual que $addToSet: no se repiten canciones ya presentes
+        present = await playlist_items.existing_song_ids(playlist["_id"], song_ids)
+        new_ids = [sid for sid in dict.fromkeys(song_ids) if sid not in present]
+        added = await playlist_items.append_items(playlist["_id"], new_ids)
+        await coll.update_one({"_id": playlist["_id"]}, {"$inc": {"song_count": added}})
+    else:
+        await coll.update_one({"_id": playlist["_id"]}, {"$addToSet": {"songs": {"$each": song_ids}}})
 
     return {"msg": "Songs added"}
 
 
 # Quitar canciones de una playlist
 async def remove_songs_from_playlist(playlist_id: str, song_ids: list[str], request: Request):
-    user_email = request.state.user["email"]
-
-    coll = get_collection("playlist")
-    result = coll.update_one(
-        {"_id": ObjectId(playlist_id), "user": user_email},
-        {"$pull": {"songs": {"$in": song_ids}}}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Playlist not found or unauthorized")
+    playlist = await _owned_playlist(playlist_id, request, {"storage": 1})
+    coll = get_async_collection("playlist")
+
+    if playlist_items.uses_items(playlist):
+        removed = await playlist_items.remove_songs(playlist["_id"], song_ids)
+        await coll.update_one({"_id": playlist["_id"]}, {"$inc": {"song_count": -removed}})
+    else:
+        await coll.update_one({"_id": playlist["_id"]}, {"$pull": {"songs": {"$in": song_ids}}})
     return {"msg": "Songs removed"}
+
+
+# -----------------------------
+# Playlists en modo items (canciones en playlist_items)
+# -----------------------------
+async def _items_playlist(playlist_id: str, request: Request) -> dict:
+    playlist = await _owned_playlist(playlist_id, request, {"storage": 1})
+    if not playlist_items.uses_items(playlist):
+        raise HTTPException(status_code=409, detail="Playlist does not use item storage")
+    return playlist
+
+
+# Listar canciones de la playlist en orden, paginadas
+async def list_playlist_items(playlist_id: str, request: Request,
+                              limit: Optional[int] = None, cursor: Optional[str] = None):
+    playlist = await _items_playlist(playlist_id, request)
+    return await playlist_items.list_items(playlist["_id"], limit, cursor)
+
+
+# Mover una canción después de otra (o al principio)
+async def move_playlist_item(playlist_id: str, item_id: str, after: Optional[str], request: Request):
+    playlist = await _items_playlist(playlist_id, request)
+    item = await playlist_items.move_item(playlist["_id"], item_id, after)
+    return {"msg": "Item moved", "item": item}
+
+
+# Quitar una canción puntual de la playlist
+async def remove_playlist_item(playlist_id: str, item_id: str, request: Request):
+    playlist = await _items_playlist(playlist_id, request)
+    if not await playlist_items.remove_item(playlist["_id"], item_id):
+        raise HTTPException(status_code=404, detail="Playlist item not found")
+    await get_async_collection("playlist").update_one({"_id": playlist["_id"]}, {"$inc": {"song_count": -1}})
+    return {"msg": "Item removed"}
+
+
+# Pasar una playlist con arreglo embebido a playlist_items
+async def convert_playlist_storage(playlist_id: str, request: Request):
+    playlist = await _owned_playlist(playlist_id, request)
+    await playlist_items.convert_to_items(playlist)
+    return {"msg": "Playlist converted", "storage": "items"}
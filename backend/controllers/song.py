@@ -1,24 +1,33 @@
 from fastapi import HTTPException
-from fastapi.encoders import jsonable_encoder
 from models.song import Song, SongUpdate
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection, write_session
+from utils.pagination import fetch_page
+from utils.references import fetch_by_ids, pick_fields
+from utils.streaming import stream_cursor
+from utils import catalog_stats
+from utils.cache import invalidates
+from search import service as search_service
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Optional
+
+def _to_out(doc: dict) -> dict:
+    doc["id"] = str(doc.pop("_id"))
+    return doc
 
 # Crear canción
+@invalidates("songs", "album", "catalog_stats")
 async def create_song(song: Song):
     try:
-        song_coll = get_collection("songs")
-        album_coll = get_collection("album")
-
-        # Verificar si ya existe una canción con el mismo título y artista
-        if song_coll.find_one({"title": song.title, "artist": song.artist}):
-            raise HTTPException(status_code=400, detail="Song already exists")
+        song_coll = get_async_collection("songs")
+        album_coll = get_async_collection("album")
 
         # Validar el ID del álbum
         if not ObjectId.is_valid(song.album):
             raise HTTPException(status_code=400, detail="Invalid album ID")
 
-        album = album_coll.find_one({"_id": ObjectId(song.album)})
+        album = await album_coll.find_one({"_id": ObjectId(song.album)})
         if not album:
             raise HTTPException(status_code=404, detail="Album not found")
 
@@ -27,92 +36,160 @@ async def create_song(song: Song):
             raise HTTPException(status_code=400, detail="Album artist mismatch")
 
         data = song.model_dump()
-        result = song_coll.insert_one(data)
-
-        # Asociar la canción al álbum
-        album_coll.update_one(
-            {"_id": ObjectId(song.album)},
-            {"$addToSet": {"songs": str(result.inserted_id)}}
-        )
-
+        async with write_session() as session:
+            result = await song_coll.insert_one(data, session=session)
+
+            # Asociar la canción al álbum
+            linked = await album_coll.update_one(
+                {"_id": ObjectId(song.album)},
+                {"$addToSet": {"songs": str(result.inserted_id)}},
+                session=session,
+            )
+            await catalog_stats.inc_album_songs({song.album: linked.modified_count}, session=session)
+
+        search_service.index_song(result.inserted_id, song.title, song.artist)
         return {"msg": "Song created", "id": str(result.inserted_id)}
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        # Índice único (title, artist)
+        raise HTTPException(status_code=400, detail="Song already exists")
     except Exception:
         raise HTTPException(status_code=500, detail="Error creating the song")
 
-# Listar todas las canciones
-async def list_songs():
+# Listar canciones (paginado por cursor si se envía limit o cursor)
+async def list_songs(limit: Optional[int] = None, cursor: Optional[str] = None,
+                stream: Optional[str] = None):
     try:
-        coll = get_collection("songs")
-        songs = list(coll.find())
-        for song in songs:
-            song["id"] = str(song["_id"])
-            del song["_id"]
+        coll = get_async_collection("songs")
+        if stream:
+            return stream_cursor(coll.find(), _to_out, stream)
+
+        paginated = limit is not None or cursor is not None
+        if paginated:
+            songs, next_cursor = await fetch_page(coll, {}, limit, cursor)
+        else:
+            songs = await coll.find().to_list()
+        songs = [_to_out(song) for song in songs]
+        if paginated:
+            return {"items": songs, "next_cursor": next_cursor}
         return songs
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Error retrieving songs")
+
+# Obtener un conjunto de canciones por ID (una sola consulta, en el orden pedido)
+async def get_songs_batch(ids: list[str], fields: Optional[list[str]] = None):
+    try:
+        songs, missing = await fetch_by_ids("songs", ids, fields, extra_filter={"deleted": {"$ne": True}})
+        return {"items": [pick_fields(_to_out(s), fields) for s in songs], "missing": missing}
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=500, detail="Error retrieving songs")
 
 # Actualizar canción
+# Si no cambian artista ni álbum basta un find_one_and_update. Si cambian, se valida contra
+# la canción actual y la escritura se condiciona a que artista y álbum sigan igual (409 si no).
+@invalidates("songs", "album", "catalog_stats")
 async def patch_song(song_id: str, song: SongUpdate):
     try:
-        song_coll = get_collection("songs")
-        album_coll = get_collection("album")
+        song_coll = get_async_collection("songs")
+        album_coll = get_async_collection("album")
 
         if not ObjectId.is_valid(song_id):
             raise HTTPException(status_code=400, detail="Invalid song ID")
 
-        existing = song_coll.find_one({"_id": ObjectId(song_id)})
-        if not existing:
-            raise HTTPException(status_code=404, detail="Song not found")
-
         update_data = song.model_dump(exclude_unset=True)
-
-        new_artist = update_data.get("artist", existing["artist"])
-        new_album = update_data.get("album", existing.get("album"))
-
-        # Validaciones si se cambia el álbum
-        if new_album:
-            if not ObjectId.is_valid(new_album):
-                raise HTTPException(status_code=400, detail="Invalid album ID")
-            album = album_coll.find_one({"_id": ObjectId(new_album)})
-            if not album:
-                raise HTTPException(status_code=404, detail="Album not found")
-            if album["artist"] != new_artist:
-                raise HTTPException(status_code=400, detail="Album artist mismatch")
+        if not update_data:
+            raise HTTPException(status_code=400, detail="Nothing to update")
+
+        song_filter = {"_id": ObjectId(song_id)}
+        moved_album = False
+        relational = "artist" in update_data or "album" in update_data
+        if relational:
+            existing = await song_coll.find_one(song_filter, {"artist": 1, "album": 1})
+            if not existing:
+                raise HTTPException(status_code=404, detail="Song not found")
+            song_filter.update({"artist": existing.get("artist"), "album": existing.get("album")})
+
+            new_artist = update_data.get("artist", existing["artist"])
+            new_album = update_data.get("album", existing.get("album"))
+
+            # Validaciones si se cambia el álbum o el artista
+            if new_album:
+                if not ObjectId.is_valid(new_album):
+                    raise HTTPException(status_code=400, detail="Invalid album ID")
+                album = await album_coll.find_one({"_id": ObjectId(new_album)}, {"artist": 1})
+                if not album:
+                    raise HTTPException(status_code=404, detail="Album not found")
+                if album["artist"] != new_artist:
+                    raise HTTPException(status_code=400, detail="Album artist mismatch")
+
+            # Reasociar álbum si cambió
+            moved_album = "album" in update_data and update_data["album"] != existing.get("album")
 
         # Aplicar la actualización
-        song_coll.update_one({"_id": ObjectId(song_id)}, {"$set": update_data})
-
-        # Reasociar álbum si cambió
-        if "album" in update_data and update_data["album"] != existing.get("album"):
-            if existing.get("album"):
-                album_coll.update_one({"_id": ObjectId(existing["album"])} , {"$pull": {"songs": song_id}})
-            album_coll.update_one({"_id": ObjectId(update_data["album"])} , {"$addToSet": {"songs": song_id}})
-
-        updated = {**existing, **update_data}
-        return {"msg": "Song updated", "song": jsonable_encoder(updated)}
+        async with write_session() as session:
+            updated = await song_coll.find_one_and_update(
+                song_filter, {"$set": update_data},
+                return_document=ReturnDocument.AFTER, session=session,
+            )
+            if not updated:
+                if relational:
+                    raise HTTPException(status_code=409, detail="Song was modified concurrently, retry")
+                raise HTTPException(status_code=404, detail="Song not found")
+
+            if moved_album:
+                # Los contadores siguen a modified_count, como en create_song/delete_song
+                deltas = {}
+                if existing.get("album"):
+                    unlinked = await album_coll.update_one(
+                        {"_id": ObjectId(existing["album"])}, {"$pull": {"songs": song_id}}, session=session
+                    )
+                    deltas[existing["album"]] = -unlinked.modified_count
+                linked = await album_coll.update_one(
+                    {"_id": ObjectId(update_data["album"])}, {"$addToSet": {"songs": song_id}}, session=session
+                )
+                deltas[update_data["album"]] = linked.modified_count
+                await catalog_stats.inc_album_songs(deltas, session=session)
+
+        search_service.index_song(song_id, updated.get("title"), updated.get("artist"))
+        return {"msg": "Song updated", "song": _to_out(updated)}
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Song already exists")
     except Exception:
         raise HTTPException(status_code=500, detail="Error updating the song")
 
 # Eliminar canción
+@invalidates("songs", "album", "catalog_stats")
 async def delete_song(song_id: str):
     try:
-        song_coll = get_collection("songs")
-        album_coll = get_collection("album")
+        song_coll = get_async_collection("songs")
+        album_coll = get_async_collection("album")
 
         if not ObjectId.is_valid(song_id):
             raise HTTPException(status_code=400, detail="Invalid song ID")
 
-        song = song_coll.find_one({"_id": ObjectId(song_id)})
+        song = await song_coll.find_one({"_id": ObjectId(song_id)})
         if not song:
             raise HTTPException(status_code=404, detail="Song not found")
 
-        result = song_coll.delete_one({"_id": ObjectId(song_id)})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Song not found")
+        async with write_session() as session:
+            result = await song_coll.delete_one({"_id": ObjectId(song_id)}, session=session)
+            if result.deleted_count == 0:
+                raise HTTPException(status_code=404, detail="Song not found")
 
-        if song.get("album"):
-            album_coll.update_one({"_id": ObjectId(song["album"])} , {"$pull": {"songs": song_id}})
+            if song.get("album"):
+                unlinked = await album_coll.update_one(
+                    {"_id": ObjectId(song["album"])}, {"$pull": {"songs": song_id}}, session=session
+                )
+                await catalog_stats.inc_album_songs({song["album"]: -unlinked.modified_count}, session=session)
 
+        search_service.unindex_song(song_id)
         return {"msg": "Song deleted"}
     except Exception:
         raise HTTPException(status_code=500, detail="Error deleting the song")
@@ -123,8 +200,8 @@ async def get_songs_by_artist(artist_id: str):
         if not ObjectId.is_valid(artist_id):
             raise HTTPException(status_code=400, detail="Invalid artist ID")
 
-        coll = get_collection("songs")
-        songs = list(coll.find({"artist": artist_id}))
+        coll = get_async_collection("songs")
+        songs = await coll.find({"artist": artist_id}).to_list()
 
         for song in songs:
             song["id"] = str(song["_id"])
@@ -140,8 +217,8 @@ async def get_songs_by_album(album_id: str):
         if not ObjectId.is_valid(album_id):
             raise HTTPException(status_code=400, detail="Invalid album ID")
 
-        coll = get_collection("songs")
-        songs = list(coll.find({"album": album_id}))
+        coll = get_async_collection("songs")
+        songs = await coll.find({"album": album_id}).to_list()
 
         for song in songs:
             song["id"] = str(song["_id"])
@@ -2,10 +2,11 @@ import os
 import json
 import logging
 import base64
-import requests
 import traceback
 from typing import Dict
 
+from bson import ObjectId
+
 from fastapi import HTTPException
 from dotenv import load_dotenv
 
@@ -19,9 +20,11 @@ from firebase_admin._auth_utils import (
 
 from google.auth.exceptions import RefreshError  # para errores OAuth del Admin SDK
 
-from models.users import User, UserLogin
-from utils.mongodb import get_collection
+from models.users import User, UserLogin, RefreshRequest
+from utils.mongodb import get_async_collection
 from utils.security import create_jwt_token
+from utils.firebase_http import post_identity_toolkit
+from utils.refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
 
 # -----------------------------
 # Config & Logging
@@ -57,17 +60,16 @@ def _get_firebase_api_key() -> str:
     return key
 
 
-def _firebase_login_via_rest(email: str, password: str) -> Dict:
+async def _firebase_login_via_rest(email: str, password: str) -> Dict:
     """
-    Realiza el login contra Firebase Identity REST.
+    Realiza el login contra Firebase Identity REST (cliente HTTP async compartido).
     Devuelve el JSON de éxito de Firebase si status=200.
     Lanza HTTPException según el código de error de Firebase.
     """
     api_key = _get_firebase_api_key()
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
     payload = {"email": email, "password": password, "returnSecureToken": True}
 
-    resp = requests.post(url, json=payload, timeout=12)
+    resp = await post_identity_toolkit("accounts:signInWithPassword", payload, api_key)
 
     # intenta decodificar JSON
     try:
@@ -94,6 +96,26 @@ def _firebase_login_via_rest(email: str, password: str) -> Dict:
     raise HTTPException(status_code=500, detail="Error al autenticar con Firebase")
 
 
+def _token_data(user_data: dict) -> dict:
+    return {
+        "id": str(user_data["_id"]),
+        "email": user_data["email"],
+        "firstname": user_data.get("firstname") or user_data.get("name", ""),
+        "lastname": user_data.get("lastname", ""),
+        "active": user_data.get("active", True),
+        "admin": user_data.get("admin", False),
+    }
+
+
+async def _issue_session(user_data: dict) -> dict:
+    """
+    Emite el JWT de acceso (1 hora) y un refresh token rotativo.
+    """
+    token = create_jwt_token(**_token_data(user_data))
+    refresh_token = await issue_refresh_token(str(user_data["_id"]))
+    return {"access_token": token, "refresh_token": refresh_token}
+
+
 # -----------------------------
 # Firebase Admin init
 # -----------------------------
@@ -168,7 +190,7 @@ async def create_user(user: User) -> dict:
         logger.info("Usuario creado en Firebase con UID: %s", firebase_user.uid)
 
         # MongoDB: guarda documento
-        coll = get_collection("users")
+        coll = get_async_collection("users")
         user_data = user.dict()
 
         # normalización de nombres (name → firstname si viene así del front)
@@ -179,7 +201,7 @@ async def create_user(user: User) -> dict:
         user_data["playlists"] = []
         user_data.pop("password", None)  # nunca guardes contraseñas
 
-        result = coll.insert_one(user_data)
+        result = await coll.insert_one(user_data)
         logger.info("Usuario guardado en MongoDB con ID: %s", result.inserted_id)
 
         return {"msg": "Usuario creado exitosamente", "user_id": str(result.inserted_id)}
@@ -229,46 +251,29 @@ async def login_user(user: UserLogin) -> dict:
 
         # ---- BYPASS TEMPORAL (solo demo) ----
         if BYPASS:
-            coll = get_collection("users")
-            user_data = coll.find_one({"email": user.email})
+            coll = get_async_collection("users")
+            user_data = await coll.find_one({"email": user.email})
             if not user_data:
                 raise HTTPException(status_code=404, detail="Usuario no encontrado en la base de datos")
-            token_data = {
-                "id": str(user_data["_id"]),
-                "email": user_data["email"],
-                "firstname": user_data.get("firstname") or user_data.get("name", ""),
-                "lastname": user_data.get("lastname", ""),
-                "active": user_data.get("active", True),
-                "admin": user_data.get("admin", False),
-            }
-            token = create_jwt_token(**token_data)
             logger.warning("AUTH_BYPASS_FIREBASE activo: emitiendo JWT sin validar contraseña (solo demo).")
-            return {"access_token": token}
+            return await _issue_session(user_data)
         # -------------------------------------
 
         # 1) Firebase REST (valida credenciales)
-        _ = _firebase_login_via_rest(user.email, user.password)  # si falla, lanza HTTPException
+        _ = await _firebase_login_via_rest(user.email, user.password)  # si falla, lanza HTTPException
 
         # 2) Busca usuario en Mongo
-        coll = get_collection("users")
-        user_data = coll.find_one({"email": user.email})
+        coll = get_async_collection("users")
+        user_data = await coll.find_one({"email": user.email})
         if not user_data:
             logger.error("Usuario no encontrado en la base de datos.")
             raise HTTPException(status_code=404, detail="Usuario no encontrado en la base de datos")
 
-        # 3) Genera tu JWT de aplicación
-        token_data = {
-            "id": str(user_data["_id"]),
-            "email": user_data["email"],
-            "firstname": user_data.get("firstname") or user_data.get("name", ""),
-            "lastname": user_data.get("lastname", ""),
-            "active": user_data.get("active", True),
-            "admin": user_data.get("admin", False),
-        }
-        token = create_jwt_token(**token_data)
+        # 3) Genera tu JWT de aplicación y el refresh token
+        session = await _issue_session(user_data)
         logger.info("Login exitoso. Token generado.")
 
-        return {"access_token": token}
+        return session
 
     except UserNotFoundError:
         # (poco probable aquí porque validamos por REST)
@@ -282,3 +287,37 @@ async def login_user(user: UserLogin) -> dict:
     except Exception:
         logger.error("Error interno durante login:\n%s", traceback.format_exc())
         raise HTTPException(status_code=500, detail="Error interno durante login")
+
+
+async def refresh_session(data: RefreshRequest) -> dict:
+    """
+    Renueva la sesión sin pasar por Firebase: rota el refresh token
+    y firma un nuevo JWT con los datos actuales del usuario en Mongo.
+    """
+    try:
+        user_id, refresh_token = await rotate_refresh_token(data.refresh_token)
+
+        coll = get_async_collection("users")
+        user_data = await coll.find_one({"_id": ObjectId(user_id)}) if ObjectId.is_valid(user_id) else None
+        if not user_data or user_data.get("active") is False:
+            await revoke_refresh_token(refresh_token)
+            raise HTTPException(status_code=401, detail="Usuario inexistente o inactivo")
+
+        token = create_jwt_token(**_token_data(user_data))
+        return {"access_token": token, "refresh_token": refresh_token}
+
+    except HTTPException:
+        raise
+
+    except Exception:
+        logger.error("Error interno al renovar sesión:\n%s", traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Error interno al renovar sesión")
+
+
+async def logout_user(data: RefreshRequest) -> dict:
+    """
+    Revoca el refresh token (y los emitidos a partir del mismo login).
+    """
+    if not await revoke_refresh_token(data.refresh_token):
+        raise HTTPException(status_code=401, detail="Refresh token inválido")
+    return {"msg": "Sesión cerrada"}
@@ -1,6 +1,11 @@
+import os
+import asyncio
+import logging
 import uvicorn
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
@@ -11,14 +16,61 @@ from routes.song_routes import router as song_router
 from routes.genre_routes import router as genre_router
 from routes.playlist_routes import router as playlist_router
 from routes.auth_routes import router as auth_router
+from routes.autocomplete_routes import router as autocomplete_router
+from routes.profiling_routes import router as profiling_router
 
 # Auth decorators
 from utils.auth_dependency import validate_user_decorator, validate_admin
+from utils.mongodb import close_async_mongo_client
+from utils.indexes import ensure_indexes
+from utils.catalog_stats import ensure_catalog_stats
+from utils.slow_queries import ensure_slow_query_log
+from utils.firebase_http import close_http_client
+from search.service import start_search_index
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from utils.profiling import ProfilingMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Crear índices al arrancar (desactivar con MONGO_ENSURE_INDEXES=false)
+ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if ENSURE_INDEXES:
+        try:
+            await ensure_indexes()
+        except Exception as e:
+            # No impedir el arranque (p. ej. /health) si Mongo no está disponible
+            logger.error("No se pudieron crear los índices: %s", e)
+    try:
+        # Colección limitada para el registro de consultas lentas
+        await ensure_slow_query_log()
+    except Exception as e:
+        logger.error("No se pudo crear la colección de consultas lentas: %s", e)
+    try:
+        # Poblar catalog_stats la primera vez (luego se mantiene de forma incremental)
+        await ensure_catalog_stats()
+    except Exception as e:
+        logger.error("No se pudo inicializar catalog_stats: %s", e)
+    # Índice de búsqueda en segundo plano (no retrasa el arranque)
+    search_task = start_search_index()
+    yield
+    if search_task:
+        search_task.cancel()
+        try:
+            await search_task
+        except asyncio.CancelledError:
+            pass
+    # Libera los pools de conexiones async al apagar el servidor
+    await close_http_client()
+    await close_async_mongo_client()
 
 app = FastAPI(
     title="Music API",
     description="API para la gestión de canciones, álbumes, artistas, géneros y playlists.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -30,6 +82,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Perfilado bajo demanda (cabecera X-Profile de un admin o rutas armadas en /admin/profiling)
+app.add_middleware(ProfilingMiddleware)
+
+# Latencia, estado y peticiones en curso por ruta (expuestas en /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Routers
 app.include_router(auth_router)
 app.include_router(artist_router)
@@ -37,6 +95,8 @@ app.include_router(album_router)
 app.include_router(song_router)
 app.include_router(genre_router)
 app.include_router(playlist_router)
+app.include_router(autocomplete_router)
+app.include_router(profiling_router)
 
 @app.get("/")
 async def root():
@@ -70,6 +130,11 @@ def readiness_check():
     except Exception as e:
         return {"status": "not_ready", "error": str(e)}
 
+# Métricas en formato Prometheus (latencia por ruta, comandos de Mongo, cachés)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/exampleuser")
 @validate_user_decorator
 async def example_user(request: Request):
@@ -17,3 +17,4 @@ class AlbumUpdate(BaseModel):
 
 class AlbumOut(Album):
     id: str
+    genre_id: Optional[str] = None
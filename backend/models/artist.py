@@ -47,3 +47,9 @@ class ArtistOut(BaseModel):
     genre_ids: List[str] = []
     country: str
     albums: List[str] = []
+
+
+# Página de artistas (paginación por cursor)
+class ArtistPage(BaseModel):
+    items: List[ArtistOut]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,30 @@
+import re
+
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List
+
+# Máximo de IDs por petición en los endpoints /batch
+MAX_BATCH_IDS = 100
+
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class BatchGet(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_IDS, description="IDs a obtener")
+    fields: Optional[List[str]] = Field(
+        None, description="Campos a devolver (el id siempre se incluye); sin fields se devuelven todos"
+    )
+
+    @field_validator("fields")
+    @classmethod
+    def fields_must_be_names(cls, v):
+        if v is not None:
+            invalid = [f for f in v if not _FIELD_NAME.match(f)]
+            if invalid:
+                raise ValueError(f"Invalid field name(s): {', '.join(invalid)}")
+        return v
+
+
+class BatchResponse(BaseModel):
+    items: List[dict]
+    missing: List[str] = []
@@ -24,3 +24,7 @@ class PlaylistAddSongs(BaseModel):
 
 class PlaylistRemoveSongs(BaseModel):
     song_ids: List[str] = Field(..., description="IDs de las canciones a quitar")
+
+
+class PlaylistMoveItem(BaseModel):
+    after: Optional[str] = Field(None, description="ID del item tras el cual ubicarlo (null = al principio)")
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Literal
+
+from utils.profiling import MAX_ARMED_REQUESTS
+
+
+class ProfilingArm(BaseModel):
+    route: str = Field(..., description="Plantilla de la ruta, p. ej. /songs/{song_id}")
+    method: str = Field("GET", description="Método HTTP")
+    count: int = Field(1, ge=1, le=MAX_ARMED_REQUESTS, description="Peticiones a perfilar")
+    format: Literal["pstats", "collapsed"] = Field("pstats", description="cProfile o pilas colapsadas")
@@ -11,3 +11,6 @@ class User(BaseModel):
 class UserLogin(BaseModel):
     email: EmailStr = Field(..., description="Correo del usuario")
     password: str = Field(..., description="Contraseña del usuario")
+
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(..., min_length=1, description="Refresh token emitido en el login")
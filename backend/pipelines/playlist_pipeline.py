@@ -1,5 +1,10 @@
 from bson import ObjectId
 
+from utils.pagination import MAX_PAGE_SIZE
+
+# Canciones que trae expand=songs de una playlist en modo items (el resto por /items)
+EXPANDED_ITEMS_LIMIT = MAX_PAGE_SIZE
+
 # Validación compleja: Verifica que las canciones existen y no están eliminadas
 def validate_songs_pipeline(song_ids: list):
     return [
@@ -15,3 +20,104 @@ def validate_songs_pipeline(song_ids: list):
             }
         }
     ]
+
+
+def _to_object_id(expr):
+    # Las referencias se guardan como string: se convierten para usar el índice de _id
+    return {"$convert": {"input": expr, "to": "objectId", "onError": None, "onNull": None}}
+
+
+# Playlists con sus canciones hidratadas (título, duración, álbum y artista) en una sola consulta.
+# Devuelve "songs" (ids en orden de la playlist) y "_song_docs" (sin orden); el orden se
+# restaura en el controlador. En modo items solo se leen las primeras EXPANDED_ITEMS_LIMIT
+# canciones por posición, y "_last_item" permite seguir paginando desde /items.
+def playlist_with_songs_pipeline(match: dict):
+    return [
+        {"$match": match},
+        # Playlists en modo items: las canciones salen de playlist_items en orden de posición
+        {
+            "$lookup": {
+                "from": "playlist_items",
+                "localField": "_id",
+                "foreignField": "playlist_id",
+                "pipeline": [
+                    {"$sort": {"position": 1, "_id": 1}},
+                    {"$limit": EXPANDED_ITEMS_LIMIT},
+                    {"$project": {"song_id": 1, "position": 1}},
+                ],
+                "as": "_items",
+            }
+        },
+        {
+            "$addFields": {
+                "songs": {"$cond": [{"$eq": ["$storage", "items"]}, "$_items.song_id", "$songs"]}
+            }
+        },
+        {
+            "$addFields": {
+                "_song_ids": {
+                    "$map": {"input": {"$ifNull": ["$songs", []]}, "as": "sid", "in": _to_object_id("$$sid")}
+                }
+            }
+        },
+        {
+            "$lookup": {
+                "from": "songs",
+                "localField": "_song_ids",
+                "foreignField": "_id",
+                "pipeline": [
+                    {"$match": {"deleted": {"$ne": True}}},
+                    {"$project": {"title": 1, "duration": 1, "album": 1, "artist": 1}},
+                    {
+                        "$addFields": {
+                            "_album_id": _to_object_id("$album"),
+                            "_artist_id": _to_object_id("$artist"),
+                        }
+                    },
+                    {
+                        "$lookup": {
+                            "from": "album",
+                            "localField": "_album_id",
+                            "foreignField": "_id",
+                            "pipeline": [{"$project": {"_id": 0, "title": 1}}],
+                            "as": "_album",
+                        }
+                    },
+                    {
+                        "$lookup": {
+                            "from": "artist",
+                            "localField": "_artist_id",
+                            "foreignField": "_id",
+                            "pipeline": [{"$project": {"_id": 0, "name": 1}}],
+                            "as": "_artist",
+                        }
+                    },
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "id": {"$toString": "$_id"},
+                            "title": 1,
+                            "duration": 1,
+                            "album_id": "$album",
+                            "album": {"$first": "$_album.title"},
+                            "artist_id": "$artist",
+                            "artist": {"$first": "$_artist.name"},
+                        }
+                    },
+                ],
+                "as": "_song_docs",
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "id": {"$toString": "$_id"},
+                "name": 1,
+                "storage": 1,
+                "song_count": 1,
+                "songs": {"$ifNull": ["$songs", []]},
+                "_song_docs": 1,
+                "_last_item": {"$last": "$_items"},
+            }
+        },
+    ]
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Query, Request
+from typing import Literal, Optional
 from models.album import Album, AlbumUpdate
+from models.batch import BatchGet, BatchResponse
 from utils.auth_dependency import validate_user
+from utils.pagination import MAX_PAGE_SIZE
 from controllers.album import (
     create_album,
     list_albums,
+    get_albums_batch,
     patch_album,
     delete_album,
     album_with_most_songs,
@@ -17,27 +21,42 @@ router = APIRouter(prefix="/albums", tags=["Albums"])
 @router.post("/", summary="Create new album")
 @validate_user
 async def create_album_route(album: Album, request: Request):
-    return create_album(album, request)
+    return await create_album(album, request)
 
 
 # Obtener todos los álbumes (público)
+# Con ?limit= y/o ?cursor= devuelve una página {items, next_cursor}
+# Con ?stream=ndjson|json envía la colección completa a medida que se lee
 @router.get("/", summary="List all albums")
-async def list_albums_route():
-    return list_albums()
+async def list_albums_route(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor"),
+    stream: Optional[Literal["ndjson", "json"]] = Query(
+        None, description="Exporta la colección completa en streaming (ndjson o array json)"
+    ),
+):
+    return await list_albums(limit, cursor, stream)
+
+
+# Obtener varios álbumes por ID en una sola petición (público)
+# Devuelve {items, missing}: items en el orden pedido y los IDs que no existen
+@router.post("/batch", summary="Get albums by IDs", response_model=BatchResponse)
+async def get_albums_batch_route(payload: BatchGet):
+    return await get_albums_batch(payload.ids, payload.fields)
 
 
 # Actualizar álbum por ID (requiere autenticación)
 @router.patch("/{album_id}", summary="Update album")
 @validate_user
 async def patch_album_route(album_id: str, album: AlbumUpdate, request: Request):
-    return patch_album(album_id, album, request)
+    return await patch_album(album_id, album)
 
 
 # Eliminar álbum por ID (requiere autenticación)
 @router.delete("/{album_id}", summary="Delete album")
 @validate_user
 async def delete_album_route(album_id: str, request: Request):
-    return delete_album(album_id, request)
+    return await delete_album(album_id)
 
 
 # Obtener álbum con más canciones (público)
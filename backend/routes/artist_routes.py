@@ -1,21 +1,27 @@
-from fastapi import APIRouter, HTTPException, Request
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import List, Optional, Union
 from bson import ObjectId
 
-from models.artist import ArtistCreate, ArtistUpdate, ArtistOut
+from models.artist import ArtistCreate, ArtistUpdate, ArtistOut, ArtistPage
 from models.genre import GenreListAssignment
+from models.batch import BatchGet, BatchResponse
 
 from controllers.album import get_album_statistics as controller_get_album_statistics
 from controllers.artist import (
     create_artist as controller_create_artist,
     update_artist as controller_update_artist,
     list_artists as controller_get_artists,
+    get_artists_batch as controller_get_artists_batch,
     list_albums_by_artist as controller_list_albums_by_artist,
     delete_artist as controller_delete_artist,
 )
 
 from utils.auth_dependency import validate_user, validate_admin
-from utils.mongodb import get_collection
+from utils.mongodb import get_async_collection
+from utils.references import require_references
+from utils.cache import response_cache
+from search import service as search_service
+from utils.pagination import MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/artists", tags=["Artists"])
 
@@ -26,9 +32,19 @@ async def create_artist(artist: ArtistCreate, request: Request):
     return await controller_create_artist(artist, request)
 
 # Obtener todos los artistas (público)
-@router.get("/", summary="List all artists", response_model=List[ArtistOut])
-async def get_artists():
-    return await controller_get_artists()
+# Con ?limit= y/o ?cursor= devuelve una página {items, next_cursor}
+@router.get("/", summary="List all artists", response_model=Union[List[ArtistOut], ArtistPage])
+async def get_artists(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor"),
+):
+    return await controller_get_artists(limit, cursor)
+
+# Obtener varios artistas por ID en una sola petición (público)
+# Devuelve {items, missing}: items en el orden pedido y los IDs que no existen
+@router.post("/batch", summary="Get artists by IDs", response_model=BatchResponse)
+async def get_artists_batch(payload: BatchGet):
+    return await controller_get_artists_batch(payload.ids, payload.fields)
 
 # Ruta estática primero para evitar conflictos con /{artist_id}/albums
 @router.get("/statistics/top", summary="Obtener artista con más álbumes")
@@ -50,25 +66,23 @@ async def update_artist(artist_id: str, artist: ArtistUpdate, request: Request):
 @router.patch("/{artist_id}/assign-genres", summary="Assign multiple genres to artist")
 @validate_user
 async def assign_genres_to_artist(artist_id: str, payload: GenreListAssignment, request: Request):
-    artist_coll = get_collection("artist")
-    genre_coll = get_collection("genre")
+    artist_coll = get_async_collection("artist")
 
     if not ObjectId.is_valid(artist_id):
         raise HTTPException(status_code=400, detail="Invalid artist ID format")
 
-    if not artist_coll.find_one({"_id": ObjectId(artist_id)}):
+    if not await artist_coll.find_one({"_id": ObjectId(artist_id)}):
         raise HTTPException(status_code=404, detail="Artist not found")
 
-    for gid in payload.genre_ids:
-        if not ObjectId.is_valid(gid):
-            raise HTTPException(status_code=400, detail=f"Invalid genre ID format: {gid}")
-        if not genre_coll.find_one({"_id": ObjectId(gid)}):
-            raise HTTPException(status_code=404, detail=f"Genre with ID {gid} not found")
+    await require_references("genre", payload.genre_ids, "Genre", projection={"_id": 1})
 
-    artist_coll.update_one(
+    # Se guardan como ObjectId, igual que en create_artist
+    await artist_coll.update_one(
         {"_id": ObjectId(artist_id)},
-        {"$set": {"genre": payload.genre_ids}},
+        {"$set": {"genre": [ObjectId(gid) for gid in payload.genre_ids]}},
     )
+    response_cache.invalidate("artist")
+    search_service.index_artist(artist_id, genre_ids=payload.genre_ids)
 
     return {
         "msg": "Genres assigned to artist successfully",
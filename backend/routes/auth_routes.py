@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
-from models.users import User, UserLogin
-from controllers.users import create_user, login_user
-from utils.auth_dependency import validate_user
+from fastapi import APIRouter, Depends, Request
+from models.users import User, UserLogin, RefreshRequest
+from controllers.users import create_user, login_user, refresh_session, logout_user
+from utils.auth_dependency import validate_user, validate_admin
+from utils.security import token_cache
 
 router = APIRouter(
     prefix="/auth",
@@ -18,6 +19,16 @@ async def register(user: User):
 async def login(user: UserLogin):
     return await login_user(user)
 
+# Renovar sesión con el refresh token (sin volver a Firebase)
+@router.post("/refresh", summary="Renovar access token")
+async def refresh(data: RefreshRequest):
+    return await refresh_session(data)
+
+# Cerrar sesión: revoca el refresh token
+@router.post("/logout", summary="Revocar refresh token")
+async def logout(data: RefreshRequest):
+    return await logout_user(data)
+
 # Obtener información del usuario autenticado (requiere token)
 @router.get("/me", summary="Obtener usuario actual")
 async def get_current_user(current_user: dict = Depends(validate_user)):
@@ -25,3 +36,9 @@ async def get_current_user(current_user: dict = Depends(validate_user)):
     Devuelve los datos del usuario autenticado a partir del token JWT.
     """
     return {"user": current_user}
+
+# Estadísticas de la caché de tokens verificados (solo administradores)
+@router.get("/token-cache", summary="Estadísticas de la caché de JWT verificados")
+@validate_admin
+async def get_token_cache_stats(request: Request):
+    return token_cache.stats()
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Query
+from typing import List, Literal, Optional
+from search import service as search_service
+
+router = APIRouter(prefix="/autocomplete", tags=["Autocomplete"])
+
+
+# Sugerencias por prefijo sobre artistas, álbumes, canciones y géneros (público)
+# Coincide con el inicio del nombre o de cualquiera de sus palabras, sin distinguir acentos
+@router.get("/", summary="Autocomplete artists, albums, songs and genres by prefix")
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100, description="Texto escrito hasta ahora"),
+    types: Optional[List[Literal["artist", "album", "song", "genre"]]] = Query(
+        None, description="Tipos a incluir (por defecto todos)"
+    ),
+    limit: int = Query(10, ge=1, le=50, description="Cantidad de sugerencias (1-50)"),
+):
+    return await search_service.autocomplete(q, types, limit)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Request, Query, status
+from typing import Optional
 from models.genre import Genre, UpdateGenre
 import controllers.genre as genre_controller
+from utils.pagination import MAX_PAGE_SIZE
 from utils.auth_dependency import validate_user  # usa validate_admin si solo admins pueden
 
 router = APIRouter(prefix="/genres", tags=["Genres"])
@@ -23,13 +25,18 @@ async def create_genre(genre: Genre, request: Request):
 
 # Listar géneros (público)
 # Por defecto solo activos; usar ?include_inactive=true para ver también inactivos
+# Con ?limit= y/o ?cursor= devuelve una página {items, next_cursor} ordenada por nombre
 @router.get(
     "/",
     summary="Listar géneros (por defecto solo activos)",
-    responses={200: {"description": "OK"}},
+    responses={200: {"description": "OK"}, 400: {"description": "Cursor inválido"}},
 )
-async def get_all_genres(include_inactive: bool = Query(False)):
-    return await genre_controller.get_all_genres(include_inactive)
+async def get_all_genres(
+    include_inactive: bool = Query(False),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor"),
+):
+    return await genre_controller.get_all_genres(include_inactive, limit, cursor)
 
 
 # Obtener género por ID (público)
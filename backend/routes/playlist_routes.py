@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Request
-from models.playlist import Playlist, PlaylistAddSongs
+from fastapi import APIRouter, Query, Request
+from typing import Literal, Optional
+from models.playlist import Playlist, PlaylistAddSongs, PlaylistMoveItem
+from utils.pagination import MAX_PAGE_SIZE
 from utils.auth_dependency import validate_user
 from controllers import playlist as playlist_controller
 
@@ -9,37 +11,75 @@ router = APIRouter(prefix="/playlists", tags=["Playlists"])
 @router.post("/", summary="Crear una nueva playlist")
 @validate_user
 async def create_playlist_route(playlist: Playlist, request: Request):
-    user_email = request.state.user["email"]
-    return await playlist_controller.create_playlist(playlist, user_email)
+    return await playlist_controller.create_playlist(playlist, request)
 
 # Obtener playlists del usuario autenticado
+# Con ?expand=songs las canciones vienen hidratadas (título, duración, álbum y artista)
 @router.get("/", summary="Obtener playlists del usuario autenticado")
 @validate_user
-async def get_user_playlists_route(request: Request):
-    user_email = request.state.user["email"]
-    return await playlist_controller.get_playlists_by_user(user_email)
+async def get_user_playlists_route(
+    request: Request,
+    expand: Optional[Literal["songs"]] = Query(None, description="Incluir los datos de las canciones"),
+):
+    return await playlist_controller.get_playlists_by_user(request, expand)
+
+# Obtener una playlist del usuario autenticado
+@router.get("/{playlist_id}", summary="Obtener una playlist por ID")
+@validate_user
+async def get_playlist_route(
+    playlist_id: str,
+    request: Request,
+    expand: Optional[Literal["songs"]] = Query(None, description="Incluir los datos de las canciones"),
+):
+    return await playlist_controller.get_playlist(playlist_id, request, expand)
 
 # Agregar canciones a playlist (con validación)
 @router.patch("/{playlist_id}/add-song", summary="Agregar canciones a una playlist")
 @validate_user
 async def add_songs_to_playlist_route(playlist_id: str, payload: PlaylistAddSongs, request: Request):
-    user_email = request.state.user["email"]
     return await playlist_controller.add_songs_to_playlist(
-        playlist_id, payload.song_ids, user_email
+        playlist_id, payload.song_ids, request
     )
 
 # Remover canciones de playlist
 @router.patch("/{playlist_id}/remove-song", summary="Quitar canciones de una playlist")
 @validate_user
 async def remove_songs_from_playlist_route(playlist_id: str, payload: PlaylistAddSongs, request: Request):
-    user_email = request.state.user["email"]
     return await playlist_controller.remove_songs_from_playlist(
-        playlist_id, payload.song_ids, user_email
+        playlist_id, payload.song_ids, request
     )
 
 # Eliminar playlist por ID
 @router.delete("/{playlist_id}", summary="Eliminar playlist por ID")
 @validate_user
 async def delete_playlist_route(playlist_id: str, request: Request):
-    user_email = request.state.user["email"]
-    return await playlist_controller.delete_playlist(playlist_id, user_email)
+    return await playlist_controller.delete_playlist(playlist_id, request)
+
+# Listar canciones de una playlist en modo items (paginado por posición)
+@router.get("/{playlist_id}/items", summary="Listar canciones de la playlist en orden (paginado)")
+@validate_user
+async def list_playlist_items_route(
+    playlist_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor"),
+):
+    return await playlist_controller.list_playlist_items(playlist_id, request, limit, cursor)
+
+# Mover una canción dentro de la playlist
+@router.patch("/{playlist_id}/items/{item_id}/move", summary="Mover una canción de la playlist")
+@validate_user
+async def move_playlist_item_route(playlist_id: str, item_id: str, payload: PlaylistMoveItem, request: Request):
+    return await playlist_controller.move_playlist_item(playlist_id, item_id, payload.after, request)
+
+# Quitar una canción puntual de la playlist
+@router.delete("/{playlist_id}/items/{item_id}", summary="Quitar una canción de la playlist")
+@validate_user
+async def remove_playlist_item_route(playlist_id: str, item_id: str, request: Request):
+    return await playlist_controller.remove_playlist_item(playlist_id, item_id, request)
+
+# Pasar una playlist al almacenamiento por items
+@router.post("/{playlist_id}/convert-storage", summary="Pasar la playlist a almacenamiento por items")
+@validate_user
+async def convert_playlist_storage_route(playlist_id: str, request: Request):
+    return await playlist_controller.convert_playlist_storage(playlist_id, request)
@@ -0,0 +1,66 @@
+import os
+
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import FileResponse
+from models.profiling import ProfilingArm
+from utils.auth_dependency import validate_admin
+from utils import profiling
+
+router = APIRouter(prefix="/admin/profiling", tags=["Profiling"])
+
+
+def _profile_out(profile: dict) -> dict:
+    out = {k: v for k, v in profile.items() if k != "path"}
+    out["file"] = os.path.basename(profile["path"])
+    return out
+
+
+# Estado del perfilado: rutas armadas y perfiles guardados (solo administradores)
+@router.get("/", summary="Rutas armadas y perfiles disponibles")
+@validate_admin
+async def get_profiling_status(request: Request):
+    return {
+        "enabled": profiling.PROFILING_ENABLED,
+        "armed": profiling.armed(),
+        "profiles": [_profile_out(p) for p in profiling.profiles()],
+    }
+
+
+# Perfilar las próximas N peticiones a una ruta
+@router.post(
+    "/arm",
+    summary="Perfilar las próximas N peticiones a una ruta",
+    responses={200: {"description": "Ruta armada"}, 404: {"description": "Ruta inexistente"},
+               409: {"description": "Perfilado desactivado"}},
+)
+@validate_admin
+async def arm_profiling(data: ProfilingArm, request: Request):
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=409, detail="Profiling is disabled (PROFILING_ENABLED=false)")
+    method = data.method.upper()
+    if not any(getattr(r, "path", None) == data.route and method in (getattr(r, "methods", None) or ())
+               for r in request.app.routes):
+        raise HTTPException(status_code=404, detail=f"Route not found: {method} {data.route}")
+    return profiling.arm(method, data.route, data.count, data.format, request.state.user.get("email"))
+
+
+# Desarmar todas las rutas
+@router.delete("/arm", summary="Cancelar el perfilado armado")
+@validate_admin
+async def disarm_profiling(request: Request):
+    return {"disarmed": profiling.disarm()}
+
+
+# Descargar un perfil (.prof para pstats, .folded para flamegraph)
+@router.get(
+    "/{profile_id}",
+    summary="Descargar perfil",
+    responses={200: {"description": "Archivo del perfil"}, 404: {"description": "Perfil no encontrado"}},
+)
+@validate_admin
+async def download_profile(profile_id: str, request: Request):
+    profile = profiling.get_profile(profile_id)
+    if not profile or not os.path.exists(profile["path"]):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/octet-stream" if profile["format"] == "pstats" else "text/plain"
+    return FileResponse(profile["path"], media_type=media_type, filename=os.path.basename(profile["path"]))
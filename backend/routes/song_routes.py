@@ -1,16 +1,19 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
 from models.song import Song, SongUpdate
+from models.batch import BatchGet, BatchResponse
 from controllers.song import (
     create_song as controller_create_song,
     list_songs as controller_list_songs,
+    get_songs_batch as controller_get_songs_batch,
     patch_song as controller_patch_song,
     delete_song as controller_delete_song,
     get_songs_by_artist as controller_get_songs_by_artist,
     get_songs_by_album as controller_get_songs_by_album,
 )
 from utils.auth_dependency import validate_user
-from utils.mongodb import get_collection
-from bson import ObjectId
+from utils.pagination import MAX_PAGE_SIZE
+from search import service as search_service
+from typing import Literal, Optional
 
 router = APIRouter(prefix="/songs", tags=["Songs"])
 
@@ -18,27 +21,42 @@ router = APIRouter(prefix="/songs", tags=["Songs"])
 # Crear canción (requiere autenticación)
 @router.post("/", summary="Create new song")
 @validate_user
-async def create_song(song: Song):
+async def create_song(song: Song, request: Request):
     return await controller_create_song(song)
 
 
 # Listar todas las canciones (público)
+# Con ?limit= y/o ?cursor= devuelve una página {items, next_cursor}
+# Con ?stream=ndjson|json envía la colección completa a medida que se lee
 @router.get("/", summary="List all songs")
-async def get_songs():
-    return await controller_list_songs()
+async def get_songs(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en next_cursor"),
+    stream: Optional[Literal["ndjson", "json"]] = Query(
+        None, description="Exporta la colección completa en streaming (ndjson o array json)"
+    ),
+):
+    return await controller_list_songs(limit, cursor, stream)
+
+
+# Obtener varias canciones por ID en una sola petición (público)
+# Devuelve {items, missing}: items en el orden pedido y los IDs que no existen
+@router.post("/batch", summary="Get songs by IDs", response_model=BatchResponse)
+async def get_songs_batch(payload: BatchGet):
+    return await controller_get_songs_batch(payload.ids, payload.fields)
 
 
 # Actualizar canción por ID (requiere autenticación)
 @router.patch("/{song_id}", summary="Update song by ID")
 @validate_user
-async def update_song(song_id: str, song: SongUpdate):
+async def update_song(song_id: str, song: SongUpdate, request: Request):
     return await controller_patch_song(song_id, song)
 
 
 # Eliminar canción por ID (requiere autenticación)
 @router.delete("/{song_id}", summary="Delete song by ID")
 @validate_user
-async def remove_song(song_id: str):
+async def remove_song(song_id: str, request: Request):
     return await controller_delete_song(song_id)
 
 
@@ -55,22 +73,15 @@ async def get_songs_by_album(album_id: str):
 
 
 # Buscar canciones por nombre, género o artista (público)
+# name es texto libre: coincide con el título, el nombre del artista o sus géneros
+# y los resultados se ordenan por relevancia. Con ?fuzzy=true tolera errores de tipeo
 @router.get("/search", summary="Search songs by name, genre or artist (no token)")
 async def search_songs(
-    name: str = Query(None, description="Nombre parcial de la canción"),
+    name: str = Query(None, description="Texto a buscar (título, artista o género)"),
     genre: str = Query(None, description="ID del género"),
     artist: str = Query(None, description="ID del artista"),
-    limit: int = Query(10, ge=1, le=50, description="Límite de resultados (1-50)")
+    limit: int = Query(10, ge=1, le=50, description="Límite de resultados (1-50)"),
+    offset: int = Query(0, ge=0, description="Resultados a omitir (paginación)"),
+    fuzzy: bool = Query(False, description="Tolerar errores de tipeo (p. ej. \"beyonse\")"),
 ):
-    songs_coll = get_collection("songs")
-
-    query = {}
-    if name:
-        query["title"] = {"$regex": name, "$options": "i"}
-    if genre and ObjectId.is_valid(genre):
-        query["genre_id"] = ObjectId(genre)
-    if artist and ObjectId.is_valid(artist):
-        query["artist_id"] = ObjectId(artist)
-
-    songs = songs_coll.find(query).limit(limit)
-    return [{**song, "_id": str(song["_id"])} for song in songs]
+    return await search_service.search_songs(name, genre, artist, offset, limit, fuzzy)
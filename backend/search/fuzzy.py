@@ -0,0 +1,113 @@
+from collections import Counter, defaultdict
+
+# Tokens hasta este largo también se indexan por sus borrados de un carácter: un solo error
+# (sobre todo una transposición, "rcok") puede no dejar ningún trigrama en común
+SHORT_TOKEN_LEN = 8
+
+
+def trigrams(token: str) -> list:
+    """
+    Trigramas del token con bordes marcados ("rock" -> $ro, roc, ock, ck$).
+    """
+    padded = f"${token}$"
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(max(1, len(padded) - 2))))
+
+
+def deletes(token: str) -> set:
+    """
+    El token y sus variantes con un carácter menos ("rock" -> rock, ock, rck, rok, roc).
+    Dos tokens a distancia 1 comparten al menos una variante.
+    """
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def max_distance(token: str) -> int:
+    """
+    Errores tolerados según el largo del token: ninguno en tokens muy cortos.
+    """
+    if len(token) <= 2:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+
+def edit_distance(a: str, b: str, limit: int):
+    """
+    Distancia de Damerau-Levenshtein (transposiciones adyacentes incluidas).
+    Devuelve None si supera limit, cortando en cuanto dos filas seguidas lo superan.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit and min(prev) > limit:
+            return None
+        prev2, prev = prev, row
+    return prev[-1] if prev[-1] <= limit else None
+
+
+class TrigramIndex:
+    """
+    Índice de trigramas sobre un vocabulario de tokens para generar candidatos
+    de búsqueda tolerante a errores sin comparar contra todo el vocabulario.
+    Los tokens cortos además se indexan por borrados (ver deletes).
+    """
+
+    def __init__(self):
+        self._grams = defaultdict(set)   # trigrama -> tokens
+        self._deletes = defaultdict(set)  # variante con un carácter menos -> tokens cortos
+
+    def _keys(self, token: str):
+        # (diccionario, clave) donde se registra el token
+        for g in trigrams(token):
+            yield self._grams, g
+        if len(token) <= SHORT_TOKEN_LEN:
+            for d in deletes(token):
+                yield self._deletes, d
+
+    def add(self, token: str):
+        for buckets, key in self._keys(token):
+            buckets[key].add(token)
+
+    def remove(self, token: str):
+        for buckets, key in self._keys(token):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(token)
+                if not bucket:
+                    del buckets[key]
+
+    def similar(self, token: str) -> dict:
+        """
+        Tokens del vocabulario a distancia de edición aceptable: {token: similitud 0..1}.
+        Cada error cambia a lo sumo 4 trigramas (una transposición), así que un token a
+        distancia k comparte al menos len(trigramas) - 4k con la consulta y solo se verifican
+        los que alcanzan ese mínimo. En tokens cortos ese mínimo puede ser 0: ahí los
+        candidatos a distancia 1 salen de los borrados.
+        """
+        limit = max_distance(token)
+        if not limit:
+            return {}
+        grams = trigrams(token)
+        shared = Counter()
+        for g in grams:
+            shared.update(self._grams.get(g, ()))
+
+        needed = max(1, len(grams) - 4 * limit)
+        candidates = {c for c, count in shared.items() if count >= needed}
+        if len(token) <= SHORT_TOKEN_LEN:
+            for d in deletes(token):
+                candidates.update(self._deletes.get(d, ()))
+
+        matches = {}
+        for candidate in candidates:
+            distance = edit_distance(token, candidate, limit)
+            if distance is not None:
+                matches[candidate] = 1 - distance / max(len(token), len(candidate))
+        return matches
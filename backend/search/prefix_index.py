@@ -0,0 +1,112 @@
+from bisect import bisect_left, insort
+from heapq import merge
+from itertools import islice
+
+from search.text import tokenize
+
+# Tipos de entidad que admite el autocompletado
+KINDS = ("artist", "album", "song", "genre")
+
+
+class PrefixIndex:
+    """
+    Arreglos ordenados de claves normalizadas para autocompletar por prefijo con bisect.
+    Cada nombre se indexa completo y también desde el inicio de cada palabra,
+    así "rhap" encuentra "Bohemian Rhapsody". Hay un arreglo por tipo y por clase de
+    clave (nombre completo / palabra), así una consulta solo recorre coincidencias útiles.
+    """
+
+    def __init__(self):
+        self._full = {kind: [] for kind in KINDS}      # kind -> [(nombre completo, id)] ordenado
+        self._partial = {kind: [] for kind in KINDS}   # kind -> [(desde otra palabra, id)] ordenado
+        self._keys = {}      # (kind, id) -> claves indexadas (la primera es el nombre completo)
+        self._labels = {}    # (kind, id) -> texto original
+
+    def __len__(self):
+        return len(self._labels)
+
+    @staticmethod
+    def _keys_for(label: str) -> list:
+        folded = " ".join(tokenize(label)) if label else ""
+        if not folded:
+            return []
+        words = folded.split(" ")
+        return list(dict.fromkeys(" ".join(words[i:]) for i in range(len(words))))
+
+    def add(self, kind: str, item_id, label: str):
+        item_id = str(item_id)
+        self.remove(kind, item_id)
+        keys = self._keys_for(label)
+        if not keys:
+            return
+        insort(self._full[kind], (keys[0], item_id))
+        for key in keys[1:]:
+            insort(self._partial[kind], (key, item_id))
+        self._keys[(kind, item_id)] = keys
+        self._labels[(kind, item_id)] = label
+
+    def remove(self, kind: str, item_id):
+        item_id = str(item_id)
+        keys = self._keys.pop((kind, item_id), ())
+        for position, key in enumerate(keys):
+            entries = self._full[kind] if position == 0 else self._partial[kind]
+            i = bisect_left(entries, (key, item_id))
+            if i < len(entries) and entries[i] == (key, item_id):
+                del entries[i]
+        self._labels.pop((kind, item_id), None)
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        Construcción masiva: items es un iterable de (kind, id, label). Ordena una sola vez.
+        """
+        index = cls()
+        for kind, item_id, label in items:
+            keys = cls._keys_for(label)
+            if keys:
+                item_id = str(item_id)
+                index._keys[(kind, item_id)] = keys
+                index._labels[(kind, item_id)] = label
+                index._full[kind].append((keys[0], item_id))
+                index._partial[kind].extend((key, item_id) for key in keys[1:])
+        for entries in (*index._full.values(), *index._partial.values()):
+            entries.sort()
+        return index
+
+    @staticmethod
+    def _matches(entries: list, prefix: str, kind: str):
+        # (clave, kind, id) de las entradas que empiezan por prefix, en orden
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            key, item_id = entries[i]
+            yield key, kind, item_id
+            i += 1
+
+    def complete(self, prefix: str, kinds=None, limit: int = 10) -> list:
+        """
+        Devuelve hasta limit coincidencias [{type, id, label}]. Primero las que empiezan
+        por el prefijo desde el inicio del nombre, luego las que coinciden en otra palabra;
+        dentro de cada grupo en orden alfabético.
+        """
+        prefix = " ".join(tokenize(prefix)) if prefix else ""
+        if not prefix or limit <= 0:
+            return []
+        kinds = [k for k in KINDS if k in set(kinds or KINDS)]
+
+        # Un nombre completo aparece una sola vez por item
+        full = [(kind, item_id) for _, kind, item_id in islice(
+            merge(*(self._matches(self._full[k], prefix, k) for k in kinds)), limit)]
+
+        # Un item puede coincidir en varias palabras: se cuentan solo los items nuevos
+        seen = set(full)
+        partial = []
+        if len(full) < limit:
+            for _, kind, item_id in merge(*(self._matches(self._partial[k], prefix, k) for k in kinds)):
+                if (kind, item_id) not in seen:
+                    seen.add((kind, item_id))
+                    partial.append((kind, item_id))
+                    if len(full) + len(partial) >= limit:
+                        break
+
+        return [{"type": kind, "id": item_id, "label": self._labels[(kind, item_id)]}
+                for kind, item_id in full + partial]
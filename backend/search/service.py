@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Optional
+
+from bson import ObjectId
+
+from search.prefix_index import KINDS, PrefixIndex
+from search.song_index import SongSearchIndex
+from utils.mongodb import get_async_collection
+
+# Búsqueda de canciones sobre un índice invertido en memoria y autocompletado por prefijo.
+# El índice se construye en segundo plano al arrancar; mientras no está listo
+# /songs/search y /autocomplete consultan Mongo con regex. Las escrituras de este proceso
+# los actualizan al momento. Con SEARCH_REFRESH_SECONDS > 0 además se reconstruye
+# periódicamente para recoger cambios hechos por otros workers (cada proceso tiene sus
+# propios índices); por defecto solo se construye al arrancar.
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "0"))
+SEARCH_BUILD_BATCH_SIZE = int(os.getenv("SEARCH_BUILD_BATCH_SIZE", "1000"))
+
+logger = logging.getLogger(__name__)
+
+_index = SongSearchIndex()
+_autocomplete = PrefixIndex()
+_ready = False
+# Escrituras recibidas durante una reconstrucción: se repiten sobre los índices nuevos
+_pending = None
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+# -----------------------------
+# Construcción
+# -----------------------------
+async def _fetch_rows() -> list:
+    # [(tipo, _id, nombre, extra)] de géneros, artistas, álbumes y canciones
+    rows = []
+    async for genre in get_async_collection("genre").find({}, {"name": 1}).batch_size(SEARCH_BUILD_BATCH_SIZE):
+        rows.append(("genre", genre["_id"], genre.get("name"), None))
+
+    artists = get_async_collection("artist").find({}, {"name": 1, "genre": 1})
+    async for artist in artists.batch_size(SEARCH_BUILD_BATCH_SIZE):
+        rows.append(("artist", artist["_id"], artist.get("name"), _genre_list(artist.get("genre"))))
+
+    async for album in get_async_collection("album").find({}, {"title": 1}).batch_size(SEARCH_BUILD_BATCH_SIZE):
+        rows.append(("album", album["_id"], album.get("title"), None))
+
+    songs = get_async_collection("songs").find({}, {"title": 1, "artist": 1})
+    async for song in songs.batch_size(SEARCH_BUILD_BATCH_SIZE):
+        rows.append(("song", song["_id"], song.get("title"), song.get("artist")))
+    return rows
+
+
+def _build_from_rows(rows: list):
+    # Tokenizar y ordenar es CPU: se ejecuta en un hilo para no bloquear el event loop
+    index = SongSearchIndex()
+    for kind, entity_id, name, extra in rows:
+        if kind == "genre":
+            index.upsert_genre(entity_id, name or "")
+        elif kind == "artist":
+            index.upsert_artist(entity_id, name or "", extra)
+        elif kind == "song":
+            index.upsert_song(entity_id, name or "", extra)
+    return index, PrefixIndex.from_items([(kind, entity_id, name) for kind, entity_id, name, _ in rows])
+
+
+async def build_indexes():
+    """
+    Lee géneros, artistas, álbumes y canciones y arma índices nuevos.
+    Devuelve (SongSearchIndex, PrefixIndex).
+    """
+    rows = await _fetch_rows()
+    return await asyncio.to_thread(_build_from_rows, rows)
+
+
+async def rebuild_index():
+    """
+    Construye índices nuevos y los reemplaza de una sola vez (las búsquedas en curso
+    siguen usando los anteriores). Las escrituras hechas mientras se construían se
+    repiten sobre los índices nuevos antes de publicarlos.
+    """
+    global _index, _autocomplete, _ready, _pending
+    _pending = []
+    try:
+        index, autocomplete = await build_indexes()
+        # Sin await entre la repetición y el reemplazo: ninguna escritura queda fuera
+        for op, args in _pending:
+            op(index, autocomplete, *args)
+        _index, _autocomplete = index, autocomplete
+        _ready = True
+    finally:
+        _pending = None
+    logger.info("Índices de búsqueda listos: %d canciones, %d nombres", len(index), len(autocomplete))
+
+
+async def _refresh_loop():
+    while True:
+        try:
+            await rebuild_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("No se pudo construir el índice de búsqueda: %s", e)
+        if SEARCH_REFRESH_SECONDS <= 0:
+            return
+        await asyncio.sleep(SEARCH_REFRESH_SECONDS)
+
+
+def start_search_index() -> Optional[asyncio.Task]:
+    """
+    Lanza la construcción y el refresco periódico del índice. Devuelve la tarea
+    para cancelarla al apagar el servidor (None si la búsqueda indexada está desactivada).
+    """
+    if not SEARCH_INDEX_ENABLED:
+        return None
+    return asyncio.create_task(_refresh_loop())
+
+
+def _genre_list(raw) -> list:
+    # Datos antiguos guardan el género como un único string
+    if isinstance(raw, list):
+        return raw
+    return [raw] if raw else []
+
+
+# -----------------------------
+# Actualización desde las escrituras
+# -----------------------------
+def _apply(op, *args):
+    op(_index, _autocomplete, *args)
+    if _pending is not None:
+        _pending.append((op, args))
+
+
+def _index_song(index, autocomplete, song_id, title, artist_id):
+    index.upsert_song(song_id, title or "", artist_id)
+    autocomplete.add("song", song_id, title)
+
+
+def _unindex_song(index, autocomplete, song_id):
+    index.remove_song(song_id)
+    autocomplete.remove("song", song_id)
+
+
+def _index_artist(index, autocomplete, artist_id, name, genre_ids):
+    index.upsert_artist(artist_id, name, genre_ids)
+    if name is not None:
+        autocomplete.add("artist", artist_id, name)
+
+
+def _unindex_artist(index, autocomplete, artist_id):
+    index.remove_artist(artist_id)
+    autocomplete.remove("artist", artist_id)
+
+
+def _index_album(index, autocomplete, album_id, title):
+    autocomplete.add("album", album_id, title)
+
+
+def _unindex_album(index, autocomplete, album_id):
+    autocomplete.remove("album", album_id)
+
+
+def _index_genre(index, autocomplete, genre_id, name):
+    index.upsert_genre(genre_id, name or "")
+    autocomplete.add("genre", genre_id, name)
+
+
+def _unindex_genre(index, autocomplete, genre_id):
+    index.remove_genre(genre_id)
+    autocomplete.remove("genre", genre_id)
+
+
+def index_song(song_id, title: str, artist_id):
+    _apply(_index_song, song_id, title, artist_id)
+
+
+def unindex_song(song_id):
+    _apply(_unindex_song, song_id)
+
+
+def index_artist(artist_id, name: Optional[str] = None, genre_ids=None):
+    _apply(_index_artist, artist_id, name, None if genre_ids is None else _genre_list(genre_ids))
+
+
+def unindex_artist(artist_id):
+    _apply(_unindex_artist, artist_id)
+
+
+def index_album(album_id, title: str):
+    _apply(_index_album, album_id, title)
+
+
+def unindex_album(album_id):
+    _apply(_unindex_album, album_id)
+
+
+def index_genre(genre_id, name: str):
+    _apply(_index_genre, genre_id, name)
+
+
+def unindex_genre(genre_id):
+    _apply(_unindex_genre, genre_id)
+
+
+# -----------------------------
+# Consulta
+# -----------------------------
+async def _search_with_index(name, genre, artist, offset, limit, fuzzy):
+    total, ranked = _index.search(name or "", artist=artist, genre=genre,
+                                  offset=offset, limit=limit, fuzzy=fuzzy)
+    ids = [ObjectId(song_id) for song_id, _ in ranked if ObjectId.is_valid(song_id)]
+    docs = await get_async_collection("songs").find({"_id": {"$in": ids}}).to_list()
+    by_id = {str(d["_id"]): d for d in docs}
+
+    items = []
+    for song_id, score in ranked:
+        doc = by_id.get(song_id)
+        if doc:
+            items.append({**doc, "_id": song_id, "score": score})
+    return total, items
+
+
+async def _search_with_regex(name, genre, artist, offset, limit):
+    query = {}
+    if name:
+        query["title"] = {"$regex": re.escape(name), "$options": "i"}
+    if artist:
+        query["artist"] = artist
+    if genre:
+        # Las canciones no guardan el género: se filtra por los artistas que lo tienen
+        genre_filter = [genre, ObjectId(genre)] if ObjectId.is_valid(genre) else [genre]
+        artists = await get_async_collection("artist").find(
+            {"genre": {"$in": genre_filter}}, {"_id": 1}
+        ).to_list()
+        artist_ids = [str(a["_id"]) for a in artists]
+        if artist:
+            artist_ids = [a for a in artist_ids if a == artist]
+        query["artist"] = {"$in": artist_ids}
+
+    songs_coll = get_async_collection("songs")
+    total = await songs_coll.count_documents(query)
+    songs = await songs_coll.find(query).sort("title", 1).skip(offset).limit(limit).to_list()
+    return total, [{**song, "_id": str(song["_id"]), "score": 0} for song in songs]
+
+
+async def search_songs(name: Optional[str] = None, genre: Optional[str] = None,
+                       artist: Optional[str] = None, offset: int = 0, limit: int = 10,
+                       fuzzy: bool = False) -> dict:
+    """
+    Busca canciones por texto libre (título, artista o género) y filtros opcionales
+    por ID de artista y de género. Devuelve {items, total, offset, limit} ordenado por relevancia.
+    fuzzy tolera errores de tipeo; requiere el índice (con la consulta regex se ignora).
+    """
+    if _ready:
+        total, items = await _search_with_index(name, genre, artist, offset, limit, fuzzy)
+    else:
+        total, items = await _search_with_regex(name, genre, artist, offset, limit)
+    return {"items": items, "total": total, "offset": offset, "limit": limit}
+
+
+# Campo de nombre de cada colección para el autocompletado sin índice
+_AUTOCOMPLETE_FIELDS = {
+    "artist": ("artist", "name"),
+    "album": ("album", "title"),
+    "song": ("songs", "title"),
+    "genre": ("genre", "name_lc"),
+}
+
+
+async def _autocomplete_with_regex(prefix, kinds, limit):
+    results = []
+    for kind in kinds:
+        collection, field = _AUTOCOMPLETE_FIELDS[kind]
+        value = prefix.lower() if field == "name_lc" else prefix
+        docs = await get_async_collection(collection).find(
+            {field: {"$regex": f"^{re.escape(value)}", "$options": "i"}}, {field: 1, "name": 1}
+        ).limit(limit).to_list()
+        for d in docs:
+            label = d.get("name") if kind == "genre" else d.get(field)
+            results.append({"type": kind, "id": str(d["_id"]), "label": label})
+    return sorted(results, key=lambda r: (r["label"] or "").lower())[:limit]
+
+
+async def autocomplete(prefix: str, kinds=None, limit: int = 10) -> list:
+    """
+    Sugerencias [{type, id, label}] cuyo nombre (o alguna de sus palabras) empieza por prefix.
+    """
+    kinds = [k for k in (kinds or KINDS) if k in KINDS]
+    if _ready:
+        return _autocomplete.complete(prefix, kinds, limit)
+    return await _autocomplete_with_regex(prefix, kinds, limit)
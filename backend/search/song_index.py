@@ -0,0 +1,221 @@
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Optional
+
+from search.fuzzy import TrigramIndex
+from search.text import fold, tokenize
+
+# Pesos por campo al puntuar una coincidencia de token
+TITLE_WEIGHT = 3
+ARTIST_WEIGHT = 2
+GENRE_WEIGHT = 1
+
+
+class SongSearchIndex:
+    """
+    Índice invertido en memoria sobre títulos de canciones, nombres de artistas
+    y nombres de géneros. Las canciones se relacionan con géneros a través de su artista.
+    Los IDs de canciones se guardan como enteros internos para ahorrar memoria.
+    El último token de la consulta también coincide por prefijo ("bohem" -> "bohemian").
+    En modo fuzzy cada token también coincide con palabras parecidas ("beyonse" -> "beyonce"),
+    con un puntaje proporcional a la similitud.
+    """
+
+    def __init__(self):
+        self._song_ids = {}                         # id Mongo -> id interno
+        self._song_keys = []                        # id interno -> id Mongo (None si se borró)
+        self._song_title = {}                       # id interno -> título normalizado
+        self._song_tokens = {}                      # id interno -> tokens del título
+        self._song_artist = {}                      # id interno -> artist_id
+        self._title_postings = {}                   # token -> ids internos
+
+        self._artist_songs = defaultdict(set)       # artist_id -> ids internos
+        self._artist_tokens = {}                    # artist_id -> tokens del nombre
+        self._artist_postings = {}                  # token -> artist_ids
+        self._artist_genres = {}                    # artist_id -> genre_ids
+        self._genre_artists = defaultdict(set)      # genre_id -> artist_ids
+
+        self._genre_tokens = {}                     # genre_id -> tokens del nombre
+        self._genre_postings = {}                   # token -> genre_ids
+
+        self._vocab = {}                            # vocabularios ordenados (para prefijos), perezosos
+        self._grams = {"title": TrigramIndex(), "artist": TrigramIndex(), "genre": TrigramIndex()}
+
+    def __len__(self):
+        return len(self._song_title)
+
+    # -----------------------------
+    # Mantenimiento
+    # -----------------------------
+    def _post(self, field: str, postings: dict, tokens, key):
+        for t in tokens:
+            bucket = postings.get(t)
+            if bucket is None:
+                bucket = postings[t] = set()
+                self._grams[field].add(t)
+                self._vocab.pop(field, None)
+            bucket.add(key)
+
+    def _unpost(self, field: str, postings: dict, tokens, key):
+        for t in tokens:
+            bucket = postings.get(t)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del postings[t]
+                    self._grams[field].remove(t)
+                    self._vocab.pop(field, None)
+
+    def upsert_song(self, song_id: str, title: str, artist_id: Optional[str]):
+        song_id = str(song_id)
+        doc = self._song_ids.get(song_id)
+        if doc is None:
+            doc = len(self._song_keys)
+            self._song_ids[song_id] = doc
+            self._song_keys.append(song_id)
+        else:
+            self._unpost("title", self._title_postings, self._song_tokens.get(doc, ()), doc)
+            self._artist_songs[self._song_artist.get(doc)].discard(doc)
+
+        tokens = frozenset(tokenize(title))
+        self._song_title[doc] = fold(title)
+        self._song_tokens[doc] = tokens
+        self._song_artist[doc] = str(artist_id) if artist_id else None
+        self._post("title", self._title_postings, tokens, doc)
+        self._artist_songs[self._song_artist[doc]].add(doc)
+
+    def remove_song(self, song_id: str):
+        doc = self._song_ids.pop(str(song_id), None)
+        if doc is None:
+            return
+        self._unpost("title", self._title_postings, self._song_tokens.pop(doc, ()), doc)
+        self._artist_songs[self._song_artist.pop(doc, None)].discard(doc)
+        self._song_title.pop(doc, None)
+        self._song_keys[doc] = None
+
+    def upsert_artist(self, artist_id: str, name: Optional[str] = None, genre_ids=None):
+        artist_id = str(artist_id)
+        if name is not None:
+            self._unpost("artist", self._artist_postings, self._artist_tokens.get(artist_id, ()), artist_id)
+            tokens = frozenset(tokenize(name))
+            self._artist_tokens[artist_id] = tokens
+            self._post("artist", self._artist_postings, tokens, artist_id)
+        if genre_ids is not None:
+            for gid in self._artist_genres.get(artist_id, ()):
+                self._genre_artists[gid].discard(artist_id)
+            genres = frozenset(str(g) for g in genre_ids)
+            self._artist_genres[artist_id] = genres
+            for gid in genres:
+                self._genre_artists[gid].add(artist_id)
+
+    def remove_artist(self, artist_id: str):
+        artist_id = str(artist_id)
+        self._unpost("artist", self._artist_postings, self._artist_tokens.pop(artist_id, ()), artist_id)
+        for gid in self._artist_genres.pop(artist_id, ()):
+            self._genre_artists[gid].discard(artist_id)
+
+    def upsert_genre(self, genre_id: str, name: str):
+        genre_id = str(genre_id)
+        self._unpost("genre", self._genre_postings, self._genre_tokens.get(genre_id, ()), genre_id)
+        tokens = frozenset(tokenize(name))
+        self._genre_tokens[genre_id] = tokens
+        self._post("genre", self._genre_postings, tokens, genre_id)
+
+    def remove_genre(self, genre_id: str):
+        genre_id = str(genre_id)
+        self._unpost("genre", self._genre_postings, self._genre_tokens.pop(genre_id, ()), genre_id)
+
+    # -----------------------------
+    # Consulta
+    # -----------------------------
+    def _match(self, field: str, postings: dict, token: str, prefix: bool, fuzzy: bool) -> dict:
+        """
+        Claves que coinciden con el token: {clave: factor}. Coincidencia exacta o por
+        prefijo vale 1; en modo fuzzy las palabras parecidas valen su similitud (< 1).
+        """
+        matched = {}
+        if fuzzy:
+            for similar, factor in self._grams[field].similar(token).items():
+                for key in postings[similar]:
+                    matched[key] = max(matched.get(key, 0), factor)
+        if prefix:
+            vocab = self._vocab.get(field)
+            if vocab is None:
+                vocab = self._vocab[field] = sorted(postings)
+            i = bisect_left(vocab, token)
+            while i < len(vocab) and vocab[i].startswith(token):
+                matched.update(dict.fromkeys(postings[vocab[i]], 1))
+                i += 1
+        else:
+            matched.update(dict.fromkeys(postings.get(token, ()), 1))
+        return matched
+
+    def _artists_with_genre_token(self, token: str, prefix: bool, fuzzy: bool) -> dict:
+        artists = {}
+        for gid, factor in self._match("genre", self._genre_postings, token, prefix, fuzzy).items():
+            for aid in self._genre_artists.get(gid, ()):
+                artists[aid] = max(artists.get(aid, 0), factor)
+        return artists
+
+    def _filter(self, docs, artist: Optional[str], genre: Optional[str]):
+        if artist:
+            docs = (d for d in docs if self._song_artist.get(d) == artist)
+        if genre:
+            allowed = self._genre_artists.get(genre, set())
+            docs = (d for d in docs if self._song_artist.get(d) in allowed)
+        return docs
+
+    def search(self, query: str = "", artist: Optional[str] = None, genre: Optional[str] = None,
+               offset: int = 0, limit: int = 10, fuzzy: bool = False):
+        """
+        Devuelve (total, [(song_id, score), ...]) ordenado por relevancia y luego por título.
+        Sin texto ni filtros devuelve todas las canciones ordenadas por título.
+        Un token suma TITLE_WEIGHT si aparece en el título, ARTIST_WEIGHT si aparece en el
+        nombre del artista y GENRE_WEIGHT si aparece en algún género del artista
+        (multiplicados por la similitud cuando la coincidencia es aproximada).
+        """
+        tokens = tokenize(query)
+        scores = defaultdict(float)
+
+        if tokens:
+            last = len(tokens) - 1
+            genre_artists = [self._artists_with_genre_token(t, i == last, fuzzy) for i, t in enumerate(tokens)]
+            for i, t in enumerate(tokens):
+                for doc, factor in self._match("title", self._title_postings, t, i == last, fuzzy).items():
+                    scores[doc] += TITLE_WEIGHT * factor
+                for aid, factor in self._match("artist", self._artist_postings, t, i == last, fuzzy).items():
+                    for doc in self._artist_songs.get(aid, ()):
+                        scores[doc] += ARTIST_WEIGHT * factor
+
+            if scores:
+                # El género solo desempata/impulsa canciones que ya coinciden por título o artista
+                for doc in scores:
+                    song_artist = self._song_artist.get(doc)
+                    scores[doc] += GENRE_WEIGHT * sum(ga.get(song_artist, 0) for ga in genre_artists)
+            else:
+                # Consulta que solo nombra géneros: canciones de los artistas de esos géneros
+                for ga in genre_artists:
+                    for aid, factor in ga.items():
+                        for doc in self._artist_songs.get(aid, ()):
+                            scores[doc] += GENRE_WEIGHT * factor
+            candidates = scores.keys()
+        elif artist:
+            candidates = self._artist_songs.get(artist, set())
+        elif genre:
+            candidates = set()
+            for aid in self._genre_artists.get(genre, ()):
+                candidates |= self._artist_songs.get(aid, set())
+        elif query.strip():
+            # Texto sin ninguna palabra buscable (p. ej. "!!!")
+            return 0, []
+        else:
+            # Sin texto ni filtros: todas las canciones por título, igual que la consulta regex
+            candidates = self._song_title.keys()
+
+        matched = list(self._filter(candidates, artist, genre))
+        top = heapq.nsmallest(
+            offset + limit, matched,
+            key=lambda d: (-scores.get(d, 0), self._song_title.get(d, ""), d),
+        )[offset:]
+        return len(matched), [(self._song_keys[d], round(scores.get(d, 0), 2)) for d in top]
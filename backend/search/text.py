@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+# Letras y dígitos de cualquier alfabeto ("группа", "千と千尋"); "_" separa palabras
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def fold(text: str) -> str:
+    """
+    Normaliza texto para búsqueda: minúsculas y sin acentos ("Beyoncé" -> "beyonce").
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.casefold()
+
+
+def tokenize(text: str) -> list:
+    """
+    Divide el texto normalizado en tokens alfanuméricos (Unicode), sin repetidos y en orden.
+    """
+    return list(dict.fromkeys(_TOKEN_RE.findall(fold(text))))
@@ -0,0 +1,96 @@
+from bench.dataset import CatalogGenerator, scaled_sizes
+from bench.run import compare, percentile
+from bench.scenarios import uncovered_routes
+
+
+def _collect(stream):
+    docs = {}
+    for collection, doc in stream:
+        docs.setdefault(collection, []).append(doc)
+    return docs
+
+
+def test_generator_is_deterministic():
+    first = _collect(CatalogGenerator(scale=0.0005, seed=7).catalog())
+    second = _collect(CatalogGenerator(scale=0.0005, seed=7).catalog())
+    assert first == second
+    assert _collect(CatalogGenerator(scale=0.0005, seed=8).catalog()) != first
+
+def test_generated_references_are_consistent():
+    generator = CatalogGenerator(scale=0.0005, seed=7)
+    catalog = _collect(generator.catalog())
+    sizes = scaled_sizes(0.0005)
+    assert len(catalog["artist"]) == sizes["artists"]
+    assert len(catalog["album"]) == sizes["albums"]
+    assert len(catalog["songs"]) == sizes["songs"]
+
+    albums = {str(a["_id"]): a for a in catalog["album"]}
+    for artist in catalog["artist"]:
+        assert all(albums[a]["artist"] == str(artist["_id"]) for a in artist["albums"])
+    songs = {str(s["_id"]): s for s in catalog["songs"]}
+    for album_id, album in albums.items():
+        assert all(songs[s]["album"] == album_id for s in album["songs"])
+
+    users = _collect(generator.users())
+    playlists = {str(p["_id"]) for p in users["playlist"]}
+    assert {p for u in users["users"] for p in u["playlists"]} == playlists
+    assert all(s in songs for p in users["playlist"] for s in p["songs"])
+
+def test_items_storage_generates_positions():
+    users = _collect(CatalogGenerator(scale=0.0002, seed=7, playlist_storage="items").users())
+    counts = {}
+    for item in users["playlist_items"]:
+        counts[item["playlist_id"]] = counts.get(item["playlist_id"], 0) + 1
+    assert all(p["storage"] == "items" and counts.get(p["_id"], 0) == p["song_count"]
+               for p in users["playlist"])
+
+def test_percentile_and_compare():
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (50, 95, 99)
+    previous = {"results": [{"name": "list songs", "p95_ms": 10.0}]}
+    current = {"results": [{"name": "list songs", "p95_ms": 12.0}, {"name": "new", "p95_ms": 1.0}]}
+    assert compare(current, previous) == [("list songs", 10.0, 12.0, 20.0)]
+
+def test_every_route_has_a_scenario():
+    from main import app
+    assert uncovered_routes(app) == []
+
+def test_load_profiles_use_known_actions():
+    from bench.load import ACTIONS, PROFILES
+    for profile in PROFILES.values():
+        assert set(profile) <= set(ACTIONS)
+
+def test_load_step_detects_saturation():
+    from bench.load import Step
+    step = Step(rate=100)
+    step.elapsed = 1.0
+    for i in range(100):
+        step.record("list artists", 10.0 + i, error=False)
+    assert not step.summary(slo_p99_ms=500)["saturated"]
+    assert step.summary(slo_p99_ms=50)["saturated"]
+    step.elapsed = 2.0
+    assert step.summary(slo_p99_ms=500)["throughput_rps"] == 50.0
+    assert step.summary(slo_p99_ms=500)["saturated"]
+
+def test_load_playlist_edits_only_undo_added_songs():
+    import httpx
+    from bench.load import ACTIONS
+    from bench.scenarios import BenchContext
+    ctx = BenchContext("t")
+    ctx.samples = {"playlist": [{"_id": "p1"}], "song": [{"_id": f"s{k}"} for k in range(4)]}
+    ctx.owner_headers = {"p1": {}}
+    ctx.playlist_songs = {"p1": {"s0"}}
+    add, remove = ACTIONS["playlist add songs"], ACTIONS["playlist remove songs"]
+
+    def respond(action, status):
+        request = action.build(ctx, 0)
+        sent = httpx.Request(action.method, "http://bench" + request["path"], json=request["json"])
+        action.on_response(ctx, httpx.Response(status, request=sent))
+        return request["json"]["song_ids"]
+
+    assert respond(remove, 200) == [], "Sin agregados pendientes quitar no debe tocar la playlist"
+    assert respond(add, 200) == ["s1", "s2"], "No debe agregar canciones que la playlist ya tiene"
+    assert respond(add, 500) == ["s3"]
+    assert ctx.playlist_songs["p1"] == {"s0", "s1", "s2"}
+    assert respond(remove, 200) == ["s1", "s2"]
+    assert ctx.playlist_songs["p1"] == {"s0"} and not ctx.created["playlist_edit"]
@@ -0,0 +1,66 @@
+import asyncio
+from utils.cache import ResponseCache, cached, invalidates, response_cache
+
+
+def test_lru_eviction():
+    cache = ResponseCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None), "La entrada menos usada debió salir"
+    assert cache.get("a") == (True, 1)
+
+def test_ttl_expired():
+    cache = ResponseCache(maxsize=10, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") == (False, None)
+
+def test_invalidate_by_collection():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    cache.set("genres", [1], tags=("genre",))
+    cache.set("artists", [2], tags=("artist",))
+    cache.invalidate("genre")
+    assert cache.get("genres") == (False, None)
+    assert cache.get("artists") == (True, [2])
+
+def test_cached_and_invalidates_decorators():
+    calls = []
+
+    @cached("test_coll")
+    async def read(include_inactive: bool = False):
+        calls.append(include_inactive)
+        return [len(calls)]
+
+    @invalidates("test_coll")
+    async def write():
+        return None
+
+    response_cache.clear()
+    assert asyncio.run(read()) == [1]
+    assert asyncio.run(read(include_inactive=False)) == [1], "Los argumentos por defecto deben normalizarse"
+    asyncio.run(write())
+    assert asyncio.run(read()) == [2]
+
+def test_read_started_before_write_is_not_cached():
+    db = {"v": 1}
+
+    @cached("test_coll")
+    async def read():
+        value = dict(db)
+        await asyncio.sleep(0.01)
+        return value
+
+    @invalidates("test_coll")
+    async def write():
+        db["v"] = 2
+
+    async def race():
+        slow = asyncio.create_task(read())
+        await asyncio.sleep(0)
+        await write()
+        assert await slow == {"v": 1}
+        return await read()
+
+    response_cache.clear()
+    assert asyncio.run(race()) == {"v": 2}, "Una lectura anterior a la escritura no debe quedar en caché"
@@ -0,0 +1,64 @@
+import asyncio
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from utils import indexes
+
+NEW = IndexModel([("name", ASCENDING)], name="name", unique=True)
+OLD_SPEC = {"v": 2, "key": [("name", 1)]}
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self):
+        return self._docs
+
+
+class FakeCollection:
+    def __init__(self, duplicates=(), fail_recreate=False):
+        self.duplicates = list(duplicates)
+        self.fail_recreate = fail_recreate
+        self.indexes = {"name": OLD_SPEC}
+        self.calls = 0
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+    async def aggregate(self, pipeline, **kwargs):
+        return _Cursor([{"_id": d, "n": 2} for d in self.duplicates])
+
+    async def drop_index(self, name):
+        del self.indexes[name]
+
+    async def create_indexes(self, models):
+        self.calls += 1
+        doc = models[0].document
+        if self.calls == 1:
+            raise OperationFailure("conflict", code=85)
+        if self.fail_recreate and doc.get("unique"):
+            raise DuplicateKeyError("dup", code=11000)
+        self.indexes[doc["name"]] = {"key": list(doc["key"].items()), "unique": doc.get("unique", False)}
+
+
+def _ensure(coll, monkeypatch):
+    monkeypatch.setattr(indexes, "get_async_collection", lambda name: coll)
+    asyncio.run(indexes._ensure_collection_indexes("artist", [NEW]))
+
+
+def test_conflict_with_duplicates_keeps_old_index(monkeypatch):
+    coll = FakeCollection(duplicates=[{"k0": "Queen"}])
+    _ensure(coll, monkeypatch)
+    assert coll.indexes == {"name": OLD_SPEC}
+
+def test_duplicate_during_recreate_restores_old_index(monkeypatch):
+    coll = FakeCollection(fail_recreate=True)
+    _ensure(coll, monkeypatch)
+    assert coll.indexes == {"name": {"key": [("name", 1)], "unique": False}}
+
+def test_conflict_without_duplicates_replaces_index(monkeypatch):
+    coll = FakeCollection()
+    _ensure(coll, monkeypatch)
+    assert coll.indexes["name"]["unique"] is True
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from utils import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("demo_seconds", "demo", ("route",), buckets=(0.1, 1.0))
+    h.observe("/a", value=0.05)
+    h.observe("/a", value=0.5)
+    h.observe("/a", value=3)
+
+    lines = h.render()
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/a"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    c = metrics.Counter("demo_total", "demo", ("route",))
+    c.inc('/a"b')
+    assert 'demo_total{route="/a\\"b"} 1' in c.render()
+
+
+def _event(name, command=None, **extra):
+    return SimpleNamespace(command_name=name, command=command or {}, request_id=1,
+                           connection_id=("localhost", 27017), **extra)
+
+
+def test_command_listener_records_collection_documents_and_phase():
+    listener = metrics.MongoCommandListener()
+    phases = {}
+    token = metrics._phases.set(phases)
+    try:
+        listener.started(_event("find", {"find": "songs", "filter": {}}))
+        listener.succeeded(_event(
+            "find", duration_micros=2500, reply={"cursor": {"firstBatch": [{}, {}, {}]}}
+        ))
+    finally:
+        metrics._phases.reset(token)
+
+    assert phases["mongo"] == 0.0025
+    assert 'mongo_commands_total{collection="songs",command="find",outcome="success"} 1' \
+        in metrics.mongo_commands.render()
+    assert 'mongo_documents_returned_total{collection="songs",command="find"} 3' \
+        in metrics.mongo_documents_returned.render()
+
+
+def test_get_more_uses_collection_field():
+    listener = metrics.MongoCommandListener()
+    listener.started(_event("getMore", {"getMore": 123, "collection": "album"}))
+    listener.failed(_event("getMore", duration_micros=100))
+    assert 'mongo_commands_total{collection="album",command="getMore",outcome="failure"} 1' \
+        in metrics.mongo_commands.render()
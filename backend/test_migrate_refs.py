@@ -0,0 +1,29 @@
+from bson import ObjectId
+from utils.migrate_refs import REFERENCE_SPECS, convert_value
+
+SPECS = {spec["name"]: spec for spec in REFERENCE_SPECS}
+GENRE = ObjectId()
+
+
+def test_legacy_genre_string_becomes_objectid_list():
+    canonical, valid, invalid = convert_value(str(GENRE), SPECS["artist.genre"], {})
+    assert canonical == [GENRE] and valid == [GENRE] and invalid == []
+
+def test_invalid_values_are_kept_and_reported():
+    canonical, _, invalid = convert_value([str(GENRE), "bogus", GENRE], SPECS["artist.genre"], {})
+    assert canonical == [GENRE, "bogus"]
+    assert invalid == ["bogus"]
+
+def test_objectid_refs_become_strings():
+    artist = ObjectId()
+    assert convert_value(artist, SPECS["album.artist"], {})[0] == str(artist)
+
+def test_album_genre_name_resolves_to_id():
+    spec = SPECS["album.genre_id"]
+    assert convert_value(" Rock ", spec, {"rock": GENRE})[0] == GENRE
+    assert convert_value("Jazz", spec, {"rock": GENRE}) == (None, [], ["Jazz"])
+
+def test_playlist_items_refs():
+    playlist, song = ObjectId(), ObjectId()
+    assert convert_value(str(playlist), SPECS["playlist_items.playlist_id"], {})[0] == playlist
+    assert convert_value(song, SPECS["playlist_items.song_id"], {})[0] == str(song)
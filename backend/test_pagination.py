@@ -0,0 +1,54 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from utils.pagination import encode_cursor, decode_cursor, keyset_filter, split_page
+
+
+def test_cursor_roundtrip():
+    oid = ObjectId()
+    cursor = encode_cursor({"_id": oid, "name": "rock"}, sort_field="name")
+    data = decode_cursor(cursor)
+    assert data["id"] == oid, "El cursor no conserva el _id"
+    assert data["k"] == "rock", "El cursor no conserva la clave de orden"
+
+def test_invalid_cursor():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("no-es-un-cursor")
+    assert exc.value.status_code == 400
+
+def test_cursor_rejects_operators_in_sort_key():
+    import base64, json
+    for k in ({"$regex": "(a+)+$"}, ["rock"]):
+        raw = json.dumps({"id": str(ObjectId()), "k": k}).encode()
+        cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        with pytest.raises(HTTPException) as exc:
+            keyset_filter({}, cursor, sort_field="name")
+        assert exc.value.status_code == 400
+
+def test_keyset_filter_by_id():
+    oid = ObjectId()
+    query = keyset_filter({"active": True}, encode_cursor({"_id": oid}))
+    assert query == {"$and": [{"active": True}, {"_id": {"$gt": oid}}]}
+
+def test_split_page():
+    docs = [{"_id": ObjectId()} for _ in range(4)]
+    page, next_cursor = split_page(docs, 3)
+    assert len(page) == 3
+    assert decode_cursor(next_cursor)["id"] == docs[2]["_id"]
+    page, next_cursor = split_page(docs[:2], 3)
+    assert next_cursor is None
+
+def test_expanded_playlist_order_and_cursor():
+    from controllers.playlist import _expanded_out
+    item_id = ObjectId()
+    doc = {
+        "id": "p1", "name": "mix", "storage": "items", "song_count": 5, "songs": ["b", "x", "a"],
+        "_song_docs": [{"id": "a", "title": "A"}, {"id": "b", "title": "B"}],
+        "_last_item": {"_id": item_id, "position": 3072},
+    }
+    out = _expanded_out(doc)
+    assert [s["id"] for s in out["songs"]] == ["b", "a"], "No se respeta el orden de la playlist"
+    assert decode_cursor(out["next_cursor"]) == {"id": item_id, "k": 3072}
+
+    embedded = _expanded_out({"id": "p2", "name": "e", "songs": ["a"], "_song_docs": [{"id": "a"}]})
+    assert embedded == {"id": "p2", "name": "e", "songs": [{"id": "a"}]}
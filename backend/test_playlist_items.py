@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from utils import playlist_items
+
+PLAYLIST = ObjectId()
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for field, cond in query.items():
+        value = doc.get(field)
+        if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+            if "$gt" in cond and not (value is not None and value > cond["$gt"]):
+                return False
+            if "$ne" in cond and value == cond["$ne"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, field, direction=1):
+        self._docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self):
+        return self._docs
+
+
+class FakeCollection:
+    """
+    Colección en memoria con los índices únicos de playlist_items.
+    """
+    unique = (("playlist_id", "position"), ("playlist_id", "song_id"))
+
+    def __init__(self, docs=()):
+        self.docs = [dict(d) for d in docs]
+
+    def _violates(self, doc: dict) -> bool:
+        return any(
+            all(other.get(f) == doc.get(f) for f in fields)
+            for fields in self.unique if all(f in doc for f in fields)
+            for other in self.docs if other["_id"] != doc["_id"]
+        )
+
+    def find(self, query, projection=None, session=None):
+        return _Cursor([dict(d) for d in self.docs if _matches(d, query)])
+
+    async def find_one(self, query, projection=None, sort=None, session=None):
+        docs = [d for d in self.docs if _matches(d, query)]
+        for field, direction in sort or ():
+            docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return dict(docs[0]) if docs else None
+
+    async def insert_many(self, docs, ordered=True, session=None):
+        for i, doc in enumerate(docs):
+            doc.setdefault("_id", ObjectId())
+            if self._violates(doc):
+                raise BulkWriteError({"writeErrors": [{"index": i, "code": 11000}], "nInserted": i})
+            self.docs.append(doc)
+
+    async def count_documents(self, query, session=None):
+        return sum(1 for d in self.docs if _matches(d, query))
+
+    async def delete_many(self, query, session=None):
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+
+    async def bulk_write(self, ops):
+        for op in ops:
+            await self.update_one(op._filter, op._doc)
+
+    async def update_one(self, query, update, session=None):
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc is not None:
+            doc.update(update.get("$set", {}))
+            for field in update.get("$unset", {}):
+                doc.pop(field, None)
+        return type("Result", (), {"matched_count": int(doc is not None)})()
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc is None:
+            return None
+        if self._violates({**doc, **update["$set"]}):
+            raise DuplicateKeyError("dup", code=11000)
+        doc.update(update["$set"])
+        return dict(doc)
+
+
+def _item(song_id: str, position: int) -> dict:
+    return {"_id": ObjectId(), "playlist_id": PLAYLIST, "song_id": song_id, "position": position}
+
+
+@pytest.fixture
+def colls(monkeypatch):
+    colls = {playlist_items.ITEMS_COLLECTION: FakeCollection(), "playlist": FakeCollection()}
+    monkeypatch.setattr(playlist_items, "get_async_collection", lambda name: colls[name])
+    return colls
+
+
+def _order(coll) -> list:
+    return [d["song_id"] for d in sorted(coll.docs, key=lambda d: d["position"])]
+
+
+def test_append_skips_songs_already_in_playlist(colls):
+    items = colls[playlist_items.ITEMS_COLLECTION]
+    assert asyncio.run(playlist_items.append_items(PLAYLIST, ["a", "b"])) == 2
+    # "b" ya estaba (p. ej. la agregó otra petición): se omite y se sigue con "c"
+    assert asyncio.run(playlist_items.append_items(PLAYLIST, ["b", "c", "a", "d"])) == 2
+    assert _order(items) == ["a", "b", "c", "d"]
+
+def test_append_inside_transaction_does_not_retry(colls):
+    asyncio.run(playlist_items.append_items(PLAYLIST, ["a"]))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(playlist_items.append_items(PLAYLIST, ["a", "b"], session=object()))
+    assert exc.value.status_code == 409
+
+def test_move_to_front_and_after_anchor_renumbers_when_gap_is_exhausted(colls):
+    items = colls[playlist_items.ITEMS_COLLECTION]
+    a, b, c = _item("a", 1), _item("b", 2), _item("c", 3)
+    items.docs = [a, b, c]
+
+    # Entre 1 y 2 no hay hueco: se renumera y luego se mueve
+    moved = asyncio.run(playlist_items.move_item(PLAYLIST, str(c["_id"]), str(a["_id"])))
+    assert _order(items) == ["a", "c", "b"]
+    assert moved["song_id"] == "c"
+    assert sorted(d["position"] for d in items.docs if d["_id"] != c["_id"]) == [
+        playlist_items.POSITION_GAP, 2 * playlist_items.POSITION_GAP]
+
+    asyncio.run(playlist_items.move_item(PLAYLIST, str(b["_id"]), None))
+    assert _order(items) == ["b", "a", "c"]
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(playlist_items.move_item(PLAYLIST, str(a["_id"]), str(a["_id"])))
+    assert exc.value.status_code == 400
+
+def test_convert_clears_leftovers_and_sets_storage_last(colls):
+    items, playlists = colls[playlist_items.ITEMS_COLLECTION], colls["playlist"]
+    playlist = {"_id": PLAYLIST, "songs": ["a", "b", "a"]}
+    playlists.docs = [dict(playlist)]
+    items.docs = [_item("z", 5)]   # resto de una conversión anterior que falló
+
+    asyncio.run(playlist_items.convert_to_items(playlist))
+    assert _order(items) == ["a", "b"]
+    assert playlists.docs[0] == {"_id": PLAYLIST, "storage": "items", "song_count": 2}
+
+def test_convert_rejects_count_mismatch(colls):
+    items, playlists = colls[playlist_items.ITEMS_COLLECTION], colls["playlist"]
+    playlist = {"_id": PLAYLIST, "songs": ["a", "b"]}
+    playlists.docs = [dict(playlist)]
+    insert_many = items.insert_many
+
+    async def racing_insert(docs, **kwargs):
+        # Otra escritura agrega un item a la misma playlist durante la conversión
+        await insert_many(docs, **kwargs)
+        items.docs.append(_item("x", 10 ** 6))
+    items.insert_many = racing_insert
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(playlist_items.convert_to_items(playlist))
+    assert exc.value.status_code == 409
+    assert "storage" not in playlists.docs[0] and playlists.docs[0]["songs"] == ["a", "b"]
@@ -0,0 +1,73 @@
+import pstats
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils import profiling, security
+from utils.security import create_jwt_token
+
+
+@pytest.fixture(autouse=True)
+def _profiling_state(monkeypatch):
+    # Clave fija para los JWT y estado del módulo limpio entre tests
+    monkeypatch.setattr(security, "SECRET_KEY", "test-secret")
+    profiling._profiles.clear()
+    profiling._armed.clear()
+    yield
+    profiling._profiles.clear()
+    profiling._armed.clear()
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"id": item_id}
+
+    return app
+
+
+def _auth(admin: bool, active: bool = True) -> dict:
+    token = create_jwt_token("A", "B", "a@b.co", active, admin, "507f1f77bcf86cd799439011")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_profile_header_requires_admin(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    client = TestClient(_app())
+
+    assert "x-profile-id" not in client.get("/items/1", headers={**_auth(False), "X-Profile": "pstats"}).headers
+    assert "x-profile-id" not in client.get("/items/1", headers={**_auth(True, active=False), "X-Profile": "pstats"}).headers
+    profile_id = client.get("/items/1", headers={**_auth(True), "X-Profile": "pstats"}).headers["x-profile-id"]
+
+    profile = profiling.get_profile(profile_id)
+    assert profile["route"] == "/items/{item_id}" and profile["trigger"] == "header"
+    assert pstats.Stats(profile["path"]).total_calls > 0
+
+def test_armed_route_profiles_next_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    client = TestClient(_app())
+    profiling.arm("GET", "/items/{item_id}", 2, "collapsed")
+
+    ids = [client.get(f"/items/{i}").headers.get("x-profile-id") for i in range(3)]
+    assert ids[0] and ids[1] and ids[2] is None
+    assert profiling.armed() == []
+    assert profiling.get_profile(ids[0])["path"].endswith(".folded")
+
+def test_stack_sampler_writes_collapsed_stacks(tmp_path):
+    sampler = profiling._StackSampler(interval_ms=1)
+    sampler.start()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    path = tmp_path / "out.folded"
+    sampler.stop(str(path))
+
+    lines = path.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert "test_stack_sampler_writes_collapsed_stacks" in stack and int(count) > 0
@@ -0,0 +1,132 @@
+from search.fuzzy import edit_distance
+from search.prefix_index import PrefixIndex
+from search.song_index import SongSearchIndex
+
+
+def _index():
+    index = SongSearchIndex()
+    index.upsert_genre("g1", "Rock")
+    index.upsert_artist("a1", "Queen", ["g1"])
+    index.upsert_artist("a2", "Beyoncé", [])
+    index.upsert_song("s1", "Bohemian Rhapsody", "a1")
+    index.upsert_song("s2", "Love of my life", "a1")
+    index.upsert_song("s3", "Halo", "a2")
+    return index
+
+def test_title_ranks_above_artist_and_genre():
+    index = _index()
+    index.upsert_song("s4", "Queen of rock", "a2")
+    total, ranked = index.search("queen rock")
+    assert total == 3
+    # s4: título (queen, rock) = 6; s1/s2: artista (queen) + género (rock) = 3
+    assert ranked[0] == ("s4", 6)
+    assert [song_id for song_id, _ in ranked[1:]] == ["s1", "s2"]
+
+def test_accents_prefix_and_filters():
+    index = _index()
+    assert index.search("beyonce")[1] == [("s3", 2)]
+    assert index.search("bohem")[1] == [("s1", 3)]
+    assert index.search("", genre="g1")[0] == 2
+    assert index.search("life", artist="a2") == (0, [])
+
+def test_updates_and_pagination():
+    index = _index()
+    index.upsert_song("s1", "Killer Queen", "a1")
+    index.remove_song("s2")
+    assert index.search("bohemian") == (0, [])
+    total, ranked = index.search("queen", offset=0, limit=1)
+    assert total == 1 and ranked == [("s1", 5)]
+
+def test_non_latin_titles_and_empty_query():
+    index = _index()
+    index.upsert_song("s4", "Группа крови", "a2")
+    index.upsert_song("s5", "千と千尋", "a2")
+    assert index.search("группа")[1] == [("s4", 3)]
+    assert index.search("КРО")[1] == [("s4", 3)]
+    assert index.search("千と千尋")[1] == [("s5", 3)]
+    # Sin texto ni filtros: todas las canciones por título (como la consulta regex)
+    total, ranked = index.search("", limit=2)
+    assert total == 5 and [song_id for song_id, _ in ranked] == ["s1", "s3"]
+    assert index.search("!!!") == (0, [])
+
+def test_prefix_index_complete():
+    index = PrefixIndex.from_items([
+        ("song", "s1", "Bohemian Rhapsody"),
+        ("artist", "a1", "Queen"),
+        ("song", "s2", "Killer Queen"),
+        ("genre", "g1", "Rock"),
+    ])
+    # Coincidencia al inicio del nombre antes que en otra palabra
+    assert [r["id"] for r in index.complete("que")] == ["a1", "s2"]
+    assert index.complete("rhap") == [{"type": "song", "id": "s1", "label": "Bohemian Rhapsody"}]
+    assert index.complete("que", kinds=["song"]) == [{"type": "song", "id": "s2", "label": "Killer Queen"}]
+
+    index.add("artist", "a1", "Queen II")
+    index.remove("song", "s2")
+    assert index.complete("que") == [{"type": "artist", "id": "a1", "label": "Queen II"}]
+
+def test_prefix_index_kind_and_full_name_behind_many_keys():
+    # Más de limit * 20 claves de otros tipos/palabras que ordenan antes
+    items = [("song", f"s{i}", f"The Song {i}") for i in range(300)]
+    items += [("song", f"p{i}", f"Intro The Best {i}") for i in range(300)]
+    items += [("genre", "g1", "Thrash metal"), ("artist", "a1", "Tom Waits")]
+    index = PrefixIndex.from_items(items)
+
+    assert index.complete("th", ["genre"], 10) == [{"type": "genre", "id": "g1", "label": "Thrash metal"}]
+    assert [r["id"] for r in index.complete("thr", limit=3)] == ["g1"]
+    # Nombres completos antes que coincidencias en otra palabra
+    results = index.complete("t", limit=400)
+    assert len(results) == 400 and results[-1]["id"].startswith("p")
+    assert index.complete("the best", ["song"], 2) == [
+        {"type": "song", "id": "p0", "label": "Intro The Best 0"},
+        {"type": "song", "id": "p1", "label": "Intro The Best 1"},
+    ]
+
+def test_fuzzy_search():
+    index = _index()
+    assert index.search("beyonse") == (0, [])
+    total, ranked = index.search("beyonse", fuzzy=True)
+    assert [song_id for song_id, _ in ranked] == ["s3"]
+    assert 0 < ranked[0][1] < 2
+    # Transposición en el título y token exacto con puntaje completo
+    assert index.search("bohemain rhapsody", fuzzy=True)[1][0][0] == "s1"
+    assert index.search("halo", fuzzy=True)[1][0] == ("s3", 3)
+
+def test_fuzzy_transpositions_in_short_tokens():
+    from search.fuzzy import TrigramIndex
+    grams = TrigramIndex()
+    for token in ("rock", "metal", "queen", "pop"):
+        grams.add(token)
+    # Sin trigramas en común con la palabra correcta ("rcok" / "rock")
+    assert set(grams.similar("rcok")) == {"rock"}
+    assert set(grams.similar("mteal")) == {"metal"}
+    assert set(grams.similar("qeuen")) == {"queen"}
+    assert set(grams.similar("opp")) == {"pop"}
+    grams.remove("rock")
+    assert grams.similar("rcok") == {}
+    assert [song_id for song_id, _ in _index().search("qeuen", fuzzy=True)[1]] == ["s1", "s2"]
+
+def test_edit_distance():
+    assert edit_distance("beyonse", "beyonce", 2) == 1
+    assert edit_distance("bohemain", "bohemian", 2) == 1
+    assert edit_distance("queen", "halo", 2) is None
+    assert edit_distance("rcok", "rock", 1) == 1
+
+def test_writes_during_rebuild_are_replayed(monkeypatch):
+    import asyncio
+    from search import service
+
+    async def fetch_rows():
+        # Escritura concurrente mientras se leen las colecciones
+        service.index_song("s9", "Under Pressure", "a1")
+        return [("artist", "a1", "Queen", []), ("song", "s1", "Bohemian Rhapsody", "a1")]
+
+    monkeypatch.setattr(service, "_fetch_rows", fetch_rows)
+    monkeypatch.setattr(service, "_ready", False)
+    monkeypatch.setattr(service, "_index", SongSearchIndex())
+    monkeypatch.setattr(service, "_autocomplete", PrefixIndex())
+    asyncio.run(service.rebuild_index())
+
+    assert service.is_ready() and service._pending is None
+    assert [song_id for song_id, _ in service._index.search("pressure")[1]] == ["s9"]
+    assert [r["id"] for r in service._autocomplete.complete("under")] == ["s9"]
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from utils import slow_queries
+from utils.slow_queries import SlowQueryListener, caller_function, plan_stages, query_shape, winning_plan
+
+
+def test_query_shape_keeps_filters_not_updates():
+    shape = query_shape("update", {
+        "update": "songs", "updates": [{"q": {"album": "x"}, "u": {"$set": {"title": "secret"}}}],
+    })
+    assert shape == {"filter": [{"album": "x"}]}
+
+
+def test_winning_plan_from_aggregate_and_stages():
+    explain = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {
+        "stage": "PROJECTION_SIMPLE", "inputStage": {"stage": "COLLSCAN"},
+    }}}}]}
+    assert plan_stages(winning_plan(explain)) == ["PROJECTION_SIMPLE", "COLLSCAN"]
+
+
+def test_caller_prefers_controllers():
+    scope = {"__name__": "controllers.fake", "caller_function": caller_function}
+    exec("def list_things():\n    return caller_function(1)", scope)
+    assert scope["list_things"]() == "controllers.fake.list_things"
+
+
+def _event(name, command=None, **extra):
+    return SimpleNamespace(command_name=name, command=command or {}, request_id=7,
+                           connection_id=("localhost", 27017), database_name="music", **extra)
+
+
+def test_listener_only_records_commands_over_threshold(monkeypatch):
+    recorded = []
+    listener = SlowQueryListener(threshold_ms=50, explain_rate=1.0)
+    monkeypatch.setattr(listener, "_spawn", lambda coro: (recorded.append(coro.cr_frame.f_locals), coro.close()))
+
+    listener.started(_event("find", {"find": "genre", "filter": {"name": {"$regex": "rock"}}}))
+    listener.succeeded(_event("find", duration_micros=10_000))
+    assert recorded == []
+
+    listener.started(_event("find", {"find": "genre", "filter": {"name": {"$regex": "rock"}}}))
+    listener.succeeded(_event("find", duration_micros=120_000))
+    entry, command = recorded[0]["entry"], recorded[0]["command"]
+    assert entry["collection"] == "genre" and entry["duration_ms"] == 120.0
+    assert "$regex" in entry["query"]
+    assert command["filter"] == {"name": {"$regex": "rock"}}
+
+
+def test_listener_ignores_its_own_collection():
+    listener = SlowQueryListener(threshold_ms=0)
+    listener.started(_event("insert", {"insert": slow_queries.SLOW_QUERY_COLLECTION}))
+    assert listener._pending == {}
@@ -1,11 +1,29 @@
 from functools import wraps
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from utils.security import decode_jwt_token
+from utils.security import decode_jwt_token_cached
+from utils.metrics import phase
 
 # Middleware de seguridad Bearer
 security = HTTPBearer()
 
+# Token Bearer verificado (401 si falta o no es válido)
+async def _verified_payload(request: Request) -> dict:
+    credentials: HTTPAuthorizationCredentials = await security(request)
+    if not credentials or not credentials.credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authorization header missing",
+        )
+
+    payload = decode_jwt_token_cached(credentials.credentials)
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+        )
+    return payload
+
 # -------------------------------------------------
 # Decorador: requiere usuario autenticado (JWT válido)
 # Uso: @validate_user  (y también @validate_user_decorator por compatibilidad)
@@ -14,20 +32,8 @@ security = HTTPBearer()
 def validate_user(route_function):
     @wraps(route_function)
     async def wrapper(*args, request: Request, **kwargs):
-        credentials: HTTPAuthorizationCredentials = await security(request)
-        if not credentials or not credentials.credentials:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Authorization header missing",
-            )
-
-        token = credentials.credentials
-        payload = decode_jwt_token(token)
-        if not payload:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid or expired token",
-            )
+        with phase("auth"):
+            payload = await _verified_payload(request)
 
         request.state.user = payload
         return await route_function(*args, request=request, **kwargs)
@@ -44,20 +50,8 @@ validate_user_decorator = validate_user
 def validate_admin(route_function):
     @wraps(route_function)
     async def wrapper(*args, request: Request, **kwargs):
-        credentials: HTTPAuthorizationCredentials = await security(request)
-        if not credentials or not credentials.credentials:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Authorization header missing",
-            )
-
-        token = credentials.credentials
-        payload = decode_jwt_token(token)
-        if not payload:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid or expired token",
-            )
+        with phase("auth"):
+            payload = await _verified_payload(request)
 
         if payload.get("admin") is not True:
             raise HTTPException(
@@ -81,7 +75,7 @@ async def validate_user_dep(request: Request) -> dict:
         )
 
     token = credentials.credentials
-    payload = decode_jwt_token(token)
+    payload = decode_jwt_token_cached(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
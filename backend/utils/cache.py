@@ -0,0 +1,137 @@
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Caché de respuestas en memoria del proceso (LRU con TTL).
+# Cada entrada se etiqueta con las colecciones de las que depende; las escrituras
+# invalidan esas colecciones. Con varios workers cada proceso tiene su propia caché
+# y el TTL acota cuánto puede tardar en verse un cambio hecho en otro worker.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = RESPONSE_CACHE_MAXSIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self._generations = {}         # colección -> número de invalidaciones
+        self._epoch = 0                # número de clear()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Devuelve (True, valor) si la clave está vigente; (False, None) si no.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def generation(self, tags=()) -> tuple:
+        """
+        Estado de invalidación de las colecciones; se toma antes de leer de la base.
+        """
+        with self._lock:
+            return self._generation(tags)
+
+    def _generation(self, tags) -> tuple:
+        return (self._epoch,) + tuple(self._generations.get(t, 0) for t in tags)
+
+    def set(self, key, value, tags=(), generation=None):
+        """
+        Guarda el valor. Con generation (de generation(tags) antes de la lectura) se descarta
+        si hubo una invalidación mientras tanto: el valor puede ser anterior a la escritura.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, frozenset(tags), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *collections):
+        """
+        Elimina todas las entradas que dependen de alguna de las colecciones indicadas.
+        """
+        targets = set(collections)
+        with self._lock:
+            for t in targets:
+                self._generations[t] = self._generations.get(t, 0) + 1
+            stale = [k for k, (_, tags, _) in self._entries.items() if tags & targets]
+            for k in stale:
+                del self._entries[k]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
+
+
+def cached(*collections):
+    """
+    Decorador para lecturas async de los controladores.
+    La clave es el nombre de la función más sus argumentos normalizados
+    (se aplican los valores por defecto). Solo se guardan listas y diccionarios,
+    así respuestas como StreamingResponse nunca se cachean.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not RESPONSE_CACHE_ENABLED:
+                return await func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, tuple(sorted(bound.arguments.items())))
+
+            found, value = response_cache.get(key)
+            if found:
+                return value
+
+            generation = response_cache.generation(collections)
+            value = await func(*args, **kwargs)
+            if isinstance(value, (list, dict)):
+                response_cache.set(key, value, tags=collections, generation=generation)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidates(*collections):
+    """
+    Decorador para escrituras async: al terminar (con o sin error) invalida
+    las entradas de caché que dependen de las colecciones indicadas.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                response_cache.invalidate(*collections)
+        return wrapper
+    return decorator
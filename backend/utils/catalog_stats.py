@@ -0,0 +1,211 @@
+# Estadísticas materializadas del catálogo (colección catalog_stats).
+# Un documento por álbum (cantidad de canciones) y otro por artista (cantidad de álbumes),
+# mantenidos de forma incremental por las escrituras de álbumes y canciones.
+# Los endpoints de estadísticas leen de aquí con consultas sobre el índice (kind, count).
+#
+# Uso manual:
+#   python -m utils.catalog_stats --rebuild   -> recalcula todo desde la colección album
+import asyncio
+import logging
+import sys
+from collections import Counter
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+
+from utils.mongodb import get_async_collection, close_async_mongo_client
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "catalog_stats"
+
+
+def _album_key(album_id) -> str:
+    return f"album:{album_id}"
+
+
+def _artist_key(artist_id) -> str:
+    return f"artist:{artist_id}"
+
+
+def _album_doc(album_id, title, song_count: int) -> dict:
+    return {"_id": _album_key(album_id), "kind": "album", "ref": str(album_id),
+            "title": title, "count": song_count}
+
+
+def _artist_doc(artist_id, name, album_count: int) -> dict:
+    return {"_id": _artist_key(artist_id), "kind": "artist", "ref": str(artist_id),
+            "name": name, "count": album_count}
+
+
+# -----------------------------
+# Mantenimiento incremental
+# -----------------------------
+async def set_album_stats(album_id, title: str, song_count: int, session=None):
+    coll = get_async_collection(STATS_COLLECTION)
+    await coll.replace_one(
+        {"_id": _album_key(album_id)}, _album_doc(album_id, title, song_count),
+        upsert=True, session=session,
+    )
+
+
+async def update_album_stats(album_id, title: Optional[str] = None,
+                             song_count: Optional[int] = None, session=None):
+    fields = {}
+    if title is not None:
+        fields["title"] = title
+    if song_count is not None:
+        fields["count"] = song_count
+    if fields:
+        coll = get_async_collection(STATS_COLLECTION)
+        await coll.update_one({"_id": _album_key(album_id)}, {"$set": fields}, session=session)
+
+
+async def inc_album_songs(deltas: dict, session=None):
+    """
+    Aplica {album_id: delta} a la cantidad de canciones de cada álbum en un solo bulk_write.
+    """
+    ops = [
+        UpdateOne(
+            {"_id": _album_key(album_id)},
+            {"$inc": {"count": delta}, "$setOnInsert": {"kind": "album", "ref": str(album_id)}},
+            upsert=True,
+        )
+        for album_id, delta in deltas.items() if album_id and delta
+    ]
+    if ops:
+        await get_async_collection(STATS_COLLECTION).bulk_write(ops, session=session)
+
+
+async def inc_artist_albums(deltas: dict, names: Optional[dict] = None, session=None):
+    """
+    Aplica {artist_id: delta} a la cantidad de álbumes de cada artista.
+    names permite guardar el nombre del artista para las respuestas.
+    """
+    names = names or {}
+    ops = []
+    for artist_id, delta in deltas.items():
+        if not artist_id or not delta:
+            continue
+        update = {"$inc": {"count": delta}, "$setOnInsert": {"kind": "artist", "ref": str(artist_id)}}
+        if names.get(artist_id) is not None:
+            update["$set"] = {"name": names[artist_id]}
+        ops.append(UpdateOne({"_id": _artist_key(artist_id)}, update, upsert=True))
+    if ops:
+        await get_async_collection(STATS_COLLECTION).bulk_write(ops, session=session)
+
+
+async def rename_artist_stats(artist_id, name: str, session=None):
+    coll = get_async_collection(STATS_COLLECTION)
+    await coll.update_one({"_id": _artist_key(artist_id)}, {"$set": {"name": name}}, session=session)
+
+
+async def remove_album_stats(album_id, session=None):
+    await get_async_collection(STATS_COLLECTION).delete_one({"_id": _album_key(album_id)}, session=session)
+
+
+async def remove_artist_stats(artist_id, session=None):
+    await get_async_collection(STATS_COLLECTION).delete_one({"_id": _artist_key(artist_id)}, session=session)
+
+
+# -----------------------------
+# Lecturas (endpoints de estadísticas)
+# -----------------------------
+async def album_with_most_songs() -> dict:
+    coll = get_async_collection(STATS_COLLECTION)
+    doc = await coll.find_one(
+        {"kind": "album"}, {"_id": 0, "title": 1, "count": 1}, sort=[("count", DESCENDING)]
+    )
+    return {"title": doc.get("title"), "songCount": doc["count"]} if doc else {}
+
+
+async def albums_with_least_songs() -> dict:
+    coll = get_async_collection(STATS_COLLECTION)
+    first = await coll.find_one({"kind": "album"}, {"count": 1}, sort=[("count", ASCENDING)])
+    if not first:
+        return {}
+    docs = await coll.find({"kind": "album", "count": first["count"]}, {"title": 1}).to_list()
+    return {"songCount": first["count"], "albums": [d.get("title") for d in docs]}
+
+
+async def artists_by_album_count(limit: int, descending: bool) -> list:
+    coll = get_async_collection(STATS_COLLECTION)
+    docs = await (
+        coll.find({"kind": "artist", "count": {"$gt": 0}}, {"_id": 0, "name": 1, "count": 1})
+        .sort("count", DESCENDING if descending else ASCENDING)
+        .limit(limit)
+        .to_list()
+    )
+    return [{"name": d.get("name"), "albumCount": d["count"]} for d in docs]
+
+
+# -----------------------------
+# Reconstrucción completa
+# -----------------------------
+async def rebuild_catalog_stats(batch_size: int = 1000):
+    """
+    Recalcula catalog_stats a partir de la colección album.
+    Se usa para poblar la colección por primera vez o corregir desvíos.
+    """
+    album_coll = get_async_collection("album")
+    artist_coll = get_async_collection("artist")
+    stats_coll = get_async_collection(STATS_COLLECTION)
+
+    await stats_coll.delete_many({})
+
+    total = 0
+    batch = []
+    artist_counts = Counter()
+    async for album in album_coll.find({}, {"title": 1, "artist": 1, "songs": 1}).batch_size(batch_size):
+        batch.append(ReplaceOne(
+            {"_id": _album_key(album["_id"])},
+            _album_doc(album["_id"], album.get("title"), len(album.get("songs") or [])),
+            upsert=True,
+        ))
+        if album.get("artist"):
+            artist_counts[str(album["artist"])] += 1
+        if len(batch) >= batch_size:
+            await stats_coll.bulk_write(batch, ordered=False)
+            total += len(batch)
+            batch = []
+
+    artist_ids = [ObjectId(a) for a in artist_counts if ObjectId.is_valid(a)]
+    names = {}
+    async for artist in artist_coll.find({"_id": {"$in": artist_ids}}, {"name": 1}):
+        names[str(artist["_id"])] = artist.get("name")
+
+    for artist_id, count in artist_counts.items():
+        batch.append(ReplaceOne(
+            {"_id": _artist_key(artist_id)}, _artist_doc(artist_id, names.get(artist_id), count),
+            upsert=True,
+        ))
+
+    if batch:
+        await stats_coll.bulk_write(batch, ordered=False)
+        total += len(batch)
+    logger.info("catalog_stats reconstruido: %d documentos", total)
+
+
+async def ensure_catalog_stats():
+    """
+    Reconstruye catalog_stats solo si está vacía (primer arranque con esta colección).
+    """
+    if not await get_async_collection(STATS_COLLECTION).find_one({}, {"_id": 1}):
+        await rebuild_catalog_stats()
+
+
+async def _main(argv: list):
+    try:
+        if "--rebuild" in argv:
+            await rebuild_catalog_stats()
+        else:
+            await ensure_catalog_stats()
+        print("catalog_stats actualizado")
+    finally:
+        await close_async_mongo_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import uuid
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+# Cliente HTTP async compartido para la API REST de Firebase (Identity Toolkit).
+# Mantiene conexiones keep-alive, limita la concurrencia y aplica un deadline por llamada.
+FIREBASE_HTTP_MAX_CONNECTIONS = int(os.getenv("FIREBASE_HTTP_MAX_CONNECTIONS", "50"))
+FIREBASE_HTTP_MAX_CONCURRENCY = int(os.getenv("FIREBASE_HTTP_MAX_CONCURRENCY", "20"))
+FIREBASE_HTTP_TIMEOUT = float(os.getenv("FIREBASE_HTTP_TIMEOUT", "5"))
+
+# Transporte local simulado (sin red) para pruebas de carga del login
+FIREBASE_HTTP_STUB = os.getenv("FIREBASE_HTTP_STUB", "").lower() == "true"
+FIREBASE_STUB_LATENCY_MS = float(os.getenv("FIREBASE_STUB_LATENCY_MS", "0"))
+
+IDENTITY_TOOLKIT_URL = "https://identitytoolkit.googleapis.com/v1"
+
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[httpx.AsyncBaseTransport] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+async def _stub_handler(request: httpx.Request) -> httpx.Response:
+    """
+    Simula accounts:signInWithPassword.
+    Acepta cualquier credencial salvo la contraseña "invalid-password".
+    """
+    if FIREBASE_STUB_LATENCY_MS:
+        await asyncio.sleep(FIREBASE_STUB_LATENCY_MS / 1000)
+
+    body = json.loads(request.content or b"{}")
+    if body.get("password") == "invalid-password":
+        return httpx.Response(400, json={"error": {"code": 400, "message": "INVALID_PASSWORD"}})
+
+    return httpx.Response(200, json={
+        "kind": "identitytoolkit#VerifyPasswordResponse",
+        "localId": uuid.uuid5(uuid.NAMESPACE_URL, body.get("email", "")).hex,
+        "email": body.get("email"),
+        "idToken": "stub-id-token",
+        "refreshToken": "stub-refresh-token",
+        "expiresIn": "3600",
+        "registered": True,
+    })
+
+
+def stub_transport() -> httpx.AsyncBaseTransport:
+    return httpx.MockTransport(_stub_handler)
+
+
+async def set_transport(transport: Optional[httpx.AsyncBaseTransport]):
+    """
+    Reemplaza el transporte del cliente (p. ej. stub_transport() en pruebas de carga).
+    Cierra el cliente actual; se vuelve a crear en la siguiente llamada.
+    """
+    global _transport
+    await close_http_client()
+    _transport = transport
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client, _transport
+    if _client is None:
+        if _transport is None and FIREBASE_HTTP_STUB:
+            _transport = stub_transport()
+        _client = httpx.AsyncClient(
+            base_url=IDENTITY_TOOLKIT_URL,
+            timeout=FIREBASE_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=FIREBASE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=FIREBASE_HTTP_MAX_CONNECTIONS,
+            ),
+            transport=_transport,
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(FIREBASE_HTTP_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def post_identity_toolkit(path: str, payload: dict, api_key: str,
+                                deadline: float = FIREBASE_HTTP_TIMEOUT) -> httpx.Response:
+    """
+    POST a la API de Identity Toolkit (p. ej. "accounts:signInWithPassword").
+    El deadline incluye la espera por un cupo de concurrencia.
+    Lanza HTTPException 504 si Firebase no responde a tiempo.
+    """
+    async def _call():
+        async with _get_semaphore():
+            return await get_http_client().post(f"/{path}", params={"key": api_key}, json=payload)
+
+    try:
+        return await asyncio.wait_for(_call(), timeout=deadline)
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail="Firebase no respondió a tiempo")
+
+
+async def close_http_client():
+    global _client, _semaphore
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    # El semáforo queda ligado al event loop actual: se crea de nuevo en el próximo
+    _semaphore = None
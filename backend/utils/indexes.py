@@ -0,0 +1,232 @@
+# Registro de índices de MongoDB.
+# Declara los índices que necesita cada forma de consulta de los controladores y
+# los crea de forma idempotente al arrancar la aplicación (lifespan de main.py).
+#
+# Uso manual:
+#   python -m utils.indexes            -> crea/actualiza los índices
+#   python -m utils.indexes --report   -> muestra qué consultas usan COLLSCAN
+import asyncio
+import logging
+import sys
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from utils.mongodb import get_async_collection, close_async_mongo_client
+from utils.slow_queries import plan_stages, winning_plan
+
+logger = logging.getLogger(__name__)
+
+# Códigos de error de Mongo cuando ya existe un índice con el mismo nombre
+# o las mismas claves pero con opciones distintas
+_INDEX_CONFLICT_CODES = {85, 86}
+
+# Comparación sin distinguir mayúsculas/minúsculas (strength 2: los acentos sí cuentan)
+CASE_INSENSITIVE = {"locale": "en", "strength": 2}
+
+# Índices por colección
+# Los índices únicos reemplazan las consultas de duplicado previas a insert_one:
+# los controladores traducen DuplicateKeyError a 400/409
+INDEXES = {
+    "songs": [
+        # create_song: una canción por título y artista
+        IndexModel([("title", ASCENDING), ("artist", ASCENDING)], name="title_artist", unique=True),
+        # get_songs_by_album
+        IndexModel([("album", ASCENDING)], name="album"),
+        # get_songs_by_artist
+        IndexModel([("artist", ASCENDING)], name="artist"),
+    ],
+    "album": [
+        # create_album: un álbum por título y artista
+        IndexModel([("title", ASCENDING), ("artist", ASCENDING)], name="title_artist", unique=True),
+        # list_albums_by_artist, delete_artist: count_documents({"artist"})
+        IndexModel([("artist", ASCENDING)], name="artist"),
+    ],
+    "artist": [
+        # create_artist: nombre único
+        IndexModel([("name", ASCENDING)], name="name", unique=True),
+        # delete_genre: artista que use el género
+        IndexModel([("genre", ASCENDING)], name="genre"),
+    ],
+    "genre": [
+        # create_genre / update_genre: nombre único sin distinguir mayúsculas
+        IndexModel([("name", ASCENDING)], name="name_ci", unique=True, collation=CASE_INSENSITIVE),
+        # autocompletado sin índice en memoria: regex anclada sobre name_lc
+        IndexModel([("name_lc", ASCENDING)], name="name_lc"),
+        # create_album / patch_album: find_one({"name"}); listado ordenado por nombre
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id"),
+        # get_all_genres: solo activos, ordenados por nombre
+        IndexModel([("active", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], name="active_name_id"),
+    ],
+    "users": [
+        # login_user, create_playlist, get_playlists_by_user: find_one({"email"})
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+    ],
+    "playlist": [
+        # get_playlists_by_user
+        IndexModel([("user", ASCENDING)], name="user"),
+    ],
+    "playlist_items": [
+        # orden de la playlist y unicidad de posición (agregar/mover/paginar)
+        IndexModel([("playlist_id", ASCENDING), ("position", ASCENDING)], name="playlist_position", unique=True),
+        # add/remove por canción; único: una canción aparece una sola vez por playlist
+        IndexModel([("playlist_id", ASCENDING), ("song_id", ASCENDING)], name="playlist_song", unique=True),
+    ],
+    "refresh_tokens": [
+        # refresh_session / logout_user: búsqueda por hash del token
+        IndexModel([("token_hash", ASCENDING)], name="token_hash", unique=True),
+        # revocación de toda la familia de tokens
+        IndexModel([("family", ASCENDING)], name="family"),
+        # Mongo borra los tokens vencidos automáticamente
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "catalog_stats": [
+        # endpoints de estadísticas: ranking por tipo y cantidad
+        IndexModel([("kind", ASCENDING), ("count", ASCENDING)], name="kind_count"),
+    ],
+}
+
+# Formas de consulta de los controladores (colección, filtro de ejemplo, orden)
+# Se usan en el modo reporte para detectar COLLSCAN con explain()
+QUERY_SHAPES = [
+    ("songs", {"title": "", "artist": ""}, None),
+    ("songs", {"album": ""}, None),
+    ("songs", {"artist": ""}, None),
+    ("album", {"title": "", "artist": ""}, None),
+    ("album", {"artist": ""}, None),
+    ("artist", {"name": ""}, None),
+    ("genre", {"name_lc": ""}, None),
+    ("genre", {"name": ""}, None),
+    ("genre", {"active": True}, [("name", ASCENDING)]),
+    ("users", {"email": ""}, None),
+    ("playlist", {"user": ""}, None),
+    ("playlist_items", {"playlist_id": ""}, [("position", ASCENDING)]),
+    ("playlist_items", {"playlist_id": "", "song_id": ""}, None),
+    ("catalog_stats", {"kind": "album"}, [("count", ASCENDING)]),
+    ("refresh_tokens", {"token_hash": ""}, None),
+]
+
+
+def _existing_index(info: dict, model: IndexModel):
+    # Índice que choca con el modelo: mismo nombre o mismas claves
+    keys = list(model.document["key"].items())
+    for index_name, spec in info.items():
+        if index_name == model.document["name"] or list(spec["key"]) == keys:
+            return index_name, spec
+    return None, None
+
+
+def _model_from_spec(index_name: str, spec: dict) -> IndexModel:
+    options = {k: v for k, v in spec.items() if k not in ("key", "v", "ns")}
+    return IndexModel(list(spec["key"]), name=index_name, **options)
+
+
+async def _find_duplicate(coll, model: IndexModel):
+    """
+    Primer valor repetido de las claves de un índice único (None si no hay), con la
+    misma collation y filtro parcial que usaría el índice.
+    """
+    doc = model.document
+    group_id = {f"k{i}": f"${field}" for i, field in enumerate(doc["key"])}
+    pipeline = [{"$match": doc["partialFilterExpression"]}] if doc.get("partialFilterExpression") else []
+    pipeline += [
+        {"$group": {"_id": group_id, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": 1},
+    ]
+    options = {"allowDiskUse": True}
+    if doc.get("collation"):
+        options["collation"] = doc["collation"]
+    cursor = await coll.aggregate(pipeline, **options)
+    found = await cursor.to_list()
+    return found[0]["_id"] if found else None
+
+
+async def _recreate_index(coll, name: str, model: IndexModel):
+    # La definición cambió: se reemplaza el índice existente sin perderlo si no se puede
+    index_name = model.document["name"]
+    old_name, old_spec = _existing_index(await coll.index_information(), model)
+    if model.document.get("unique"):
+        duplicate = await _find_duplicate(coll, model)
+        if duplicate is not None:
+            logger.error("No se recrea el índice único %s.%s: hay duplicados (%s); se mantiene el anterior",
+                         name, index_name, duplicate)
+            return
+
+    logger.warning("Recreando índice %s.%s (definición distinta)", name, index_name)
+    if old_name:
+        await coll.drop_index(old_name)
+    try:
+        await coll.create_indexes([model])
+    except DuplicateKeyError as e:
+        # Duplicados insertados entre la verificación y la creación: se restaura el anterior
+        logger.error("No se pudo recrear el índice único %s.%s: hay duplicados (%s)",
+                     name, index_name, e.details.get("keyValue") if e.details else e)
+        if old_spec is not None:
+            await coll.create_indexes([_model_from_spec(old_name, old_spec)])
+
+
+async def _ensure_collection_indexes(name: str, models: list):
+    coll = get_async_collection(name)
+    for model in models:
+        try:
+            await coll.create_indexes([model])
+        except DuplicateKeyError as e:
+            # Datos previos con duplicados: el índice único no se crea hasta limpiarlos
+            logger.error("No se pudo crear el índice único %s.%s: hay duplicados (%s)",
+                         name, model.document["name"], e.details.get("keyValue") if e.details else e)
+        except OperationFailure as e:
+            if e.code not in _INDEX_CONFLICT_CODES:
+                raise
+            await _recreate_index(coll, name, model)
+
+
+async def ensure_indexes():
+    """
+    Crea todos los índices declarados en INDEXES.
+    Es idempotente: si el índice ya existe con la misma definición no hace nada.
+    """
+    for name, models in INDEXES.items():
+        await _ensure_collection_indexes(name, models)
+        logger.info("Índices verificados en '%s': %d", name, len(models))
+
+
+async def index_report() -> list:
+    """
+    Ejecuta explain() sobre cada forma de consulta registrada.
+    Devuelve una fila por consulta indicando si se resuelve con COLLSCAN.
+    """
+    report = []
+    for name, query, sort in QUERY_SHAPES:
+        cursor = get_async_collection(name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = plan_stages(winning_plan(explain))
+        report.append({
+            "collection": name,
+            "filter": sorted(query.keys()),
+            "sort": [field for field, _ in sort] if sort else [],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+async def _main(argv: list):
+    try:
+        if "--report" in argv:
+            for row in await index_report():
+                flag = "COLLSCAN" if row["collscan"] else "ok"
+                print(f"[{flag:8}] {row['collection']}: filter={row['filter']} "
+                      f"sort={row['sort']} plan={' <- '.join(row['stages'])}")
+        else:
+            await ensure_indexes()
+            print("Índices creados/verificados")
+    finally:
+        await close_async_mongo_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,300 @@
+# Métricas del proceso en formato de texto de Prometheus (GET /metrics).
+# - MetricsMiddleware: latencia, estado y peticiones en curso por ruta (plantilla de la
+#   ruta, p. ej. /songs/{song_id}, para no crear una serie por ID).
+# - MongoCommandListener: latencia y documentos devueltos por colección y comando.
+# - Tiempo por fase dentro de cada petición (mongo, auth): permite ver si una ruta lenta
+#   lo es por Mongo, por la autenticación o por el resto (serialización, lógica).
+# Cada worker expone sus propias métricas; Prometheus las agrega por instancia.
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Límites superiores de los buckets de latencia (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # [conteo por bucket (no acumulado)..., +Inf], suma
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        lines = self._header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+# -----------------------------
+# Métricas registradas
+# -----------------------------
+http_requests = Counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP", ("method", "route"))
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "Peticiones HTTP en curso", ("method",))
+http_request_phase_duration = Histogram(
+    "http_request_phase_duration_seconds",
+    "Tiempo de cada petición HTTP dedicado a una fase (mongo, auth)", ("method", "route", "phase"))
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "Latencia de los comandos de Mongo", ("collection", "command"))
+mongo_commands = Counter(
+    "mongo_commands_total", "Comandos de Mongo ejecutados", ("collection", "command", "outcome"))
+mongo_documents_returned = Counter(
+    "mongo_documents_returned_total", "Documentos devueltos por Mongo", ("collection", "command"))
+
+METRICS = [
+    http_requests, http_request_duration, http_requests_in_progress, http_request_phase_duration,
+    mongo_command_duration, mongo_commands, mongo_documents_returned,
+]
+
+# Funciones que devuelven líneas extra al renderizar (p. ej. estadísticas de cachés)
+_collectors = []
+
+
+def register_collector(func):
+    _collectors.append(func)
+    return func
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+def _gauge_lines(name: str, help_text: str, value, kind: str = "gauge") -> list:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+
+
+@register_collector
+def _cache_metrics() -> list:
+    # Import diferido: utils.security lee variables de entorno al importarse
+    from utils.cache import response_cache
+    from utils.security import token_cache
+
+    lines = []
+    for prefix, cache in (("response_cache", response_cache), ("token_cache", token_cache)):
+        stats = cache.stats()
+        lines += _gauge_lines(f"{prefix}_entries", "Entradas en la caché", stats.get("size", 0))
+        lines += _gauge_lines(f"{prefix}_hits_total", "Aciertos de la caché", stats.get("hits", 0), "counter")
+        lines += _gauge_lines(f"{prefix}_misses_total", "Fallos de la caché", stats.get("misses", 0), "counter")
+    return lines
+
+
+# -----------------------------
+# Fases por petición
+# -----------------------------
+# Segundos acumulados por fase en la petición en curso (None fuera de una petición)
+_phases: ContextVar = ContextVar("request_phases", default=None)
+
+
+def add_phase_time(phase: str, seconds: float):
+    phases = _phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Suma el tiempo del bloque a la fase indicada de la petición en curso.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(name, time.perf_counter() - start)
+
+
+# -----------------------------
+# Middleware HTTP
+# -----------------------------
+class MetricsMiddleware:
+    """
+    Middleware ASGI (no BaseHTTPMiddleware) para medir también las respuestas en streaming
+    hasta que se envía el último fragmento.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+        phases = {}
+        token = _phases.set(phases)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_progress.dec(method)
+            _phases.reset(token)
+            # FastAPI deja la ruta resuelta en el scope; sin ella (404) se agrupa todo
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_requests.inc(method, route, str(status["code"]))
+            http_request_duration.observe(method, route, value=elapsed)
+            for name, seconds in phases.items():
+                http_request_phase_duration.observe(method, route, name, value=seconds)
+
+
+# -----------------------------
+# Listener de comandos de Mongo
+# -----------------------------
+# Comandos cuyo primer valor no es el nombre de la colección
+_COLLECTION_FIELDS = {"getMore": "collection"}
+
+
+def _documents_returned(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    return 0
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Registra latencia, resultado y documentos devueltos de cada comando. pymongo
+    publica los eventos dentro de la tarea que ejecuta el comando, así que el tiempo
+    también se suma a la fase "mongo" de la petición en curso.
+    """
+
+    def __init__(self):
+        self._pending = {}   # (request_id, connection_id) -> colección
+
+    def started(self, event):
+        field = _COLLECTION_FIELDS.get(event.command_name, event.command_name)
+        collection = event.command.get(field)
+        key = (event.request_id, event.connection_id)
+        self._pending[key] = collection if isinstance(collection, str) else "-"
+
+    def _finish(self, event, outcome: str):
+        collection = self._pending.pop((event.request_id, event.connection_id), "-")
+        seconds = event.duration_micros / 1_000_000
+        mongo_command_duration.observe(collection, event.command_name, value=seconds)
+        mongo_commands.inc(collection, event.command_name, outcome)
+        add_phase_time("mongo", seconds)
+        return collection
+
+    def succeeded(self, event):
+        collection = self._finish(event, "success")
+        returned = _documents_returned(event.reply)
+        if returned:
+            mongo_documents_returned.inc(collection, event.command_name, amount=returned)
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+def event_listeners() -> list:
+    # Se pasa al crear el cliente async (vacío si las métricas están desactivadas)
+    return [MongoCommandListener()] if METRICS_ENABLED else []
@@ -0,0 +1,222 @@
+# Migración de referencias entre colecciones a su tipo canónico.
+# Recorre cada colección por _id en lotes, reescribe los campos con bulk_write y guarda
+# un checkpoint por referencia en la colección "migrations", así que se puede cortar y
+# volver a lanzar: continúa desde el último _id procesado.
+#
+# Tipos canónicos:
+#   - artist.genre: lista de ObjectId de genre (como escribe create_artist)
+#   - album.genre_id: ObjectId del género, resuelto desde album.genre (nombre)
+#   - referencias entre artistas, álbumes, canciones y playlists: ID en hex (string),
+#     que es como las comparan los controladores y las expone la API
+#   - playlist_items: playlist_id como ObjectId (clave del índice playlist_position) y
+#     song_id como string, igual que playlist.songs
+#
+# Uso manual:
+#   python -m utils.migrate_refs --dry-run        -> reporte sin escribir
+#   python -m utils.migrate_refs                  -> migra (reanuda si se cortó)
+#   python -m utils.migrate_refs --restart        -> ignora los checkpoints
+#   python -m utils.migrate_refs --only artist.genre --batch-size 500
+import asyncio
+import logging
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+
+from utils.mongodb import get_async_collection, close_async_mongo_client
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "migrations"
+DEFAULT_BATCH_SIZE = 1000
+
+# name: clave del checkpoint; source/dest: campo leído/escrito; many: lista de referencias;
+# target: "objectid", "str" o "genre_name" (nombre -> _id); ref: colección referenciada
+REFERENCE_SPECS = [
+    {"name": "artist.genre", "collection": "artist", "source": "genre", "dest": "genre",
+     "many": True, "target": "objectid", "ref": "genre"},
+    {"name": "album.genre_id", "collection": "album", "source": "genre", "dest": "genre_id",
+     "many": False, "target": "genre_name", "ref": "genre"},
+    {"name": "album.artist", "collection": "album", "source": "artist", "dest": "artist",
+     "many": False, "target": "str", "ref": "artist"},
+    {"name": "album.songs", "collection": "album", "source": "songs", "dest": "songs",
+     "many": True, "target": "str", "ref": "songs"},
+    {"name": "artist.albums", "collection": "artist", "source": "albums", "dest": "albums",
+     "many": True, "target": "str", "ref": "album"},
+    {"name": "songs.album", "collection": "songs", "source": "album", "dest": "album",
+     "many": False, "target": "str", "ref": "album"},
+    {"name": "songs.artist", "collection": "songs", "source": "artist", "dest": "artist",
+     "many": False, "target": "str", "ref": "artist"},
+    {"name": "playlist.songs", "collection": "playlist", "source": "songs", "dest": "songs",
+     "many": True, "target": "str", "ref": "songs"},
+    {"name": "playlist_items.playlist_id", "collection": "playlist_items", "source": "playlist_id",
+     "dest": "playlist_id", "many": False, "target": "objectid", "ref": "playlist"},
+    {"name": "playlist_items.song_id", "collection": "playlist_items", "source": "song_id", "dest": "song_id",
+     "many": False, "target": "str", "ref": "songs"},
+]
+
+
+def _as_object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+
+def _convert_one(value, target: str, genres_by_name: dict):
+    """
+    Devuelve el valor canónico o None si no se puede convertir.
+    """
+    if target == "genre_name":
+        return genres_by_name.get(str(value).strip().lower()) if value else None
+    oid = _as_object_id(value)
+    if oid is None:
+        return None
+    return oid if target == "objectid" else str(oid)
+
+
+def convert_value(raw, spec: dict, genres_by_name: dict):
+    """
+    Convierte el valor de un documento según la especificación.
+    Devuelve (valor_canónico, referencias_válidas, valores_inválidos). Los valores que no
+    se pueden convertir se conservan tal cual para revisión manual. Los datos antiguos
+    con un único string en un campo de lista se convierten en lista.
+    """
+    values = raw if isinstance(raw, list) else [] if raw is None else [raw]
+    canonical, valid, invalid = [], [], []
+    for v in values:
+        c = _convert_one(v, spec["target"], genres_by_name)
+        if c is None:
+            invalid.append(v)
+            c = v
+        else:
+            valid.append(c)
+        if c not in canonical:
+            canonical.append(c)
+
+    if spec["many"]:
+        return canonical, valid, invalid
+    if spec["dest"] != spec["source"] and not valid:
+        return None, valid, invalid
+    return (canonical[0] if canonical else None), valid, invalid
+
+
+async def _genres_by_name() -> dict:
+    genres = await get_async_collection("genre").find({}, {"name": 1}).to_list()
+    return {(g.get("name") or "").strip().lower(): g["_id"] for g in genres}
+
+
+async def _existing_ids(collection: str, ids) -> set:
+    oids = {_as_object_id(i) for i in ids} - {None}
+    if not oids:
+        return set()
+    docs = await get_async_collection(collection).find({"_id": {"$in": list(oids)}}, {"_id": 1}).to_list()
+    return {str(d["_id"]) for d in docs}
+
+
+async def migrate_reference(spec: dict, dry_run: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+                            restart: bool = False, genres_by_name: dict = None) -> dict:
+    """
+    Migra (o, con dry_run, solo analiza) una referencia. Devuelve las estadísticas:
+    scanned, changed, invalid (valores no convertibles), dangling (IDs que no existen).
+    """
+    coll = get_async_collection(spec["collection"])
+    checkpoints = get_async_collection(MIGRATIONS_COLLECTION)
+    checkpoint_id = f"refs:{spec['name']}"
+    genres_by_name = genres_by_name if genres_by_name is not None else await _genres_by_name()
+
+    checkpoint = None if (dry_run or restart) else await checkpoints.find_one({"_id": checkpoint_id})
+    if checkpoint and checkpoint.get("done"):
+        logger.info("%s: ya migrado", spec["name"])
+        return {k: checkpoint.get(k, 0) for k in ("scanned", "changed", "invalid", "dangling")}
+
+    stats = {k: (checkpoint or {}).get(k, 0) for k in ("scanned", "changed", "invalid", "dangling")}
+    last_id = (checkpoint or {}).get("last_id")
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await (
+            coll.find(query, {spec["source"]: 1, spec["dest"]: 1})
+            .sort("_id", ASCENDING)
+            .limit(batch_size)
+            .to_list()
+        )
+        if not batch:
+            break
+
+        ops = []
+        referenced = set()
+        for doc in batch:
+            if spec["source"] not in doc:
+                continue
+            canonical, valid, invalid = convert_value(doc[spec["source"]], spec, genres_by_name)
+            stats["invalid"] += len(invalid)
+            referenced.update(str(v) for v in valid)
+            if canonical is not None and doc.get(spec["dest"]) != canonical:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {spec["dest"]: canonical}}))
+
+        stats["dangling"] += len(referenced - await _existing_ids(spec["ref"], referenced))
+        stats["scanned"] += len(batch)
+        stats["changed"] += len(ops)
+        last_id = batch[-1]["_id"]
+
+        if not dry_run:
+            if ops:
+                await coll.bulk_write(ops, ordered=False)
+            await checkpoints.replace_one(
+                {"_id": checkpoint_id},
+                {**stats, "last_id": last_id, "done": False, "updated_at": datetime.utcnow()},
+                upsert=True,
+            )
+        logger.info("%s: %d revisados, %d %s", spec["name"], stats["scanned"], stats["changed"],
+                    "a cambiar" if dry_run else "actualizados")
+
+    if not dry_run:
+        await checkpoints.update_one(
+            {"_id": checkpoint_id}, {"$set": {**stats, "done": True, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    return stats
+
+
+async def migrate_references(dry_run: bool = False, batch_size: int = DEFAULT_BATCH_SIZE,
+                             restart: bool = False, only=None) -> dict:
+    """
+    Ejecuta todas las especificaciones (o las indicadas en only) y devuelve {nombre: estadísticas}.
+    """
+    genres_by_name = await _genres_by_name()
+    report = {}
+    for spec in REFERENCE_SPECS:
+        if only and spec["name"] not in only:
+            continue
+        report[spec["name"]] = await migrate_reference(
+            spec, dry_run=dry_run, batch_size=batch_size, restart=restart, genres_by_name=genres_by_name,
+        )
+    return report
+
+
+def _arg_value(argv: list, flag: str):
+    return argv[argv.index(flag) + 1] if flag in argv and argv.index(flag) + 1 < len(argv) else None
+
+
+async def _main(argv: list):
+    dry_run = "--dry-run" in argv
+    batch_size = int(_arg_value(argv, "--batch-size") or DEFAULT_BATCH_SIZE)
+    only = [v for i, v in enumerate(argv) if i and argv[i - 1] == "--only"]
+    try:
+        report = await migrate_references(dry_run=dry_run, batch_size=batch_size,
+                                          restart="--restart" in argv, only=only)
+        print("Reporte (dry run)" if dry_run else "Migración completada")
+        for name, stats in report.items():
+            print(f"  {name:16} revisados={stats['scanned']} "
+                  f"{'a cambiar' if dry_run else 'cambiados'}={stats['changed']} "
+                  f"inválidos={stats['invalid']} inexistentes={stats['dangling']}")
+    finally:
+        await close_async_mongo_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
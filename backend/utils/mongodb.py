@@ -1,8 +1,11 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 from pymongo.server_api import ServerApi
 
+from utils import metrics, slow_queries
+
 # Cargar variables de entorno desde .env
 load_dotenv()
 
@@ -16,8 +19,20 @@ if not DB_NAME:
 if not MONGODB_URI:
     raise ValueError("No se encontró la URI de MongoDB. Usa MONGODB_URI o URI.")
 
+# Tamaño del pool de conexiones del cliente async (configurable por entorno)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+# TLS hacia Mongo (Atlas lo exige); MONGO_TLS=false para un mongod local sin TLS (benchmarks)
+MONGO_TLS = os.getenv("MONGO_TLS", "true").lower() == "true"
+_TLS_OPTIONS = {"tls": True, "tlsAllowInvalidCertificates": True} if MONGO_TLS else {}
+
+# Escrituras en cascada dentro de una transacción (requiere replica set, p. ej. Atlas)
+MONGO_TRANSACTIONS = os.getenv("MONGO_TRANSACTIONS", "false").lower() == "true"
+
 # Cliente Mongo global reutilizable
 _client = None
+_async_client = None
 
 def get_mongo_client():
     """
@@ -28,8 +43,7 @@ def get_mongo_client():
         _client = MongoClient(
             MONGODB_URI,
             server_api=ServerApi("1"),
-            tls=True,
-            tlsAllowInvalidCertificates=True,
+            **_TLS_OPTIONS,
             serverSelectionTimeoutMS=5000  # Timeout más corto para pruebas
         )
     return _client
@@ -41,6 +55,59 @@ def get_collection(name: str):
     client = get_mongo_client()
     return client[DB_NAME][name]
 
+def get_async_mongo_client() -> AsyncMongoClient:
+    """
+    Retorna una instancia global de AsyncMongoClient.
+    Comparte un único pool de conexiones entre todas las peticiones,
+    sin bloquear el event loop de uvicorn.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncMongoClient(
+            MONGODB_URI,
+            server_api=ServerApi("1"),
+            **_TLS_OPTIONS,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            # Latencia por colección/comando para /metrics y registro de consultas lentas
+            event_listeners=metrics.event_listeners() + slow_queries.event_listeners(),
+        )
+    return _async_client
+
+def get_async_collection(name: str):
+    """
+    Retorna una colección async de MongoDB por nombre.
+    Las operaciones sobre ella deben usarse con await.
+    """
+    client = get_async_mongo_client()
+    return client[DB_NAME][name]
+
+@asynccontextmanager
+async def write_session():
+    """
+    Sesión para agrupar escrituras relacionadas.
+    Con MONGO_TRANSACTIONS=true abre una transacción (todo o nada);
+    si no, entrega None y cada operación se confirma por separado.
+    """
+    if not MONGO_TRANSACTIONS:
+        yield None
+        return
+
+    client = get_async_mongo_client()
+    async with client.start_session() as session:
+        async with await session.start_transaction():
+            yield session
+
+async def close_async_mongo_client():
+    """
+    Cierra el pool async. Usado en el shutdown de la aplicación.
+    """
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
 def t_connection() -> bool:
     """
     Verifica si la conexión a MongoDB funciona correctamente.
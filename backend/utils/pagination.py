@@ -0,0 +1,101 @@
+import base64
+import json
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+# Tamaño de página por defecto y máximo aceptado por los endpoints de listado
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(doc: dict, sort_field: str = "_id") -> str:
+    """
+    Genera un cursor opaco (base64 url-safe) a partir del último documento de la página.
+    Guarda el valor de la clave de orden y el _id como desempate.
+    """
+    data = {"id": str(doc["_id"])}
+    if sort_field != "_id":
+        data["k"] = doc.get(sort_field)
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decodifica un cursor generado por encode_cursor.
+    Lanza HTTPException 400 si el cursor no es válido. El cursor viene del cliente:
+    la clave de orden solo puede ser un escalar (un objeto como {"$regex": ...}
+    terminaría como operador dentro del filtro).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(data, dict) or not isinstance(data.get("k"), (str, int, float, type(None))):
+            raise ValueError("cursor")
+        last = {"id": ObjectId(data["id"])}
+        if "k" in data:
+            last["k"] = data["k"]
+        return last
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(query: dict, cursor: Optional[str], sort_field: str = "_id") -> dict:
+    """
+    Combina el filtro base con la condición de rango que continúa después del cursor.
+    Con orden (sort_field, _id) la página siguiente es un range scan sobre el índice.
+    """
+    if not cursor:
+        return dict(query)
+
+    last = decode_cursor(cursor)
+    if sort_field == "_id":
+        after = {"_id": {"$gt": last["id"]}}
+    else:
+        after = {
+            "$or": [
+                {sort_field: {"$gt": last.get("k")}},
+                {sort_field: last.get("k"), "_id": {"$gt": last["id"]}},
+            ]
+        }
+
+    return {"$and": [query, after]} if query else after
+
+
+def keyset_sort(sort_field: str = "_id") -> list:
+    """
+    Orden estable usado por la paginación: clave de orden y _id como desempate.
+    """
+    if sort_field == "_id":
+        return [("_id", 1)]
+    return [(sort_field, 1), ("_id", 1)]
+
+
+def split_page(docs: list, limit: int, sort_field: str = "_id"):
+    """
+    Recibe hasta limit + 1 documentos y devuelve (página, next_cursor).
+    next_cursor es None cuando no hay más resultados.
+    """
+    if len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    return page, encode_cursor(page[-1], sort_field)
+
+
+async def fetch_page(coll, query: dict, limit: Optional[int], cursor: Optional[str],
+                     sort_field: str = "_id", projection: Optional[dict] = None):
+    """
+    Lee una página de una colección async con paginación keyset.
+    Devuelve (documentos, next_cursor).
+    """
+    page_size = limit or DEFAULT_PAGE_SIZE
+    docs = await (
+        coll.find(keyset_filter(query, cursor, sort_field), projection)
+        .sort(keyset_sort(sort_field))
+        .limit(page_size + 1)
+        .to_list()
+    )
+    return split_page(docs, page_size, sort_field)
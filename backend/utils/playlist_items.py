@@ -0,0 +1,243 @@
+# Almacenamiento de canciones de playlists en una colección aparte (playlist_items).
+# Cada canción es un documento {playlist_id, song_id, position}; position es un entero
+# con huecos (POSITION_GAP), así agregar, mover o quitar una canción escribe un solo
+# documento. Si entre dos canciones ya no queda hueco se renumera esa playlist.
+#
+# Las playlists con storage="items" usan esta colección; las demás siguen con el
+# arreglo "songs" embebido. PLAYLIST_STORAGE define el modo de las playlists nuevas.
+#
+# Uso manual:
+#   python -m utils.playlist_items --convert-all   -> pasa las playlists embebidas a items
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from utils.mongodb import get_async_collection, close_async_mongo_client, write_session
+from utils.pagination import fetch_page
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_STORAGE = os.getenv("PLAYLIST_STORAGE", "embedded").lower()
+POSITION_GAP = int(os.getenv("PLAYLIST_POSITION_GAP", "1024"))
+ITEMS_COLLECTION = "playlist_items"
+
+# Reintentos ante choques de posición por escrituras concurrentes (índice único)
+_MAX_RETRIES = 5
+
+
+def uses_items(playlist: dict) -> bool:
+    return playlist.get("storage") == "items"
+
+
+def _item_out(doc: dict) -> dict:
+    return {"id": str(doc["_id"]), "song_id": doc["song_id"], "position": doc["position"]}
+
+
+def _object_id(value: str, label: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {label} ID")
+    return ObjectId(value)
+
+
+async def append_items(playlist_id: ObjectId, song_ids: list, session=None) -> int:
+    """
+    Agrega las canciones al final de la playlist. Devuelve cuántas se insertaron;
+    las que ya estaban (p. ej. agregadas por otra petición en paralelo) se omiten.
+    Dentro de una transacción (session) un choque no se reintenta: responde 409.
+    """
+    coll = get_async_collection(ITEMS_COLLECTION)
+    pending = list(dict.fromkeys(song_ids))
+    inserted = 0
+    retries = 0
+    while pending and retries < _MAX_RETRIES:
+        last = await coll.find_one(
+            {"playlist_id": playlist_id}, {"position": 1}, sort=[("position", DESCENDING)], session=session
+        )
+        start = last["position"] if last else 0
+        now = datetime.utcnow()
+        docs = [
+            {"playlist_id": playlist_id, "song_id": sid, "position": start + (i + 1) * POSITION_GAP, "added_at": now}
+            for i, sid in enumerate(pending)
+        ]
+        try:
+            await coll.insert_many(docs, ordered=True, session=session)
+            return inserted + len(docs)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if not errors or any(err.get("code") != 11000 for err in errors):
+                raise
+            if session is not None:
+                # El error abortó la transacción: no se puede seguir usando la sesión
+                raise HTTPException(status_code=409, detail="Playlist is being modified concurrently, retry")
+            done = e.details.get("nInserted", 0)
+            inserted += done
+            # Choque con el índice único (playlist_id, song_id) o con el de posición
+            if await coll.find_one({"playlist_id": playlist_id, "song_id": pending[done]}, {"_id": 1}, session=session):
+                # La canción ya está: se salta y se sigue con el resto
+                pending = pending[done + 1:]
+            else:
+                # Otra escritura tomó la misma posición: se reintenta lo que falta desde el nuevo final
+                pending = pending[done:]
+                retries += 1
+    if pending:
+        raise HTTPException(status_code=409, detail="Playlist is being modified concurrently, retry")
+    return inserted
+
+
+async def existing_song_ids(playlist_id: ObjectId, song_ids: list) -> set:
+    docs = await get_async_collection(ITEMS_COLLECTION).find(
+        {"playlist_id": playlist_id, "song_id": {"$in": list(song_ids)}}, {"song_id": 1}
+    ).to_list()
+    return {d["song_id"] for d in docs}
+
+
+async def remove_songs(playlist_id: ObjectId, song_ids: list) -> int:
+    result = await get_async_collection(ITEMS_COLLECTION).delete_many(
+        {"playlist_id": playlist_id, "song_id": {"$in": list(song_ids)}}
+    )
+    return result.deleted_count
+
+
+async def remove_item(playlist_id: ObjectId, item_id: str) -> bool:
+    result = await get_async_collection(ITEMS_COLLECTION).delete_one(
+        {"_id": _object_id(item_id, "item"), "playlist_id": playlist_id}
+    )
+    return result.deleted_count > 0
+
+
+async def delete_items(playlist_id: ObjectId, session=None):
+    await get_async_collection(ITEMS_COLLECTION).delete_many({"playlist_id": playlist_id}, session=session)
+
+
+async def renumber(playlist_id: ObjectId):
+    """
+    Reasigna posiciones con huecos uniformes conservando el orden.
+    Se hace en dos pasadas (negativas y luego positivas) para no chocar con el índice único.
+    """
+    coll = get_async_collection(ITEMS_COLLECTION)
+    ids = [d["_id"] for d in await coll.find({"playlist_id": playlist_id}, {"_id": 1})
+           .sort("position", ASCENDING).to_list()]
+    if not ids:
+        return
+    for sign in (-1, 1):
+        await coll.bulk_write([
+            UpdateOne({"_id": item_id}, {"$set": {"position": sign * (i + 1) * POSITION_GAP}})
+            for i, item_id in enumerate(ids)
+        ])
+    logger.info("Playlist %s renumerada (%d canciones)", playlist_id, len(ids))
+
+
+async def move_item(playlist_id: ObjectId, item_id: str, after_item_id=None) -> dict:
+    """
+    Mueve una canción justo después de after_item_id (o al principio si es None).
+    Solo se escribe la canción movida, salvo que haya que renumerar.
+    """
+    coll = get_async_collection(ITEMS_COLLECTION)
+    item_oid = _object_id(item_id, "item")
+    after_oid = _object_id(after_item_id, "item") if after_item_id else None
+    if after_oid == item_oid:
+        raise HTTPException(status_code=400, detail="An item cannot be moved after itself")
+
+    for _ in range(_MAX_RETRIES):
+        if not await coll.find_one({"_id": item_oid, "playlist_id": playlist_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Playlist item not found")
+
+        low = 0
+        if after_oid:
+            anchor = await coll.find_one({"_id": after_oid, "playlist_id": playlist_id}, {"position": 1})
+            if not anchor:
+                raise HTTPException(status_code=404, detail="Playlist item not found")
+            low = anchor["position"]
+
+        following = await coll.find_one(
+            {"playlist_id": playlist_id, "position": {"$gt": low}, "_id": {"$ne": item_oid}},
+            {"position": 1}, sort=[("position", ASCENDING)],
+        )
+        high = following["position"] if following else low + 2 * POSITION_GAP
+        if high - low < 2:
+            await renumber(playlist_id)
+            continue
+
+        try:
+            updated = await coll.find_one_and_update(
+                {"_id": item_oid, "playlist_id": playlist_id},
+                {"$set": {"position": (low + high) // 2}},
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            continue
+        if updated:
+            return _item_out(updated)
+    raise HTTPException(status_code=409, detail="Playlist is being modified concurrently, retry")
+
+
+async def list_items(playlist_id: ObjectId, limit=None, cursor=None) -> dict:
+    """
+    Página de canciones en orden de la playlist: {items, next_cursor}.
+    """
+    docs, next_cursor = await fetch_page(
+        get_async_collection(ITEMS_COLLECTION), {"playlist_id": playlist_id}, limit, cursor,
+        sort_field="position",
+    )
+    return {"items": [_item_out(d) for d in docs], "next_cursor": next_cursor}
+
+
+async def convert_to_items(playlist: dict):
+    """
+    Pasa una playlist con arreglo embebido al modo items (conserva el orden).
+    Es idempotente: storage="items" se marca al final, solo si la cantidad de items coincide
+    y el arreglo no cambió mientras tanto; si algo falla antes, repetirla parte de cero.
+    """
+    if uses_items(playlist):
+        return
+    songs = playlist.get("songs")
+    song_ids = list(dict.fromkeys(songs or []))
+    coll = get_async_collection(ITEMS_COLLECTION)
+
+    async with write_session() as session:
+        # Restos de una conversión anterior que no terminó
+        await delete_items(playlist["_id"], session=session)
+        if song_ids:
+            await append_items(playlist["_id"], song_ids, session=session)
+
+        count = await coll.count_documents({"playlist_id": playlist["_id"]}, session=session)
+        if count != len(song_ids):
+            raise HTTPException(status_code=409, detail="Playlist is being modified concurrently, retry")
+
+        result = await get_async_collection("playlist").update_one(
+            {"_id": playlist["_id"], "storage": {"$ne": "items"}, "songs": songs},
+            {"$set": {"storage": "items", "song_count": count}, "$unset": {"songs": ""}},
+            session=session,
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=409, detail="Playlist is being modified concurrently, retry")
+
+
+async def _main(argv: list):
+    try:
+        if "--convert-all" in argv:
+            converted = 0
+            async for playlist in get_async_collection("playlist").find({"storage": {"$ne": "items"}}):
+                try:
+                    await convert_to_items(playlist)
+                except HTTPException as e:
+                    logger.warning("Playlist %s sin convertir: %s", playlist["_id"], e.detail)
+                    continue
+                converted += 1
+            print(f"Playlists convertidas: {converted}")
+        else:
+            print("Uso: python -m utils.playlist_items --convert-all")
+    finally:
+        await close_async_mongo_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(sys.argv[1:]))
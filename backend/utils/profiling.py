@@ -0,0 +1,254 @@
+# Perfilado bajo demanda de peticiones (sin redesplegar).
+# Dos formas de activarlo, ambas solo para administradores:
+# - Cabecera X-Profile: pstats|collapsed en una petición con un JWT de admin.
+# - POST /admin/profiling/arm: perfila las próximas N peticiones a una ruta (plantilla,
+#   p. ej. /songs/{song_id}) de cualquier cliente.
+# Formatos:
+# - pstats: cProfile (abrir con `python -m pstats archivo.prof` o snakeviz).
+# - collapsed: muestreo de la pila del event loop cada PROFILE_SAMPLE_INTERVAL_MS, en el
+#   formato "a;b;c N" de flamegraph.pl / speedscope.
+# Los archivos quedan en PROFILE_DIR (se conservan los últimos PROFILE_MAX_FILES) y se
+# descargan desde GET /admin/profiling/{profile_id}. La respuesta perfilada lleva X-Profile-Id.
+#
+# Se perfila una petición a la vez por worker. El event loop es compartido, así que el perfil
+# incluye también lo que otras peticiones concurrentes ejecuten mientras tanto. El estado
+# (rutas armadas, perfiles guardados) es por worker.
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+
+from starlette.routing import Match
+
+from utils.security import decode_jwt_token_cached
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "true").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1"))
+PROFILE_HEADER = "x-profile"
+
+FORMATS = ("pstats", "collapsed")
+MAX_ARMED_REQUESTS = 100
+
+# (método, plantilla de ruta) -> {"remaining", "format", "armed_by", "armed_at"}
+_armed = {}
+# Perfiles guardados, del más viejo al más nuevo
+_profiles = deque()
+_active = False
+
+
+def arm(method: str, route: str, count: int, fmt: str, armed_by: str = None) -> dict:
+    entry = {"method": method.upper(), "route": route, "remaining": count, "format": fmt,
+             "armed_by": armed_by, "armed_at": datetime.utcnow()}
+    _armed[(entry["method"], route)] = entry
+    return entry
+
+
+def disarm() -> int:
+    count = len(_armed)
+    _armed.clear()
+    return count
+
+
+def armed() -> list:
+    return list(_armed.values())
+
+
+def profiles() -> list:
+    return list(reversed(_profiles))
+
+
+def get_profile(profile_id: str):
+    return next((p for p in _profiles if p["id"] == profile_id), None)
+
+
+def _header(scope, name: str):
+    for key, value in scope.get("headers") or ():
+        if key.decode("latin-1").lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _header_format(scope):
+    """
+    Formato pedido por cabecera, solo si el Bearer token es de un administrador activo
+    (mismo criterio que validate_admin).
+    """
+    value = (_header(scope, PROFILE_HEADER) or "").strip().lower()
+    if not value:
+        return None
+    auth = _header(scope, "authorization") or ""
+    scheme, _, token = auth.partition(" ")
+    payload = decode_jwt_token_cached(token) if scheme.lower() == "bearer" and token else None
+    if not payload or not payload.get("active") or payload.get("admin") is not True:
+        return None
+    return value if value in FORMATS else "pstats"
+
+
+def _route_template(scope):
+    # Resuelve la ruta antes que el router (solo si hay rutas armadas)
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+
+def _consume_armed(scope):
+    if not _armed:
+        return None
+    route = _route_template(scope)
+    entry = _armed.get((scope["method"], route))
+    if entry is None:
+        return None
+    entry["remaining"] -= 1
+    if entry["remaining"] <= 0:
+        _armed.pop((scope["method"], route), None)
+    return entry["format"]
+
+
+# -----------------------------
+# Perfiladores
+# -----------------------------
+class _CProfileRecorder:
+    extension = "prof"
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self, path: str):
+        self._profiler.disable()
+        self._profiler.dump_stats(path)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """
+    Hilo que muestrea la pila del hilo del event loop y acumula pilas colapsadas.
+    """
+    extension = "folded"
+
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, path: str):
+        self._stop.set()
+        self._thread.join()
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+_RECORDERS = {"pstats": _CProfileRecorder, "collapsed": _StackSampler}
+
+
+def _store(meta: dict):
+    _profiles.append(meta)
+    while len(_profiles) > PROFILE_MAX_FILES:
+        old = _profiles.popleft()
+        try:
+            os.remove(old["path"])
+        except OSError:
+            pass
+
+
+# -----------------------------
+# Middleware
+# -----------------------------
+class ProfilingMiddleware:
+    """
+    Middleware ASGI: perfila la petición completa (incluida la respuesta en streaming).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http" or not PROFILING_ENABLED or _active:
+            await self.app(scope, receive, send)
+            return
+
+        fmt = _header_format(scope)
+        trigger = "header" if fmt else None
+        if fmt is None:
+            fmt = _consume_armed(scope)
+            trigger = "armed"
+        if fmt is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        recorder = _RECORDERS[fmt]()
+        try:
+            recorder.start()
+        except ValueError as e:
+            # Otro perfilador activo en el proceso (p. ej. coverage)
+            logger.warning("No se pudo iniciar el perfilado: %s", e)
+            await self.app(scope, receive, send)
+            return
+
+        _active = True
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _active = False
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            path = os.path.join(PROFILE_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{scope['method']}-{slug}-"
+                                             f"{profile_id}.{recorder.extension}")
+            try:
+                recorder.stop(path)
+                _store({
+                    "id": profile_id, "format": fmt, "trigger": trigger, "method": scope["method"],
+                    "route": route, "path": path, "status": status["code"],
+                    "duration_ms": round(elapsed * 1000, 2), "created_at": datetime.utcnow(),
+                })
+                logger.info("Perfil %s guardado (%s %s, %.0f ms)", profile_id, scope["method"], route, elapsed * 1000)
+            except Exception as e:
+                logger.error("No se pudo guardar el perfil %s: %s", profile_id, e)
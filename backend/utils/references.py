@@ -0,0 +1,94 @@
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from utils.mongodb import get_async_collection
+
+
+def _unique(ids: list) -> list:
+    # Quita duplicados conservando el orden de la petición
+    return list(dict.fromkeys(str(i) for i in ids))
+
+
+async def find_references(collection: str, ids: list, extra_filter: Optional[dict] = None,
+                          projection: Optional[dict] = None):
+    """
+    Busca una lista de IDs con una única consulta $in.
+    Devuelve (docs por ID, IDs con formato inválido, IDs no encontrados).
+    """
+    ids = _unique(ids)
+    invalid = [i for i in ids if not ObjectId.is_valid(i)]
+    valid = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+
+    docs = {}
+    if valid:
+        query = {"_id": {"$in": valid}}
+        if extra_filter:
+            query.update(extra_filter)
+        coll = get_async_collection(collection)
+        async for doc in coll.find(query, projection):
+            docs[str(doc["_id"])] = doc
+
+    missing = [i for i in ids if ObjectId.is_valid(i) and i not in docs]
+    return docs, invalid, missing
+
+
+async def require_references(collection: str, ids: list, label: str,
+                             extra_filter: Optional[dict] = None,
+                             projection: Optional[dict] = None,
+                             expected: Optional[dict] = None) -> dict:
+    """
+    Valida que todos los IDs existan (y que cumplan `expected`, p. ej. {"artist": id}).
+    Lanza HTTPException informando de todos los IDs problemáticos a la vez:
+    400 si hay IDs inválidos o que no coinciden, 404 si faltan.
+    Devuelve los documentos encontrados indexados por ID.
+    """
+    docs, invalid, missing = await find_references(collection, ids, extra_filter, projection)
+
+    if invalid:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid {label.lower()} ID(s): {', '.join(invalid)}"
+        )
+    if missing:
+        raise HTTPException(
+            status_code=404, detail=f"{label}(s) not found: {', '.join(missing)}"
+        )
+
+    if expected:
+        for field, value in expected.items():
+            mismatched = [i for i, doc in docs.items() if doc.get(field) != value]
+            if mismatched:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{label} {field} mismatch: {', '.join(mismatched)}",
+                )
+
+    return docs
+
+
+async def fetch_by_ids(collection: str, ids: list, fields: Optional[list] = None,
+                       extra_filter: Optional[dict] = None,
+                       field_aliases: Optional[dict] = None):
+    """
+    Lee un conjunto de IDs con una única consulta $in y los devuelve en el orden de la petición.
+    fields limita los campos leídos; field_aliases traduce nombres de la respuesta a campos
+    guardados (p. ej. {"genre_ids": "genre"}).
+    Devuelve (documentos, IDs inválidos o no encontrados).
+    """
+    projection = None
+    if fields:
+        aliases = field_aliases or {}
+        projection = {aliases.get(f, f): 1 for f in fields if f != "id"} or {"_id": 1}
+
+    docs, invalid, missing = await find_references(collection, ids, extra_filter, projection)
+    not_found = set(invalid) | set(missing)
+    ordered = _unique(ids)
+    return [docs[i] for i in ordered if i in docs], [i for i in ordered if i in not_found]
+
+
+def pick_fields(doc: dict, fields: Optional[list]) -> dict:
+    # Deja solo el id y los campos pedidos (sin fields se devuelve todo)
+    if not fields:
+        return doc
+    return {k: v for k, v in doc.items() if k == "id" or k in fields}
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from utils.mongodb import get_async_collection
+
+# Refresh tokens opacos guardados en Mongo (solo su hash sha256).
+# Cada uso rota el token: el anterior queda revocado y se emite uno nuevo de la
+# misma "familia". Si se reutiliza un token ya rotado se revoca toda la familia.
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "30"))
+REFRESH_COLLECTION = "refresh_tokens"
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def issue_refresh_token(user_id: str, family: Optional[str] = None) -> str:
+    """
+    Crea un refresh token para el usuario y devuelve el valor en claro (solo se entrega una vez).
+    """
+    token = secrets.token_urlsafe(48)
+    now = datetime.utcnow()
+    await get_async_collection(REFRESH_COLLECTION).insert_one({
+        "token_hash": _hash(token),
+        "user_id": str(user_id),
+        "family": family or uuid.uuid4().hex,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_DAYS),
+        "revoked": False,
+    })
+    return token
+
+
+async def rotate_refresh_token(token: str):
+    """
+    Consume un refresh token válido y emite su reemplazo.
+    Devuelve (user_id, nuevo_token). Lanza HTTPException 401 si no es válido.
+    """
+    coll = get_async_collection(REFRESH_COLLECTION)
+    token_hash = _hash(token)
+    now = datetime.utcnow()
+
+    current = await coll.find_one_and_update(
+        {"token_hash": token_hash, "revoked": False, "expires_at": {"$gt": now}},
+        {"$set": {"revoked": True, "rotated_at": now}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not current:
+        # Reutilización de un token ya rotado: se asume robo y se revoca la familia
+        reused = await coll.find_one({"token_hash": token_hash, "revoked": True}, {"family": 1})
+        if reused:
+            await coll.update_many({"family": reused["family"]}, {"$set": {"revoked": True}})
+        raise HTTPException(status_code=401, detail="Refresh token inválido o expirado")
+
+    new_token = await issue_refresh_token(current["user_id"], family=current["family"])
+    return current["user_id"], new_token
+
+
+async def revoke_refresh_token(token: str) -> bool:
+    """
+    Revoca el token y toda su familia (logout). Devuelve False si el token no existe.
+    """
+    coll = get_async_collection(REFRESH_COLLECTION)
+    doc = await coll.find_one({"token_hash": _hash(token)}, {"family": 1})
+    if not doc:
+        return False
+    await coll.update_many({"family": doc["family"]}, {"$set": {"revoked": True}})
+    return True
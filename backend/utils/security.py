@@ -1,5 +1,9 @@
 import os
 import jwt
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -10,6 +14,9 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 security = HTTPBearer()
 
+# Máximo de tokens verificados que se recuerdan en memoria
+JWT_CACHE_MAXSIZE = int(os.getenv("JWT_CACHE_MAXSIZE", "10000"))
+
 # Crear token JWT
 def create_jwt_token(
     firstname: str,
@@ -47,10 +54,67 @@ def decode_jwt_token(token: str) -> dict:
     except PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token or expired token")
 
+# Caché de tokens ya verificados: sha256(token) -> payload, hasta el "exp" del token
+class VerifiedTokenCache:
+    def __init__(self, maxsize: int = JWT_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # digest -> (exp, payload)
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, digest: bytes, payload: dict):
+        exp = payload.get("exp")
+        if not exp:
+            return  # sin expiración no se cachea
+        with self._lock:
+            self._entries[digest] = (float(exp), payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+token_cache = VerifiedTokenCache()
+
+# Igual que decode_jwt_token, pero evita repetir la verificación HMAC
+# de un token que ya se validó y todavía no expiró
+def decode_jwt_token_cached(token: str) -> dict:
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = decode_jwt_token(token)
+        token_cache.set(digest, payload)
+    return dict(payload)
+
 # Validación general para usuarios autenticados
 def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     token = credentials.credentials
-    payload = decode_jwt_token(token)
+    payload = decode_jwt_token_cached(token)
 
     if payload.get("email") is None:
         raise HTTPException(status_code=401, detail="Token Invalid")
@@ -69,7 +133,7 @@ def validate_token(credentials: HTTPAuthorizationCredentials = Depends(security)
 # Validación para administradores
 def validate_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     token = credentials.credentials
-    payload = decode_jwt_token(token)
+    payload = decode_jwt_token_cached(token)
 
     if payload.get("email") is None:
         raise HTTPException(status_code=401, detail="Token Invalid")
@@ -0,0 +1,214 @@
+# Registro de consultas lentas.
+# Un listener de comandos de pymongo detecta los comandos que superan SLOW_QUERY_MS y
+# registra colección, comando, filtro/proyección/pipeline, duración y la función del
+# controlador que lo lanzó. Se escriben en el log y en la colección limitada (capped)
+# SLOW_QUERY_COLLECTION. A una fracción de ellos (SLOW_QUERY_EXPLAIN_RATE) se le adjunta
+# el plan ganador de explain() para detectar COLLSCAN, $regex sin prefijo o $lookup sin índice.
+#
+# Consulta rápida desde mongosh:
+#   db.slow_queries.find().sort({$natural: -1}).limit(20)
+#   db.slow_queries.find({plan_stages: "COLLSCAN"})
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import sys
+from datetime import datetime
+
+from bson import json_util
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+SLOW_QUERY_COLLECTION = os.getenv("SLOW_QUERY_COLLECTION", "slow_queries")
+SLOW_QUERY_COLLECTION_BYTES = int(os.getenv("SLOW_QUERY_COLLECTION_BYTES", str(16 * 1024 * 1024)))
+
+# Comandos que admiten explain
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Campos del comando que describen la consulta (no los documentos escritos)
+_SHAPE_FIELDS = ("filter", "query", "projection", "fields", "sort", "pipeline", "key", "limit", "skip")
+
+# Campos de sesión/cluster que no deben repetirse dentro de explain
+_INTERNAL_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "autocommit", "startTransaction",
+                    "apiVersion", "apiStrict", "apiDeprecationErrors", "$readPreference", "readConcern",
+                    "writeConcern", "maxTimeMS"}
+
+# Texto máximo guardado por consulta/plan
+_MAX_TEXT = 8000
+
+# Explains en curso como máximo (no saturar Mongo justo cuando ya va lento)
+_MAX_PENDING_EXPLAINS = 4
+
+
+def _dumps(value) -> str:
+    text = json_util.dumps(value)
+    return text if len(text) <= _MAX_TEXT else text[:_MAX_TEXT] + "…"
+
+
+def query_shape(command_name: str, command: dict) -> dict:
+    """
+    Partes de un comando que describen la consulta: filtro, proyección, orden, pipeline...
+    En update/delete solo se guardan los filtros (q), no los cambios.
+    """
+    shape = {k: command[k] for k in _SHAPE_FIELDS if k in command}
+    for field in ("updates", "deletes"):
+        if field in command:
+            shape["filter"] = [op.get("q") for op in command[field]]
+    return shape
+
+
+def plan_stages(plan) -> list:
+    """
+    Recorre el árbol de un plan de ejecución y devuelve sus etapas desde la raíz
+    (p. ej. ["PROJECTION_SIMPLE", "COLLSCAN"]).
+    """
+    if not isinstance(plan, dict):
+        return []
+    plan = plan.get("queryPlan", plan)
+    stages = [plan["stage"]] if plan.get("stage") else []
+    stages += plan_stages(plan.get("inputStage"))
+    for child in plan.get("inputStages") or []:
+        stages += plan_stages(child)
+    return stages
+
+
+def winning_plan(explain: dict):
+    """
+    Plan ganador de la respuesta de explain (find/count o primera etapa $cursor de aggregate).
+    """
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        for stage in explain.get("stages") or []:
+            planner = (stage.get("$cursor") or {}).get("queryPlanner")
+            if planner:
+                break
+    return (planner or {}).get("winningPlan")
+
+
+# Paquetes de la API, en orden de preferencia para identificar quién lanzó la consulta
+_CALLER_PACKAGES = ("controllers", "search", "routes", "utils", "pipelines")
+
+
+def caller_function(skip: int = 1) -> str:
+    """
+    Función de la API más cercana en la pila (prefiere controladores). Con el cliente async
+    los eventos se publican dentro de la tarea que espera el comando, así que la pila
+    incluye las corrutinas del controlador.
+    """
+    found = {}
+    frame = sys._getframe(skip)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        package = module.split(".")[0]
+        if package in _CALLER_PACKAGES and module not in (__name__, "utils.metrics", "utils.mongodb"):
+            found.setdefault(package, f"{module}.{frame.f_code.co_name}")
+            if package == "controllers":
+                break
+        frame = frame.f_back
+    for package in _CALLER_PACKAGES:
+        if package in found:
+            return found[package]
+    return "-"
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, explain_rate: float = SLOW_QUERY_EXPLAIN_RATE):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        self._pending = {}    # (request_id, connection_id) -> (colección, comando)
+        self._tasks = set()   # escrituras/explains en curso (referencia fuerte)
+
+    def started(self, event):
+        if event.command_name == "explain":
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str) or collection == SLOW_QUERY_COLLECTION:
+            return
+        self._pending[(event.request_id, event.connection_id)] = (collection, event.command)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool = False):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        duration_ms = event.duration_micros / 1000
+        if pending is None or duration_ms < self.threshold_ms:
+            return
+
+        collection, command = pending
+        entry = {
+            "ts": datetime.utcnow(),
+            "database": event.database_name,
+            "collection": collection,
+            "command": event.command_name,
+            "query": _dumps(query_shape(event.command_name, command)),
+            "duration_ms": round(duration_ms, 2),
+            "caller": caller_function(2),
+            "failed": failed,
+        }
+        logger.warning("Consulta lenta (%.0f ms) %s.%s desde %s: %s", duration_ms, collection,
+                       event.command_name, entry["caller"], entry["query"])
+
+        explain = (event.command_name in EXPLAINABLE and not failed
+                   and random.random() < self.explain_rate
+                   and len(self._tasks) < _MAX_PENDING_EXPLAINS)
+        self._spawn(self._record(entry, command if explain else None))
+
+    def _spawn(self, coro):
+        try:
+            # Contexto vacío: el tiempo del explain no se suma a la petición en curso (/metrics)
+            task = asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+        except RuntimeError:
+            # Comando del cliente síncrono (fuera del event loop): solo queda en el log
+            coro.close()
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _record(self, entry: dict, command=None):
+        # Import diferido: utils.mongodb registra este listener al crear el cliente
+        from utils.mongodb import get_async_mongo_client
+
+        db = get_async_mongo_client()[entry["database"]]
+        try:
+            if command is not None:
+                explained = await db.command({
+                    "explain": {k: v for k, v in command.items() if k not in _INTERNAL_FIELDS},
+                    "verbosity": "queryPlanner",
+                })
+                plan = winning_plan(explained)
+                entry["plan_stages"] = plan_stages(plan)
+                entry["winning_plan"] = _dumps(plan)
+            await db[SLOW_QUERY_COLLECTION].insert_one(entry)
+        except Exception as e:
+            logger.error("No se pudo registrar la consulta lenta: %s", e)
+
+
+def event_listeners() -> list:
+    # Se pasa al crear el cliente async (vacío si el registro está desactivado)
+    return [SlowQueryListener()] if SLOW_QUERY_LOG_ENABLED else []
+
+
+async def ensure_slow_query_log():
+    """
+    Crea la colección limitada si no existe (las más viejas se descartan solas).
+    """
+    if not SLOW_QUERY_LOG_ENABLED:
+        return
+    from utils.mongodb import get_async_mongo_client, DB_NAME
+
+    try:
+        await get_async_mongo_client()[DB_NAME].create_collection(
+            SLOW_QUERY_COLLECTION, capped=True, size=SLOW_QUERY_COLLECTION_BYTES
+        )
+    except CollectionInvalid:
+        pass
@@ -0,0 +1,52 @@
+import json
+import os
+from datetime import datetime
+from typing import Callable
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+
+# Documentos pedidos a Mongo por cada lote del cursor al exportar colecciones
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# Formatos de streaming soportados
+STREAM_FORMATS = ("ndjson", "json")
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(doc: dict) -> str:
+    return json.dumps(doc, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+async def _ndjson_lines(cursor, transform: Callable[[dict], dict]):
+    async for doc in cursor:
+        yield _dumps(transform(doc)) + "\n"
+
+
+async def _json_array_chunks(cursor, transform: Callable[[dict], dict]):
+    yield "["
+    first = True
+    async for doc in cursor:
+        yield ("" if first else ",") + _dumps(transform(doc))
+        first = False
+    yield "]"
+
+
+def stream_cursor(cursor, transform: Callable[[dict], dict], fmt: str = "ndjson") -> StreamingResponse:
+    """
+    Envía los documentos de un cursor async a medida que llegan de Mongo.
+    fmt="ndjson": un documento JSON por línea.
+    fmt="json": un único array JSON enviado por fragmentos.
+    La memoria usada se mantiene constante (un lote del cursor a la vez).
+    """
+    cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+    if fmt == "json":
+        return StreamingResponse(_json_array_chunks(cursor, transform), media_type="application/json")
+    return StreamingResponse(_ndjson_lines(cursor, transform), media_type="application/x-ndjson")